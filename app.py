@@ -1,19 +1,19 @@
 import logging
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
-)
+from rbidp.core.tracing import setup_logging
+
+# Records are queued and written by a listener thread, so DEBUG output stays off the request path
+setup_logging(logging.DEBUG)
 
 import os
 import re
 import json
-import tempfile
 from pathlib import Path
 import streamlit as st
 
 from rbidp.orchestrator import run_pipeline
 from rbidp.core.errors import message_for
+from rbidp.core.run_store import artifact_exists, load_json
 
 # --- Page setup ---
 st.set_page_config(page_title="RB Loan Deferment IDP", layout="centered")
@@ -93,12 +93,6 @@ doc_type = st.selectbox(
 )
 
 
-def _safe_filename(name: str) -> str:
-    name = re.sub(r"[^\w\-\.\s]", "_", name.strip())
-    name = re.sub(r"\s+", "_", name)
-    return name or "file"
-
-
 def _count_pdf_pages(path: str):
     try:
         if _pypdf is not None:
@@ -138,22 +132,17 @@ if submitted:
     elif doc_type == "Выберите тип документа":
         st.warning("Пожалуйста, выберите тип документа")
     else:
-        # Save uploaded file to a temporary location (auto-cleaned) and call orchestrator once
-        with tempfile.TemporaryDirectory(prefix="upload_") as tmp_dir:
-            tmp_path = Path(tmp_dir) / _safe_filename(uploaded_file.name)
-            with open(tmp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            with st.spinner("Обрабатываем документ..."):
-                result = run_pipeline(
-                    fio=fio or None,
-                    reason=reason,
-                    doc_type=doc_type,
-                    source_file_path=str(tmp_path),
-                    original_filename=uploaded_file.name,
-                    content_type=getattr(uploaded_file, "type", None),
-                    runs_root=RUNS_DIR,
-                )
+        # Hand the in-memory upload to the orchestrator: it is written once, straight into the run dir
+        with st.spinner("Обрабатываем документ..."):
+            result = run_pipeline(
+                fio=fio or None,
+                reason=reason,
+                doc_type=doc_type,
+                source_file_path=uploaded_file,
+                original_filename=uploaded_file.name,
+                content_type=getattr(uploaded_file, "type", None),
+                runs_root=RUNS_DIR,
+            )
 
         st.subheader("Результат проверки")
         verdict = bool(result.get("verdict", False))
@@ -173,10 +162,9 @@ if submitted:
 
         # Diagnostics: show final_result.json for full context
         final_result_path = result.get("final_result_path")
-        if isinstance(final_result_path, str) and os.path.exists(final_result_path):
+        if isinstance(final_result_path, str) and artifact_exists(final_result_path):
             try:
-                with open(final_result_path, "r", encoding="utf-8") as ff:
-                    final_obj = json.load(ff)
+                final_obj = load_json(final_result_path)
                 with st.expander("Диагностика: final_result.json"):
                     st.json(final_obj)
             except Exception:
@@ -185,10 +173,9 @@ if submitted:
         # Side-by-side comparison (if available)
         if isinstance(final_result_path, str):
             sbs_path = os.path.join(os.path.dirname(final_result_path), "side_by_side.json")
-            if os.path.exists(sbs_path):
+            if artifact_exists(sbs_path):
                 try:
-                    with open(sbs_path, "r", encoding="utf-8") as sbf:
-                        side_by_side = json.load(sbf)
+                    side_by_side = load_json(sbs_path)
                     with st.expander("Сравнение: side_by_side.json"):
                         # Compact table for quick review
                         rows = []
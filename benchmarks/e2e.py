@@ -0,0 +1,366 @@
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import resource
+import subprocess
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.fixtures import make_pdf, make_photo
+from benchmarks.stubs import GPT_PATH, OCR_PATH
+from rbidp.core.metrics import percentiles
+
+# End-to-end benchmark: run_pipeline against local OCR/GPT stub servers (benchmarks.stubs).
+#
+#   python -m benchmarks.e2e run --docs 200 --concurrency 16 --out bench.json
+#   python -m benchmarks.e2e compare baseline.json bench.json
+#
+# The stubs run in a child process so CPU and RSS figures are the pipeline's own.
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+FIO = "Иванов Иван Иванович"
+DOC_TYPE = "Приказ работодателя о предоставлении отпуска без сохранения заработной платы"
+
+
+def _start_stubs(args: argparse.Namespace) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "benchmarks.stubs",
+        "--ocr-latency", args.ocr_latency,
+        "--gpt-latency", args.gpt_latency,
+        "--ocr-error-rate", str(args.ocr_error_rate),
+        "--gpt-error-rate", str(args.gpt_error_rate),
+        "--seed", str(args.seed),
+        "--gpt-token-ms", str(args.gpt_token_ms),
+        "--gpt-trailing-tokens", str(args.gpt_trailing_tokens),
+        "--ocr-max-concurrency", str(args.ocr_max_concurrency),
+        "--gpt-max-concurrency", str(args.gpt_max_concurrency),
+        "--gpt-malformed-rate", str(args.gpt_malformed_rate),
+        "--ocr-ms-per-mb", str(args.ocr_ms_per_mb),
+    ]
+    return subprocess.Popen(cmd, cwd=str(REPO_ROOT), stdout=subprocess.PIPE, text=True)
+
+
+def _peak_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _cpu_seconds() -> float:
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_utime + ru.ru_stime
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=str(REPO_ROOT), capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    p50, p95, p99 = percentiles(values)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(p50, 3),
+        "p95": round(p95, 3),
+        "p99": round(p99, 3),
+        "max": round(max(values), 3),
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    stubs = _start_stubs(args)
+    runs_root = Path(args.runs_root) if args.runs_root else Path(tempfile.mkdtemp(prefix="rbidp-bench-"))
+    try:
+        port = json.loads(stubs.stdout.readline())["port"]
+        base = f"http://127.0.0.1:{port}"
+        # Must be set before rbidp.core.config is imported
+        os.environ["RBIDP_TEXTRACT_URL"] = base + OCR_PATH
+        os.environ["RBIDP_GPT_URL"] = base + GPT_PATH
+        if args.gpt_stream:
+            os.environ["RBIDP_GPT_STREAM"] = "1"
+        if args.gpt_mode:
+            os.environ["RBIDP_GPT_MODE"] = args.gpt_mode
+        if args.gpt_extract_prompts:
+            os.environ["RBIDP_GPT_EXTRACT_PROMPTS"] = args.gpt_extract_prompts
+        if args.gpt_json_reask:
+            os.environ["RBIDP_GPT_JSON_REASK"] = "1"
+        if args.image_preprocess:
+            os.environ["RBIDP_IMAGE_PREPROCESS"] = "1"
+        if args.multidoc_detector:
+            os.environ["RBIDP_MULTIDOC_DETECTOR"] = args.multidoc_detector
+        from rbidp.core import config, metrics
+        from rbidp.core.run_store import load_json
+        from rbidp.orchestrator import run_pipeline
+        from rbidp.clients.adaptive import upstream_limits
+
+        rng = random.Random(args.seed)
+        # Unique bytes per document: idempotency and single-flight must not collapse the load
+        if args.input == "photo":
+            # Phone photos of one page (--pages does not apply)
+            docs = [make_photo(tag=f"bench-{args.seed}-{i}-{rng.random()}") for i in range(args.warmup + args.docs)]
+            filename, content_type = "bench.jpg", "image/jpeg"
+        else:
+            docs = [make_pdf(args.pages, tag=f"bench-{args.seed}-{i}-{rng.random()}", pad_bytes=args.pad_bytes) for i in range(args.warmup + args.docs)]
+            filename, content_type = "bench.pdf", "application/pdf"
+
+        def one(pdf: bytes) -> Dict[str, Any]:
+            t0 = time.perf_counter()
+            try:
+                result = run_pipeline(
+                    fio=FIO,
+                    reason="benchmark",
+                    doc_type=DOC_TYPE,
+                    source_file_path=pdf,
+                    original_filename=filename,
+                    content_type=content_type,
+                    runs_root=runs_root,
+                    priority=args.priority,
+                )
+            except Exception as e:
+                return {"latency_ms": (time.perf_counter() - t0) * 1000, "exception": type(e).__name__}
+            out: Dict[str, Any] = {"latency_ms": (time.perf_counter() - t0) * 1000, "result": result}
+            try:
+                manifest = load_json(Path(result["final_result_path"]).parent / "manifest.json")
+            except Exception:
+                manifest = {}
+            out["timings_ms"] = manifest.get("timings_ms") or {}
+            out["preprocess"] = manifest.get("preprocess")
+            return out
+
+        for pdf in docs[:args.warmup]:
+            one(pdf)
+
+        cpu0 = _cpu_seconds()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="rbidp-bench") as pool:
+            samples = list(pool.map(one, docs[args.warmup:]))
+        wall = time.perf_counter() - t0
+        cpu = _cpu_seconds() - cpu0
+
+        stages: Dict[str, List[float]] = {}
+        preprocess_steps: Dict[str, List[float]] = {}
+        outcomes: Counter = Counter()
+        for s in samples:
+            if "exception" in s:
+                outcomes["exception:" + s["exception"]] += 1
+                continue
+            codes = [e.get("code") for e in s["result"].get("errors", []) if isinstance(e, dict)]
+            outcomes["ok" if s["result"].get("verdict") else ",".join(codes) or "rejected"] += 1
+            for stage, ms in s["timings_ms"].items():
+                stages.setdefault(stage, []).append(ms)
+            for step, ms in ((s.get("preprocess") or {}).get("steps_ms") or {}).items():
+                preprocess_steps.setdefault(step, []).append(ms)
+
+        # Time spent queued on the node-wide upstream budgets (rbidp.clients.ratelimit)
+        ratelimit_wait = {
+            k.split("=", 1)[1].rstrip("}"): {"count": v["count"], "p50_ms": round(v["p50"] * 1000, 3), "p95_ms": round(v["p95"] * 1000, 3)}
+            for k, v in metrics.snapshot()["summaries"].items() if k.startswith("ratelimit_wait_seconds{")
+        }
+
+        try:
+            with urllib.request.urlopen(base + "/stats", timeout=5) as resp:
+                upstream = json.loads(resp.read())
+        except Exception:
+            upstream = {}
+        # Upstream counters include the warmup documents
+        total_docs = args.warmup + args.docs
+        gpt_per_doc = {
+            k: round(upstream.get(src, 0) / total_docs, 1)
+            for k, src in (("requests", "gpt"), ("prompt_tokens", "gpt_prompt_tokens"), ("completion_tokens", "gpt_completion_tokens"))
+        }
+        # OCR request bodies (multipart) per document, as received by the stub
+        ocr_bytes_per_doc = round(upstream.get("ocr_bytes", 0) / total_docs)
+        # The same, as accounted by the client (rbidp.core.usage; provider usage or local estimates)
+        accounted: Counter = Counter()
+        for k, v in metrics.snapshot()["counters"].items():
+            if k.startswith("gpt_tokens_total{"):
+                accounted["prompt_tokens" if "kind=prompt" in k else "completion_tokens"] += v
+        gpt_accounted_per_doc = {k: round(accounted[k] / total_docs, 1) for k in ("prompt_tokens", "completion_tokens")}
+        # Parse outcomes of GPT answers (clean / repaired / failed) and of repair re-asks
+        json_parse = {
+            k.split("{", 1)[0] + ":" + k.split("outcome=", 1)[1].rstrip("}"): v
+            for k, v in metrics.snapshot()["counters"].items()
+            if k.startswith(("gpt_json_parse_total{", "gpt_json_reask_total{"))
+        }
+        # Local multi-document detector: verdicts, GPT checks skipped, agreement with GPT
+        multidoc = {
+            k.replace("_total", ""): v
+            for k, v in metrics.snapshot()["counters"].items()
+            if k.startswith(("multidoc_detector_total{", "multidoc_gpt_skipped_total", "multidoc_shadow_total{"))
+        }
+
+        return {
+            "label": args.label,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "params": {
+                k: getattr(args, k)
+                for k in ("docs", "concurrency", "pages", "pad_bytes", "warmup", "priority",
+                          "ocr_latency", "gpt_latency", "ocr_error_rate", "gpt_error_rate", "seed",
+                          "gpt_stream", "gpt_mode", "gpt_extract_prompts", "gpt_token_ms", "gpt_trailing_tokens", "ocr_max_concurrency", "gpt_max_concurrency",
+                          "gpt_malformed_rate", "gpt_json_reask", "multidoc_detector", "input", "image_preprocess", "ocr_ms_per_mb")
+            },
+            "config": {
+                "OCR_MODE": config.OCR_MODE,
+                "SCHED_SLOTS": config.SCHED_SLOTS,
+                "IDEMPOTENCY_ENABLED": config.IDEMPOTENCY_ENABLED,
+                "RUN_STORAGE_FORMAT": config.RUN_STORAGE_FORMAT,
+                "GPT_STREAM": config.GPT_STREAM,
+                "GPT_MODE": config.GPT_MODE,
+                "GPT_EXTRACT_PROMPTS": config.GPT_EXTRACT_PROMPTS,
+                "GPT_JSON_REASK": config.GPT_JSON_REASK,
+                "MULTIDOC_DETECTOR": config.MULTIDOC_DETECTOR,
+                "IMAGE_PREPROCESS": config.IMAGE_PREPROCESS,
+                "IMAGE_PREPROCESS_DPI": config.IMAGE_PREPROCESS_DPI,
+                "RATELIMIT_RPS": config.RATELIMIT_RPS,
+                "RATELIMIT_CONCURRENCY": config.RATELIMIT_CONCURRENCY,
+                "ADAPTIVE_CONCURRENCY": config.ADAPTIVE_CONCURRENCY,
+                "GPT_PROMPT_TOKEN_BUDGET": config.GPT_PROMPT_TOKEN_BUDGET,
+                "GPT_LATENCY_BUDGET_MS": config.GPT_LATENCY_BUDGET_MS,
+                "GPT_BUDGET_ACTION": config.GPT_BUDGET_ACTION,
+            },
+            "results": {
+                "wall_seconds": round(wall, 3),
+                "throughput_docs_per_sec": round(len(samples) / wall, 3) if wall else 0.0,
+                "latency_ms": _summary([s["latency_ms"] for s in samples]),
+                "stages_ms": {stage: _summary(v) for stage, v in sorted(stages.items())},
+                "outcomes": dict(outcomes),
+                "cpu_seconds": round(cpu, 3),
+                "cpu_ms_per_doc": round(cpu * 1000 / len(samples), 3) if samples else 0.0,
+                "cpu_utilization": round(cpu / wall, 3) if wall else 0.0,
+                "peak_rss_bytes": _peak_rss_bytes(),
+                "upstream_requests": upstream,
+                "gpt_per_doc": gpt_per_doc,
+                "gpt_accounted_per_doc": gpt_accounted_per_doc,
+                "gpt_json_parse": json_parse,
+                "multidoc": multidoc,
+                "ocr_bytes_per_doc": ocr_bytes_per_doc,
+                "preprocess_ms": {step: _summary(v) for step, v in preprocess_steps.items()},
+                "ratelimit_wait": ratelimit_wait,
+                "upstream_limits": upstream_limits(),
+            },
+        }
+    finally:
+        stubs.terminate()
+        try:
+            stubs.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            stubs.kill()
+        if not args.runs_root and not args.keep_runs:
+            shutil.rmtree(runs_root, ignore_errors=True)
+
+
+# Metrics compared between two result files: (path, True if higher is better)
+_COMPARED = [
+    (("throughput_docs_per_sec",), True),
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+    (("cpu_ms_per_doc",), False),
+    (("peak_rss_bytes",), False),
+    (("gpt_per_doc", "requests"), False),
+    (("gpt_per_doc", "prompt_tokens"), False),
+    (("gpt_per_doc", "completion_tokens"), False),
+]
+
+
+def _dig(obj: Dict[str, Any], path: tuple) -> Optional[float]:
+    for k in path:
+        if not isinstance(obj, dict) or k not in obj:
+            return None
+        obj = obj[k]
+    return obj if isinstance(obj, (int, float)) else None
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    base_r, cur_r = baseline.get("results", {}), current.get("results", {})
+    paths = list(_COMPARED)
+    for stage in sorted(set(base_r.get("stages_ms", {})) | set(cur_r.get("stages_ms", {}))):
+        paths.append((("stages_ms", stage, "p95"), False))
+    for path, higher_better in paths:
+        b, c = _dig(base_r, path), _dig(cur_r, path)
+        if b is None or c is None:
+            continue
+        change = (c - b) / b * 100 if b else 0.0
+        rows.append({
+            "metric": ".".join(path),
+            "baseline": b,
+            "current": c,
+            "change_pct": round(change, 1),
+            "worse": (change < 0) if higher_better else (change > 0),
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="RB IDP end-to-end benchmark against stub upstreams")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_run = sub.add_parser("run")
+    p_run.add_argument("--docs", type=int, default=50)
+    p_run.add_argument("--concurrency", type=int, default=8)
+    p_run.add_argument("--pages", type=int, default=2)
+    p_run.add_argument("--pad-bytes", type=int, default=200_000, help="Extra bytes per PDF (upload size)")
+    p_run.add_argument("--warmup", type=int, default=2)
+    p_run.add_argument("--priority", default=None, choices=[None, "interactive", "batch"])
+    p_run.add_argument("--ocr-latency", default="lognormal:800,0.4", help="ms: fixed:N | uniform:A,B | lognormal:MEDIAN,SIGMA")
+    p_run.add_argument("--gpt-latency", default="lognormal:1200,0.4")
+    p_run.add_argument("--ocr-error-rate", type=float, default=0.0)
+    p_run.add_argument("--gpt-error-rate", type=float, default=0.0)
+    p_run.add_argument("--seed", type=int, default=1)
+    p_run.add_argument("--gpt-stream", action="store_true", help="Streamed GPT completions (RBIDP_GPT_STREAM=1)")
+    p_run.add_argument("--gpt-mode", default=None, choices=[None, "separate", "combined"], help="RBIDP_GPT_MODE")
+    p_run.add_argument("--gpt-extract-prompts", default=None, choices=[None, "generic", "specialized"], help="RBIDP_GPT_EXTRACT_PROMPTS")
+    p_run.add_argument("--gpt-token-ms", type=float, default=0.0, help="Generation time per completion token (streamed or not)")
+    p_run.add_argument("--gpt-trailing-tokens", type=int, default=40, help="Tokens the stub streams after the JSON answer")
+    p_run.add_argument("--ocr-max-concurrency", type=int, default=0, help="Stub answers 429 above this many OCR requests in flight")
+    p_run.add_argument("--gpt-max-concurrency", type=int, default=0, help="Stub answers 429 above this many GPT requests in flight")
+    p_run.add_argument("--gpt-malformed-rate", type=float, default=0.0, help="Share of stub GPT answers with broken JSON")
+    p_run.add_argument("--gpt-json-reask", action="store_true", help="Repair re-ask of unparseable answers (RBIDP_GPT_JSON_REASK=1)")
+    p_run.add_argument("--input", default="pdf", choices=["pdf", "photo"], help="Synthetic PDFs or one-page phone photos (JPEG)")
+    p_run.add_argument("--image-preprocess", action="store_true", help="Image preprocessing before OCR (RBIDP_IMAGE_PREPROCESS=1)")
+    p_run.add_argument("--ocr-ms-per-mb", type=float, default=0.0, help="Stub OCR latency per MB of payload")
+    p_run.add_argument("--multidoc-detector", default=None, choices=[None, "off", "shadow", "on"], help="RBIDP_MULTIDOC_DETECTOR")
+    p_run.add_argument("--runs-root", default=None, help="Default: a temp dir, removed afterwards")
+    p_run.add_argument("--keep-runs", action="store_true")
+    p_run.add_argument("--label", default="")
+    p_run.add_argument("--out", default=None, help="Write the result JSON here")
+    p_cmp = sub.add_parser("compare")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "run":
+        report = run_benchmark(args)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.out:
+            Path(args.out).write_text(text, encoding="utf-8")
+        print(text)
+    else:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, "r", encoding="utf-8") as f:
+            current = json.load(f)
+        for row in compare(baseline, current):
+            flag = "  WORSE" if row["worse"] and abs(row["change_pct"]) >= 5 else ""
+            print(f"{row['metric']:<32} {row['baseline']:>14} -> {row['current']:<14} {row['change_pct']:+.1f}%{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import io
+import json
+import uuid
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+# Synthetic inputs shaped like the documents the pipeline sees: bilingual (ru/kk) OCR text
+# around a title, a name and dates
+
+_RU_WORDS = (
+    "приказ работодателя о предоставлении отпуска без сохранения заработной платы работнику "
+    "согласно трудовому договору на основании заявления период с по года номер дата выдачи "
+    "справка лист временной нетрудоспособности выписка из стационара врачебно консультативной комиссии"
+).split()
+_KK_WORDS = (
+    "бұйрық жұмыс берушінің жалақысы сақталмайтын демалыс беру туралы қызметкерге еңбек шарты "
+    "негізінде өтініш кезең күні нөмірі анықтама уақытша еңбекке жарамсыздық парағы"
+).split()
+NAMES = [
+    "Иванов Иван Иванович",
+    "Сакарияева Наргиз Кайратовна",
+    "Ахметов Ерлан Серикович",
+    "Жумабекова Айгерим Нурлановна",
+]
+TITLES = [
+    "Приказ работодателя о предоставлении отпуска без сохранения заработной платы",
+    "Лист временной нетрудоспособности (больничный лист)",
+    "Справка о регистрации в качестве безработного",
+]
+
+
+def page_text(rng: random.Random, words: int = 250, name: Optional[str] = None, title: Optional[str] = None) -> str:
+    """One OCR page: header, name, date and `words` words of mixed Russian/Kazakh filler, in lines."""
+    lines = [
+        "ТОО «Компания» / «Компания» ЖШС",
+        (title or rng.choice(TITLES)).upper(),
+        f"№ {rng.randint(1, 999)} от {rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025",
+        name or rng.choice(NAMES),
+    ]
+    line: List[str] = []
+    width = rng.randint(6, 12)
+    for _ in range(words):
+        line.append(rng.choice(_RU_WORDS if rng.random() < 0.6 else _KK_WORDS))
+        if len(line) >= width:
+            lines.append(" ".join(line))
+            line = []
+            width = rng.randint(6, 12)
+    if line:
+        lines.append(" ".join(line))
+    return "\n".join(lines)
+
+
+def make_pdf(pages: int, tag: str = "", pad_bytes: int = 0) -> bytes:
+    """
+    A minimal valid PDF with `pages` empty pages (pypdf can read and split it). `tag` makes the
+    bytes unique per document (idempotency / single-flight keys); `pad_bytes` adds an unused
+    stream to reach realistic upload sizes.
+    """
+    objects: List[bytes] = []
+    kids = " ".join(f"{3 + i} 0 R" for i in range(pages))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    for _ in range(pages):
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>")
+    if pad_bytes:
+        payload = random.Random(tag).randbytes(pad_bytes)
+        objects.append(b"<< /Length " + str(len(payload)).encode() + b" >>\nstream\n" + payload + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    if tag:
+        out += f"% {tag}\n".encode()
+    return bytes(out)
+
+
+def make_photo(tag: str = "", skew: float = 4.0, size: Tuple[int, int] = (3000, 4000)) -> bytes:
+    """
+    A phone photo of a text page as JPEG: an A4 sheet with lines of word blocks, skewed by `skew`
+    degrees, on a noisy dark table. `tag` seeds the layout, so the bytes are unique per document.
+    """
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(tag)
+    paper = Image.new("L", (2100, 2970), 235)
+    draw = ImageDraw.Draw(paper)
+    for y in range(250, 2700, 70):
+        x = 200
+        while x < 1900:
+            w = rng.randint(40, 220)
+            draw.rectangle([x, y, x + w, y + 28], fill=40)
+            x += w + 30
+    sheet = paper.rotate(skew, expand=True, fillcolor=0)
+    table = Image.effect_noise(size, 20).point(lambda v: v // 3 + 50)
+    table.paste(sheet, (300, 350), sheet.point(lambda v: 255 if v else 0))
+    buf = io.BytesIO()
+    Image.merge("RGB", (table, table, table)).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def textract_blocks(pages: int, lines_per_page: int = 60, seed: int = 0) -> Dict[str, Any]:
+    """A Textract-style {"Blocks": [...]} response: PAGE, LINE and WORD blocks with geometry and relationships."""
+    rng = random.Random(seed)
+    blocks: List[Dict[str, Any]] = []
+
+    def geometry() -> Dict[str, Any]:
+        left, top = rng.random() * 0.8, rng.random() * 0.9
+        w, h = rng.random() * 0.2, 0.012
+        return {
+            "BoundingBox": {"Width": w, "Height": h, "Left": left, "Top": top},
+            "Polygon": [{"X": left, "Y": top}, {"X": left + w, "Y": top}, {"X": left + w, "Y": top + h}, {"X": left, "Y": top + h}],
+        }
+
+    for pn in range(1, pages + 1):
+        page_id = uuid.UUID(int=rng.getrandbits(128)).hex
+        page = {"BlockType": "PAGE", "Id": page_id, "Page": pn, "Geometry": geometry(), "Relationships": [{"Type": "CHILD", "Ids": []}]}
+        blocks.append(page)
+        for line_text in page_text(rng, words=lines_per_page * 9).splitlines()[:lines_per_page]:
+            line_id = uuid.UUID(int=rng.getrandbits(128)).hex
+            word_ids = []
+            words = []
+            for word in line_text.split():
+                wid = uuid.UUID(int=rng.getrandbits(128)).hex
+                word_ids.append(wid)
+                words.append({
+                    "BlockType": "WORD", "Id": wid, "Page": pn, "Text": word, "TextType": "PRINTED",
+                    "Confidence": 80 + rng.random() * 20, "Geometry": geometry(),
+                })
+            page["Relationships"][0]["Ids"].append(line_id)
+            blocks.append({
+                "BlockType": "LINE", "Id": line_id, "Page": pn, "Text": line_text,
+                "Confidence": 80 + rng.random() * 20, "Geometry": geometry(),
+                "Relationships": [{"Type": "CHILD", "Ids": word_ids}],
+            })
+            blocks.extend(words)
+    return {"DocumentMetadata": {"Pages": pages}, "Blocks": blocks}
+
+
+def gpt_raw_response(answer: Dict[str, Any], prompt_chars: int = 4000, noise_lines: int = 0, seed: int = 0) -> str:
+    """Raw GPT gateway output: optional non-JSON noise, the Model/Content echo line, then the completion."""
+    rng = random.Random(seed)
+    prompt = page_text(rng, words=max(1, prompt_chars // 8))[:prompt_chars]
+    lines = [f"data: keepalive {i}" for i in range(noise_lines)]
+    lines.append(json.dumps({"Model": "gpt-4o-mini", "Content": prompt, "Temperature": 0.1, "MaxTokens": 200}, ensure_ascii=False))
+    content = json.dumps(answer, ensure_ascii=False)
+    lines.append(json.dumps({"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}, ensure_ascii=False))
+    return "\n".join(lines)
@@ -0,0 +1,312 @@
+import gc
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from pathlib import Path
+from statistics import median
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.fixtures import NAMES, TITLES, gpt_raw_response, make_pdf, page_text, textract_blocks
+
+# Micro-benchmarks of the processors' hot paths on synthetic inputs of realistic size.
+#
+#   python -m benchmarks.micro                    # run and compare with the stored baseline
+#   python -m benchmarks.micro --save-baseline    # (re)record the baseline
+#   python -m benchmarks.micro -k textract        # only cases whose name contains "textract"
+#
+# Exit status 1 when a case regresses beyond the threshold (time or allocation peak).
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "micro.json"
+TIME_THRESHOLD = 0.25
+ALLOC_THRESHOLD = 0.10
+
+# name -> setup(workdir) returning (fn, ops per call)
+Case = Callable[[Path], Tuple[Callable[[], Any], int]]
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    def register(fn: Case) -> Case:
+        CASES[name] = fn
+        return fn
+    return register
+
+
+@case("textract_extract_pages_blocks_3p")
+def _textract_3p(workdir: Path):
+    from rbidp.processors.filter_textract_response import extract_pages
+
+    obj = textract_blocks(pages=3)  # ~1.7k LINE/WORD blocks
+    return lambda: extract_pages(obj), 1
+
+
+@case("textract_extract_pages_blocks_15p")
+def _textract_15p(workdir: Path):
+    from rbidp.processors.filter_textract_response import extract_pages
+
+    obj = textract_blocks(pages=15)  # ~8.5k blocks (long-document mode)
+    return lambda: extract_pages(obj), 1
+
+
+@case("textract_parse_and_filter_blocks_3p")
+def _textract_filter(workdir: Path):
+    from rbidp.processors.filter_textract_response import filter_textract_response
+
+    raw = json.dumps(textract_blocks(pages=3), ensure_ascii=False)
+    out_dir = str(workdir / "ocr")
+    # What the pipeline pays per document: json.loads of the raw body plus the filter (with its write)
+    return lambda: filter_textract_response(json.loads(raw), out_dir), 1
+
+
+@case("textract_stream_parse_and_filter_blocks_3p")
+def _textract_stream_filter(workdir: Path):
+    from rbidp.processors.filter_textract_response import filter_textract_response
+    from rbidp.processors.textract_pages import parse_ocr_stream
+
+    raw = json.dumps(textract_blocks(pages=3), ensure_ascii=False).encode("utf-8")
+    out_dir = str(workdir / "ocr")
+    # Same work as above through the client's streaming parser (body read in 64 KiB chunks)
+    return lambda: filter_textract_response(parse_ocr_stream(io.BytesIO(raw)), out_dir), 1
+
+
+@case("gpt_parse_generic_response")
+def _gpt_small(workdir: Path):
+    from rbidp.processors.filter_gpt_generic_response import parse_gpt_generic_response
+
+    raw = gpt_raw_response({"fio": NAMES[1], "doc_type": TITLES[0], "doc_date": "01.10.2025", "valid_until": None})
+    return lambda: parse_gpt_generic_response(raw), 1
+
+
+@case("gpt_parse_generic_response_long_echo")
+def _gpt_large(workdir: Path):
+    from rbidp.processors.filter_gpt_generic_response import parse_gpt_generic_response
+
+    # Long-document prompt echoed back (60k chars) behind 50 non-JSON lines
+    raw = gpt_raw_response({"single_doc_type": True}, prompt_chars=60000, noise_lines=50)
+    return lambda: parse_gpt_generic_response(raw), 1
+
+
+@case("gpt_parse_malformed_response")
+def _gpt_malformed(workdir: Path):
+    from rbidp.processors.filter_gpt_generic_response import parse_gpt_generic_response
+
+    # Fenced answer with a trailing comma: the local repair path
+    answer = json.dumps({"fio": NAMES[1], "doc_type": TITLES[0], "doc_date": "01.10.2025", "valid_until": None}, ensure_ascii=False)
+    raw = gpt_raw_response({}).rsplit("\n", 1)[0] + "\n" + json.dumps(
+        {"choices": [{"index": 0, "message": {"role": "assistant", "content": "```json\n" + answer[:-1] + ",\n}\n```"}}]},
+        ensure_ascii=False,
+    )
+    return lambda: parse_gpt_generic_response(raw), 1
+
+
+@case("multidoc_detect_3_pages")
+def _multidoc(workdir: Path):
+    from rbidp.processors.multidoc_detector import detect_multiple_documents
+
+    rng = random.Random(0)
+    pages_obj = {"pages": [{"page_number": i + 1, "text": page_text(rng, name=NAMES[0], title=TITLES[0])} for i in range(3)]}
+    return lambda: detect_multiple_documents(pages_obj), 1
+
+
+@case("validate_run")
+def _validate(workdir: Path):
+    from rbidp.processors.validator import validate_run
+
+    meta, merged = workdir / "metadata.json", workdir / "merged.json"
+    meta.write_text(json.dumps({"fio": "Сакариева Наргиз Кайратқызы", "doc_type": TITLES[0]}, ensure_ascii=False), encoding="utf-8")
+    merged.write_text(json.dumps({
+        "fio": "САКАРИЯЕВА НАРГИЗ КАЙРАТОВНА", "doc_type": TITLES[0], "doc_date": time.strftime("%d.%m.%Y"),
+        "valid_until": None, "single_doc_type": True,
+    }, ensure_ascii=False), encoding="utf-8")
+    return lambda: validate_run(str(meta), str(merged), str(workdir), write_file=False), 1
+
+
+def _date_strings(n: int) -> List[str]:
+    rng = random.Random(7)
+    out = []
+    for _ in range(n):
+        d, m, y = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2015, 2026)
+        out.append(rng.choice([f"{d:02d}.{m:02d}.{y}", f"{y}-{m:02d}-{d:02d}", f"{d:02d}/{m:02d}/{y}", f"{d} марта {y} г.", ""]))
+    return out
+
+
+@case("parse_doc_date_x1000")
+def _parse_dates(workdir: Path):
+    from rbidp.core.dates import parse_doc_date
+
+    values = _date_strings(1000)  # one in five unparseable, as OCR'd dates often are
+    return lambda: [parse_doc_date(v) for v in values], len(values)
+
+
+@case("compute_valid_until_x1000")
+def _valid_until(workdir: Path):
+    from rbidp.core.validity import VALIDITY_OVERRIDES, compute_valid_until
+
+    rng = random.Random(11)
+    doc_types = list(VALIDITY_OVERRIDES) + TITLES
+    dates = _date_strings(1000)
+    args = [(rng.choice(doc_types), dates[i], dates[-i - 1]) for i in range(len(dates))]
+    return lambda: [compute_valid_until(*a) for a in args], len(args)
+
+
+@case("count_pdf_pages_50mb")
+def _count_pages_big(workdir: Path):
+    from rbidp.orchestrator import _count_pdf_pages
+
+    path = workdir / "big.pdf"
+    path.write_bytes(make_pdf(3, tag="big", pad_bytes=50 * 1024 * 1024))
+    return lambda: _count_pdf_pages(str(path)), 1
+
+
+@case("count_pdf_pages_200p")
+def _count_pages_many(workdir: Path):
+    from rbidp.orchestrator import _count_pdf_pages
+
+    path = workdir / "many.pdf"
+    path.write_bytes(make_pdf(200, tag="many"))
+    return lambda: _count_pdf_pages(str(path)), 1
+
+
+def measure(fn: Callable[[], Any], repeat: int, min_seconds: float) -> Dict[str, Any]:
+    fn()  # warm-up: imports, caches
+    # Calls per repeat so one repeat lasts at least min_seconds (like timeit's autorange)
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_seconds or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_seconds / 10 else 2
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+
+    # Allocations of one call: peak traced memory above the starting point, and what stays allocated
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        del result
+        # Reference cycles (e.g. PDF readers) would otherwise show up as retained memory
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_us": round(median(times) * 1e6, 3),
+        "min_us": round(min(times) * 1e6, 3),
+        "calls": number * repeat,
+        "alloc_peak_bytes": peak - before,
+        "alloc_net_bytes": after - before,
+    }
+
+
+def run_cases(names: List[str], repeat: int, min_seconds: float) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    workdir = Path(tempfile.mkdtemp(prefix="rbidp-micro-"))
+    try:
+        for name in names:
+            fn, ops = CASES[name](workdir)
+            r = measure(fn, repeat, min_seconds)
+            if ops > 1:
+                r["ops"] = ops
+                r["per_op_us"] = round(r["median_us"] / ops, 3)
+            results[name] = r
+            print(f"{name:<40} {r['median_us']:>14.1f} us  peak {r['alloc_peak_bytes']:>12,} B", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Any],
+    time_threshold: float,
+    alloc_threshold: float,
+) -> List[Dict[str, Any]]:
+    """Regressions of results against baseline["cases"]; baseline["thresholds"][name] may override per case."""
+    regressions = []
+    overrides = baseline.get("thresholds", {})
+    for name, r in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base:
+            continue
+        limits = {"median_us": time_threshold, "alloc_peak_bytes": alloc_threshold}
+        limits["median_us"] = overrides.get(name, {}).get("time", limits["median_us"])
+        limits["alloc_peak_bytes"] = overrides.get(name, {}).get("alloc", limits["alloc_peak_bytes"])
+        for metric, limit in limits.items():
+            b, c = base.get(metric), r.get(metric)
+            # Allocations below 4 KiB are noise (interpreter caches), not a regression
+            if not b or c is None or (metric == "alloc_peak_bytes" and c < 4096):
+                continue
+            change = (c - b) / b
+            if change > limit:
+                regressions.append({"case": name, "metric": metric, "baseline": b, "current": c, "change_pct": round(change * 100, 1), "limit_pct": round(limit * 100, 1)})
+    return regressions
+
+
+def _machine() -> Dict[str, Any]:
+    return {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="RB IDP processor micro-benchmarks")
+    parser.add_argument("-k", "--filter", default="", help="Only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="Minimum duration of one repeat")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--time-threshold", type=float, default=TIME_THRESHOLD, help="Allowed slowdown, 0.25 = +25%%")
+    parser.add_argument("--alloc-threshold", type=float, default=ALLOC_THRESHOLD, help="Allowed growth of the allocation peak")
+    parser.add_argument("--out", default=None, help="Write the results JSON here")
+    args = parser.parse_args(argv)
+
+    names = [n for n in CASES if args.filter in n]
+    results = run_cases(names, args.repeat, args.min_seconds)
+    report: Dict[str, Any] = {"machine": _machine(), "cases": results}
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    baseline: Dict[str, Any] = {}
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+
+    if args.save_baseline:
+        # Keep per-case threshold overrides and cases that were not run this time
+        merged = {"machine": report["machine"], "thresholds": baseline.get("thresholds", {}), "cases": {**baseline.get("cases", {}), **results}}
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(merged, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved: {baseline_path}")
+        return
+
+    if not baseline:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        print("No baseline to compare against; record one with --save-baseline", file=sys.stderr)
+        return
+    if baseline.get("machine", {}).get("processor") != report["machine"]["processor"]:
+        print("Warning: baseline was recorded on a different machine; timings are not comparable", file=sys.stderr)
+    regressions = compare(results, baseline, args.time_threshold, args.alloc_threshold)
+    for r in regressions:
+        print(f"REGRESSION {r['case']} {r['metric']}: {r['baseline']} -> {r['current']} ({r['change_pct']:+.1f}% > {r['limit_pct']}%)")
+    if regressions:
+        sys.exit(1)
+    print(f"OK: {len(results)} cases within thresholds")
+
+
+if __name__ == "__main__":
+    main()
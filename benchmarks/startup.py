@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+# Cold-start benchmark: every measurement runs in a fresh interpreter.
+#
+#   python -m benchmarks.startup                       # import times + time to first result
+#   python -m benchmarks.startup --repeat 9 --out startup.json
+#
+# Exit status 1 when a lazily loaded dependency is imported eagerly again, or an import
+# exceeds --max-import-ms.
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# Loaded by the stage that needs them (or by warmup()), never by importing the entry points
+LAZY_MODULES = ("PIL", "rapidfuzz", "pypdf", "asyncio", "cProfile", "pstats")
+ENTRY_POINTS = ("rbidp.orchestrator", "rbidp.service.jobs", "rbidp.service.http_api")
+
+
+def _child_import(module: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    __import__(module)
+    import_ms = (time.perf_counter() - t0) * 1000
+    return {"import_ms": import_ms, "lazy_loaded": [m for m in LAZY_MODULES if m in sys.modules]}
+
+
+def _child_first_result(pdf_path: str, runs_root: str, warm: bool) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    from rbidp.orchestrator import run_pipeline, warmup
+
+    out: Dict[str, Any] = {"import_ms": (time.perf_counter() - t0) * 1000}
+    if warm:
+        t1 = time.perf_counter()
+        warmup()
+        out["warmup_ms"] = (time.perf_counter() - t1) * 1000
+
+    def one() -> float:
+        t = time.perf_counter()
+        run_pipeline(
+            fio="Иванов Иван Иванович",
+            reason="startup benchmark",
+            doc_type="Приказ работодателя о предоставлении отпуска без сохранения заработной платы",
+            source_file_path=pdf_path,
+            original_filename="startup.pdf",
+            content_type="application/pdf",
+            runs_root=Path(runs_root),
+        )
+        return (time.perf_counter() - t) * 1000
+
+    out["first_run_ms"] = one()
+    out["second_run_ms"] = one()
+    # From the start of the import to the first verdict
+    out["time_to_first_result_ms"] = (time.perf_counter() - t0) * 1000 - out["second_run_ms"]
+    return out
+
+
+def _spawn(args: List[str], env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "child", *args],
+        cwd=str(REPO_ROOT), env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - t0) * 1000
+    return result
+
+
+def _interpreter_ms() -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return (time.perf_counter() - t0) * 1000
+
+
+def _summarize(samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    keys = [k for k, v in samples[0].items() if isinstance(v, (int, float))]
+    return {k: round(median(s[k] for s in samples), 3) for k in keys}
+
+
+def top_imports(module: str, limit: int = 15) -> List[Dict[str, Any]]:
+    """Modules with the largest cumulative import time under `python -X importtime`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(REPO_ROOT), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        # "import time:  self [us] | cumulative | imported package" (name indented by nesting)
+        self_us, cum_us, name = line.split(":", 1)[1].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append({"module": name.strip(), "depth": depth, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cum_us) / 1000})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:limit]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from benchmarks.fixtures import make_pdf
+    from benchmarks.stubs import GPT_PATH, OCR_PATH
+
+    report: Dict[str, Any] = {"python": sys.version.split()[0], "repeat": args.repeat}
+    report["interpreter_ms"] = round(median(_interpreter_ms() for _ in range(args.repeat)), 3)
+    report["imports"] = {}
+    for module in ENTRY_POINTS:
+        samples = [_spawn(["import", module]) for _ in range(args.repeat)]
+        report["imports"][module] = {**_summarize(samples), "lazy_loaded": samples[0]["lazy_loaded"]}
+    report["top_imports"] = top_imports("rbidp.orchestrator")
+
+    stubs = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stubs", "--ocr-latency", "0", "--gpt-latency", "0"],
+        cwd=str(REPO_ROOT), stdout=subprocess.PIPE, text=True,
+    )
+    workdir = Path(tempfile.mkdtemp(prefix="rbidp-startup-"))
+    try:
+        base = f"http://127.0.0.1:{json.loads(stubs.stdout.readline())['port']}"
+        env = {
+            **os.environ,
+            "RBIDP_TEXTRACT_URL": base + OCR_PATH,
+            "RBIDP_GPT_URL": base + GPT_PATH,
+            "RBIDP_IDEMPOTENCY": "0",
+            "RBIDP_TRACING_EXPORTER": "none",
+        }
+        pdf = workdir / "startup.pdf"
+        pdf.write_bytes(make_pdf(2, tag="startup"))
+        for label, warm in (("cold", False), ("warmed", True)):
+            samples = [
+                _spawn(["first-result", str(pdf), str(workdir / f"runs-{label}-{i}")] + (["--warm"] if warm else []), env=env)
+                for i in range(args.repeat)
+            ]
+            report[f"first_result_{label}"] = _summarize(samples)
+    finally:
+        stubs.terminate()
+        stubs.wait(timeout=5)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="RB IDP cold-start benchmark")
+    sub = parser.add_subparsers(dest="cmd")
+    p_child = sub.add_parser("child", help=argparse.SUPPRESS)
+    p_child.add_argument("mode", choices=("import", "first-result"))
+    p_child.add_argument("target")
+    p_child.add_argument("runs_root", nargs="?")
+    p_child.add_argument("--warm", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=0, help="Fail when importing rbidp.orchestrator takes longer (0 = no limit)")
+    parser.add_argument("--out", default=None, help="Write the result JSON here")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "child":
+        if args.mode == "import":
+            result = _child_import(args.target)
+        else:
+            result = _child_first_result(args.target, args.runs_root, args.warm)
+        print(json.dumps(result))
+        return
+
+    report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+
+    failed = False
+    for module, r in report["imports"].items():
+        if r["lazy_loaded"]:
+            print(f"EAGER IMPORT {module} loads {', '.join(r['lazy_loaded'])}", file=sys.stderr)
+            failed = True
+    import_ms = report["imports"]["rbidp.orchestrator"]["import_ms"]
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        print(f"SLOW IMPORT rbidp.orchestrator: {import_ms:.1f} ms > {args.max_import_ms} ms", file=sys.stderr)
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
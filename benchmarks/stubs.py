@@ -0,0 +1,347 @@
+import re
+import sys
+import math
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+from benchmarks.fixtures import page_text
+
+# Local stand-ins for the Textract gateway (POST /v1/pdf, multipart) and the GPT gateway
+# (POST .../completions/v2), replaying the response shapes the pipeline parses.
+
+OCR_PATH = "/v1/pdf"
+GPT_PATH = "/openai/v1/completions/v2"
+
+_PAGE_RE = re.compile(rb"/Type\s*/Page\b")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Latency distribution in milliseconds -> sampler returning seconds:
+      "fixed:200", "uniform:100,400", "lognormal:300,0.5" (median ms, sigma), "0" (none)
+    """
+    kind, _, args = spec.partition(":")
+    if not args:
+        ms = float(kind or 0)
+        return lambda rng: ms / 1000.0
+    vals = [float(x) for x in args.split(",")]
+    if kind == "fixed":
+        return lambda rng: vals[0] / 1000.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(vals[0], vals[1]) / 1000.0
+    if kind == "lognormal":
+        mu = math.log(vals[0])
+        sigma = vals[1] if len(vals) > 1 else 0.5
+        return lambda rng: rng.lognormvariate(mu, sigma) / 1000.0
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class StubState:
+    def __init__(
+        self,
+        ocr_latency: str,
+        gpt_latency: str,
+        ocr_error_rate: float,
+        gpt_error_rate: float,
+        seed: int,
+        gpt_token_ms: float = 0.0,
+        gpt_trailing_tokens: int = 40,
+        max_concurrency: Optional[Dict[str, int]] = None,
+        gpt_malformed_rate: float = 0.0,
+        ocr_ms_per_mb: float = 0.0,
+    ):
+        # Requests in flight beyond this are throttled with 429, like the real gateways (0 = no cap)
+        self.max_concurrency = {"ocr": 0, "gpt": 0, **(max_concurrency or {})}
+        self.in_flight = {"ocr": 0, "gpt": 0}
+        self.ocr_latency = parse_latency(ocr_latency)
+        self.gpt_latency = parse_latency(gpt_latency)
+        self.gpt_token_ms = gpt_token_ms
+        self.gpt_trailing_tokens = gpt_trailing_tokens
+        self.ocr_error_rate = ocr_error_rate
+        self.gpt_error_rate = gpt_error_rate
+        self.gpt_malformed_rate = gpt_malformed_rate
+        # Upload and image decoding time of the OCR engine, proportional to the payload size
+        self.ocr_ms_per_mb = ocr_ms_per_mb
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"ocr": 0, "gpt": 0, "ocr_errors": 0, "gpt_errors": 0, "gpt_stream_tokens": 0, "gpt_stream_closed_early": 0,
+                       "ocr_throttled": 0, "gpt_throttled": 0, "ocr_peak_in_flight": 0, "gpt_peak_in_flight": 0,
+                       "gpt_prompt_tokens": 0, "gpt_completion_tokens": 0, "gpt_malformed": 0, "gpt_repair_asks": 0,
+                       "ocr_bytes": 0}
+
+    def add(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counts[key] += n
+
+    def enter(self, kind: str) -> bool:
+        """Admit one request of `kind`, or count it as throttled when the cap is reached."""
+        with self._lock:
+            cap = self.max_concurrency[kind]
+            if cap and self.in_flight[kind] >= cap:
+                self.counts[f"{kind}_throttled"] += 1
+                return False
+            self.in_flight[kind] += 1
+            self.counts[f"{kind}_peak_in_flight"] = max(self.counts[f"{kind}_peak_in_flight"], self.in_flight[kind])
+            return True
+
+    def leave(self, kind: str) -> None:
+        with self._lock:
+            self.in_flight[kind] -= 1
+
+    def draw(self, kind: str) -> Dict[str, Any]:
+        # One locked draw per request keeps runs reproducible for a given seed and arrival order
+        with self._lock:
+            self.counts[kind] += 1
+            sampler = self.ocr_latency if kind == "ocr" else self.gpt_latency
+            rate = self.ocr_error_rate if kind == "ocr" else self.gpt_error_rate
+            fail = self._rng.random() < rate
+            if fail:
+                self.counts[f"{kind}_errors"] += 1
+            draw = {"delay": sampler(self._rng), "fail": fail, "seed": self._rng.random(), "malformed": None}
+            # Drawn only when enabled, so existing seeds replay the same runs
+            if kind == "gpt" and self.gpt_malformed_rate and self._rng.random() < self.gpt_malformed_rate:
+                draw["malformed"] = self._rng.choice(_MALFORMED)
+            return draw
+
+
+def _ocr_response(body: bytes, seed: float) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    pages = max(1, len(_PAGE_RE.findall(body)))
+    name = "Иванов Иван Иванович"
+    title = "Приказ работодателя о предоставлении отпуска без сохранения заработной платы"
+    return {
+        "success": True,
+        "data": {
+            "pages": [
+                {"page_number": i + 1, "text": page_text(rng, name=name, title=title) + f"\nref {seed:.12f}"}
+                for i in range(pages)
+            ]
+        },
+    }
+
+
+# Ways models break the JSON of an answer: the first two are repaired locally, a cut-off answer
+# needs the repair re-ask (rbidp.processors.agent_json_repair)
+_MALFORMED = ("fence_trailing_comma", "single_quotes", "truncated")
+_REPAIR_MARKER = "was meant to be ONE JSON object"
+_PAIR_RE = re.compile(r"""["']?(\w+)["']?\s*:\s*("(?:[^"\\]|\\.)*"|'[^']*'|true|false|null)""")
+
+
+def _malform(answer: str, kind: str) -> str:
+    if kind == "fence_trailing_comma":
+        return "```json\n" + answer[:-1] + ",}\n```"
+    if kind == "single_quotes":
+        return answer.replace('"', "'")
+    return answer[: len(answer) * 2 // 3]
+
+
+def _repair_answer(prompt: str) -> Dict[str, Any]:
+    # What a model makes of a broken object: the complete key/value pairs, the rest null
+    head, _, text = prompt.partition("Text:")
+    keys = re.search(r"Keys of the object: (.*)", head)
+    out: Dict[str, Any] = {k: None for k in keys.group(1).split(", ")} if keys else {}
+    for key, value in _PAIR_RE.findall(text):
+        out[key] = json.loads('"' + value[1:-1] + '"') if value[0] in "'\"" else json.loads(value)
+    return out
+
+
+def _gpt_answer(prompt: str) -> Dict[str, Any]:
+    fields = {
+        "fio": "Иванов Иван Иванович",
+        "doc_type": "Приказ работодателя о предоставлении отпуска без сохранения заработной платы",
+        "doc_date": time.strftime("%d.%m.%Y"),
+        "valid_until": None,
+    }
+    if "single_doc_type" in prompt:
+        # The combined prompt (rbidp.processors.agent_combined) also asks for the fields
+        return {"single_doc_type": True, **fields} if '"fio"' in prompt else {"single_doc_type": True}
+    return fields
+
+
+def _tokens(text: str) -> list:
+    # Model-like tokens: short pieces of the text, punctuation on its own
+    return re.findall(r"\w{1,4}|\s+|[^\w\s]", text)
+
+
+_TRAILING = " Ответ сформирован на основании распознанного текста документа." * 20
+
+
+def _completion_tokens(state: StubState, answer: str) -> list:
+    return _tokens(answer) + _tokens(_TRAILING)[:state.gpt_trailing_tokens]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server_version = "rbidp-stub/1"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        return
+
+    def _send(self, status: int, payload: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        if self.path == "/stats":
+            self._send(200, json.dumps(self.server.state.counts).encode("utf-8"))  # type: ignore[attr-defined]
+        else:
+            self._send(404, b"{}")
+
+    def do_POST(self) -> None:
+        state: StubState = self.server.state  # type: ignore[attr-defined]
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        kind = {OCR_PATH: "ocr", GPT_PATH: "gpt"}.get(self.path)
+        if kind is None:
+            self._send(404, b"{}")
+            return
+        if not state.enter(kind):
+            self._send(429, b'{"error": "stub: too many requests"}')
+            return
+        try:
+            self._handle(state, body)
+        finally:
+            state.leave(kind)
+
+    def _handle(self, state: StubState, body: bytes) -> None:
+        if self.path == OCR_PATH:
+            draw = state.draw("ocr")
+            state.add("ocr_bytes", len(body))
+            time.sleep(draw["delay"] + state.ocr_ms_per_mb * len(body) / 1e9)
+            if draw["fail"]:
+                # The gateway reports OCR failures in-band
+                obj: Dict[str, Any] = {"success": False, "message": "stub: OCR engine error"}
+            else:
+                obj = _ocr_response(body, draw["seed"])
+            self._send(200, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+        elif self.path == GPT_PATH:
+            draw = state.draw("gpt")
+            time.sleep(draw["delay"])
+            if draw["fail"]:
+                self._send(502, b'{"error": "stub: upstream model error"}')
+                return
+            req = json.loads(body or b"{}")
+            prompt = req.get("Content") or ""
+            if _REPAIR_MARKER in prompt:
+                state.add("gpt_repair_asks")
+                answer = json.dumps(_repair_answer(prompt), ensure_ascii=False)
+            else:
+                answer = json.dumps(_gpt_answer(prompt), ensure_ascii=False)
+                if draw["malformed"]:
+                    state.add("gpt_malformed")
+                    answer = _malform(answer, draw["malformed"])
+            # Model-like token counts (see _tokens) for head-to-head prompt comparisons
+            state.add("gpt_prompt_tokens", len(_tokens(prompt)))
+            state.add("gpt_completion_tokens", len(_tokens(answer)))
+            if req.get("Stream"):
+                self._stream_completion(state, req, prompt, answer)
+                return
+            # Without streaming the whole completion (answer and trailing tokens) is generated first
+            time.sleep(state.gpt_token_ms * len(_completion_tokens(state, answer)) / 1000.0)
+            # The gateway echoes the request (Model/Content) on the first line, then the completion
+            echo = {"Model": req.get("Model"), "Content": prompt[:200], "Temperature": req.get("Temperature")}
+            completion: Dict[str, Any] = {"choices": [{"index": 0, "message": {"role": "assistant", "content": answer}}]}
+            prompt_tokens, completion_tokens = len(_tokens(prompt)), len(_completion_tokens(state, answer))
+            completion["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+            payload = json.dumps(echo, ensure_ascii=False) + "\n" + json.dumps(completion, ensure_ascii=False)
+            self._send(200, payload.encode("utf-8"))
+
+
+    def _stream_completion(self, state: StubState, req: Dict[str, Any], prompt: str, answer: str) -> None:
+        """
+        Server-sent events over a chunked response, one token per event every gpt_token_ms:
+        the prompt echo, the JSON answer, then gpt_trailing_tokens of chatter (the tokens a
+        client saves by closing once the JSON is complete) and [DONE].
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(obj: Any) -> None:
+            data = b"data: " + (obj if isinstance(obj, bytes) else json.dumps(obj, ensure_ascii=False).encode("utf-8")) + b"\n\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        tokens = _completion_tokens(state, answer)
+        try:
+            event({"Model": req.get("Model"), "Content": prompt[:200]})
+            for tok in tokens:
+                time.sleep(state.gpt_token_ms / 1000.0)
+                event({"choices": [{"index": 0, "delta": {"content": tok}}]})
+                state.add("gpt_stream_tokens")
+            event(b"[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading once its answer was complete
+            state.add("gpt_stream_closed_early")
+            self.close_connection = True
+
+
+def make_stub_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    ocr_latency: str = "lognormal:800,0.4",
+    gpt_latency: str = "lognormal:1200,0.4",
+    ocr_error_rate: float = 0.0,
+    gpt_error_rate: float = 0.0,
+    seed: int = 0,
+    gpt_token_ms: float = 0.0,
+    gpt_trailing_tokens: int = 40,
+    max_concurrency: Optional[Dict[str, int]] = None,
+    gpt_malformed_rate: float = 0.0,
+    ocr_ms_per_mb: float = 0.0,
+) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = StubState(  # type: ignore[attr-defined]
+        ocr_latency, gpt_latency, ocr_error_rate, gpt_error_rate, seed, gpt_token_ms, gpt_trailing_tokens, max_concurrency,
+        gpt_malformed_rate, ocr_ms_per_mb,
+    )
+    return server
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Stub Textract/GPT gateways for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--ocr-latency", default="lognormal:800,0.4")
+    parser.add_argument("--gpt-latency", default="lognormal:1200,0.4")
+    parser.add_argument("--ocr-error-rate", type=float, default=0.0)
+    parser.add_argument("--gpt-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gpt-token-ms", type=float, default=0.0, help="Generation time per completion token (streamed or not)")
+    parser.add_argument("--gpt-trailing-tokens", type=int, default=40, help="Tokens streamed after the JSON answer")
+    parser.add_argument("--ocr-max-concurrency", type=int, default=0, help="Answer 429 above this many OCR requests in flight (0 = no cap)")
+    parser.add_argument("--gpt-max-concurrency", type=int, default=0, help="Answer 429 above this many GPT requests in flight (0 = no cap)")
+    parser.add_argument("--gpt-malformed-rate", type=float, default=0.0, help="Share of GPT answers with broken JSON")
+    parser.add_argument("--ocr-ms-per-mb", type=float, default=0.0, help="Extra OCR latency per MB of payload")
+    args = parser.parse_args(argv)
+
+    server = make_stub_server(
+        args.host, args.port, args.ocr_latency, args.gpt_latency, args.ocr_error_rate, args.gpt_error_rate, args.seed,
+        args.gpt_token_ms, args.gpt_trailing_tokens,
+        {"ocr": args.ocr_max_concurrency, "gpt": args.gpt_max_concurrency},
+        args.gpt_malformed_rate, args.ocr_ms_per_mb,
+    )
+    # The parent process reads the bound port from the first stdout line
+    print(json.dumps({"port": server.server_address[1]}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
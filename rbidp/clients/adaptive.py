@@ -0,0 +1,183 @@
+import time
+import socket
+import threading
+import urllib.error
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from rbidp.clients.scheduler import SlotScheduler, get_scheduler
+from rbidp.core import metrics, tracing
+from rbidp.core.config import (
+    ADAPTIVE_BACKOFF,
+    ADAPTIVE_CONCURRENCY,
+    ADAPTIVE_LATENCY_TOLERANCE,
+    ADAPTIVE_MAX_SLOTS,
+    ADAPTIVE_MIN_SLOTS,
+)
+
+# Adaptive concurrency for upstream calls (AIMD, after Netflix's concurrency-limits): every
+# finished call is a sample. While latency stays near the no-load baseline and the limit is
+# actually used, the limit grows by about one slot per limit's worth of calls; a throttled or
+# failed call (429, 5xx, connection error, timeout) or latency growth cuts it multiplicatively.
+# The limit is applied to the endpoint's SlotScheduler, so priorities and reservations still hold.
+# Latency is judged per call class (GPT: max_tokens bucket, OCR: page count bucket): a short DTC
+# answer and a long extraction have different no-load latencies, and a mix of them is not load.
+
+# Smoothing of the short-term latency, and how fast the no-load baseline may drift upwards
+_SHORT_ALPHA = 0.2
+_BASELINE_DRIFT = 0.01
+
+
+class AimdLimit:
+    def __init__(
+        self,
+        resource: str,
+        initial: int,
+        min_limit: int = ADAPTIVE_MIN_SLOTS,
+        max_limit: int = 64,
+        backoff: float = ADAPTIVE_BACKOFF,
+        tolerance: float = ADAPTIVE_LATENCY_TOLERANCE,
+    ):
+        self.resource = resource
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.backoff = min(0.99, max(0.1, backoff))
+        self.tolerance = max(1.0, tolerance)
+        # Per call class: [no-load latency estimate, smoothed recent latency], seconds
+        self.classes: Dict[str, List[float]] = {}
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _decrease(self, reason: str) -> None:
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self._last_decrease = time.monotonic()
+        metrics.inc("adaptive_limit_decrease_total", resource=self.resource, reason=reason)
+
+    def on_sample(self, started: float, seconds: float, in_flight: int, dropped: Optional[str] = None, call_class: str = "") -> int:
+        """
+        Feed one finished call (started = time.monotonic() at its start). dropped names the
+        failure kind of a throttled/failed call; call_class groups calls of comparable latency.
+        Returns the new integer limit.
+        """
+        with self._lock:
+            # Calls that started before the last cut reflect the old limit: they may not cut again
+            fresh = started >= self._last_decrease
+            if dropped is not None:
+                if fresh:
+                    self._decrease(dropped)
+            else:
+                stats = self.classes.get(call_class)
+                if stats is None:
+                    stats = self.classes[call_class] = [seconds, seconds]
+                else:
+                    if seconds < stats[0]:
+                        stats[0] = seconds
+                    else:
+                        stats[0] += (seconds - stats[0]) * _BASELINE_DRIFT
+                    stats[1] += (seconds - stats[1]) * _SHORT_ALPHA
+                baseline, short = stats
+                if short > self.tolerance * baseline:
+                    if fresh:
+                        self._decrease("latency")
+                elif in_flight * 2 >= self.limit:
+                    # Only grow a limit that is actually in use (not app-limited)
+                    self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            return int(self.limit)
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "classes": {
+                    k: {"baseline_ms": round(b * 1000, 3), "latency_ms": round(s * 1000, 3)}
+                    for k, (b, s) in sorted(self.classes.items())
+                },
+            }
+
+
+_limits: Dict[str, AimdLimit] = {}
+_limits_lock = threading.Lock()
+
+
+def get_limit(resource: str) -> Optional[AimdLimit]:
+    """The AIMD controller of an endpoint ("ocr" | "gpt"), or None when adaptive concurrency is off."""
+    if not ADAPTIVE_CONCURRENCY:
+        return None
+    with _limits_lock:
+        limit = _limits.get(resource)
+        if limit is None:
+            scheduler = get_scheduler(resource)
+            # Never below the interactive reservation plus one slot: a slow upstream must not
+            # hand the last slot to backfill traffic
+            limit = AimdLimit(
+                resource,
+                scheduler.slots,
+                min_limit=max(ADAPTIVE_MIN_SLOTS, scheduler.reserved + 1),
+                max_limit=ADAPTIVE_MAX_SLOTS.get(resource, 64),
+            )
+            _limits[resource] = limit
+        return limit
+
+
+def upstream_limits() -> Dict[str, Dict[str, Any]]:
+    """Current concurrency limit per endpoint (adaptive state when enabled)."""
+    with _limits_lock:
+        adaptive = dict(_limits)
+    out: Dict[str, Dict[str, Any]] = {}
+    for resource in ("ocr", "gpt"):
+        if resource in adaptive:
+            out[resource] = {"adaptive": True, **adaptive[resource].state()}
+        else:
+            out[resource] = {"adaptive": False, "limit": get_scheduler(resource).slots}
+    return out
+
+
+def _drop_kind(e: BaseException) -> Optional[str]:
+    if isinstance(e, urllib.error.HTTPError):
+        if e.code == 429:
+            return "throttled"
+        return "server_error" if e.code >= 500 else None
+    if isinstance(e, (socket.timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(e, (urllib.error.URLError, ConnectionError)):
+        return "connection"
+    return None
+
+
+def size_class(kind: str, n: int) -> str:
+    """Call class by size, in power-of-two buckets: size_class("pages", 3) == "pages<=4"."""
+    bucket = 1
+    while bucket < n:
+        bucket *= 2
+    return f"{kind}<={bucket}"
+
+
+@contextmanager
+def sample(resource: str, call_class: str = "") -> Iterator[None]:
+    """
+    Time the upstream exchange in the block and feed the outcome to the endpoint's AIMD limit;
+    call_class (see size_class) separates calls whose no-load latencies differ.
+    """
+    limit = get_limit(resource)
+    if limit is None:
+        yield
+        return
+    scheduler = get_scheduler(resource)
+    started = time.monotonic()
+    try:
+        yield
+    except BaseException as e:
+        dropped = _drop_kind(e)
+        if dropped is None:
+            raise  # a client-side error says nothing about upstream load
+        _update(limit, scheduler, started, dropped, call_class)
+        raise
+    _update(limit, scheduler, started, None, call_class)
+
+
+def _update(limit: AimdLimit, scheduler: SlotScheduler, started: float, dropped: Optional[str], call_class: str) -> None:
+    new = limit.on_sample(started, time.monotonic() - started, scheduler.in_use(), dropped, call_class)
+    if new != scheduler.slots:
+        scheduler.set_limit(new)
+    tracing.set_attributes(concurrency_limit=new)
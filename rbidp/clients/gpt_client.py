@@ -1,13 +1,23 @@
 import json
+import time
+import urllib.error
 import urllib.request
 import ssl
+from typing import Any, List, Optional
+from rbidp.clients.adaptive import sample, size_class
+from rbidp.clients.ratelimit import rate_limit
+from rbidp.clients.scheduler import upstream_slot
+from rbidp.clients.singleflight import gpt_flight, payload_key
+from rbidp.core import metrics, tracing
+from rbidp.core.usage import record_call
+from rbidp.core.config import GPT_STREAM, GPT_URL
  
 def call_fortebank_gpt(prompt: str, model: str = "gpt-4o-mini", temperature: float = 0.1, max_tokens: int = 200) -> str:
     """
     Calls the internal ForteBank GPT endpoint and returns the model's response as a string.
     """
  
-    url = "https://dl-ai-dev-app01-uv01.fortebank.com/openai/v1/completions/v2"
+    url = GPT_URL
     payload = {
         "Model": model,
         "Content": prompt,
@@ -24,13 +34,155 @@ def call_fortebank_gpt(prompt: str, model: str = "gpt-4o-mini", temperature: flo
     # ignore SSL verification (self-signed certs)
     context = ssl._create_unverified_context()
  
-    with urllib.request.urlopen(req, context=context) as response:
-        raw = response.read().decode("utf-8")
+    with tracing.span("gpt.http", url=url, model=model, max_tokens=max_tokens, request_bytes=len(data)) as s, rate_limit("gpt"), sample("gpt", size_class("max_tokens", max_tokens)):
+        try:
+            with urllib.request.urlopen(req, context=context) as response:
+                body = response.read()
+                s.set(http_status=response.status, response_bytes=len(body))
+        except urllib.error.HTTPError as e:
+            s.set(http_status=e.code)
+            raise
+        raw = body.decode("utf-8")
  
     return raw
 
-def ask_gpt(prompt: str, model: str = "gpt-4o-mini", temperature: float = 0.1, max_tokens: int = 200) -> str:
-    raw = call_fortebank_gpt(prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+
+class JsonObjectScanner:
+    """
+    Incremental scanner over streamed text: feed() pieces as they arrive; it returns the text of
+    the first complete top-level {...} object (anything before it, e.g. a ```json fence, is
+    skipped), or None while the object is still open. Braces inside strings are ignored.
+    """
+
+    def __init__(self) -> None:
+        self._parts: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.result: Optional[str] = None
+
+    def feed(self, text: str) -> Optional[str]:
+        if self.result is not None:
+            return self.result
+        start = 0
+        for i, ch in enumerate(text):
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    start = i
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(text[start:i + 1])
+                    self.result = "".join(self._parts)
+                    return self.result
+        if self._depth > 0:
+            self._parts.append(text[start:])
+        return None
+
+
+def _stream_delta(event: Any) -> Optional[str]:
+    """Completion text carried by one stream event (OpenAI-style delta, text or full message)."""
+    if not isinstance(event, dict):
+        return None
+    choices = event.get("choices")
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        c0 = choices[0]
+        for part in (c0.get("delta"), c0.get("message")):
+            if isinstance(part, dict) and isinstance(part.get("content"), str):
+                return part["content"]
+        if isinstance(c0.get("text"), str):
+            return c0["text"]
+        return None
+    # Gateway prompt echo (Model/Content) carries no completion
+    if "Model" in event:
+        return None
+    content = event.get("content")
+    return content if isinstance(content, str) else None
+
+
+def call_fortebank_gpt_stream(prompt: str, model: str = "gpt-4o-mini", temperature: float = 0.1, max_tokens: int = 200) -> str:
+    """
+    Streaming variant of call_fortebank_gpt: requests a server-sent event stream and returns as
+    soon as the completion contains a complete JSON object, closing the connection so trailing
+    tokens are neither waited for nor generated. Returns that object's text, or the whole
+    completion text when no object closes. A gateway that ignores "Stream" and answers with a
+    plain body is read to the end and returned as-is, like call_fortebank_gpt.
+    """
+    url = GPT_URL
+    payload = {
+        "Model": model,
+        "Content": prompt,
+        "Temperature": temperature,
+        "MaxTokens": max_tokens,
+        "Stream": True,
+    }
+    data = json.dumps(payload).encode("utf-8")
+    req = urllib.request.Request(url, data=data, headers={
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }, method="POST")
+    context = ssl._create_unverified_context()
+
+    with tracing.span("gpt.http", url=url, model=model, max_tokens=max_tokens, request_bytes=len(data), streamed=True) as s, rate_limit("gpt"), sample("gpt", size_class("max_tokens", max_tokens)):
+        started = time.perf_counter()
+        try:
+            response = urllib.request.urlopen(req, context=context)
+        except urllib.error.HTTPError as e:
+            s.set(http_status=e.code)
+            raise
+        try:
+            s.set(http_status=response.status)
+            if "text/event-stream" not in (response.headers.get("Content-Type") or ""):
+                body = response.read()
+                s.set(response_bytes=len(body))
+                return body.decode("utf-8")
+
+            scanner = JsonObjectScanner()
+            text: List[str] = []
+            received = 0
+            for line in response:
+                received += len(line)
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue  # SSE comments, event names, keep-alives
+                event_data = line[5:].strip()
+                if event_data == b"[DONE]":
+                    break
+                try:
+                    delta = _stream_delta(json.loads(event_data))
+                except ValueError:
+                    continue
+                if not delta:
+                    continue
+                if not text:
+                    s.set(first_token_ms=round((time.perf_counter() - started) * 1000, 3))
+                text.append(delta)
+                if scanner.feed(delta) is not None:
+                    # Early termination: the answer is complete, drop the rest of the stream
+                    s.set(early_close=True)
+                    metrics.inc("gpt_stream_early_close_total")
+                    break
+            s.set(response_bytes=received)
+            return scanner.result if scanner.result is not None else "".join(text)
+        finally:
+            response.close()
+
+
+def _completion_text(raw: str) -> str:
+    """The model's answer inside a gateway response (OpenAI-style choices or content), else raw."""
     try:
         obj = json.loads(raw)
         if isinstance(obj, dict):
@@ -51,4 +203,23 @@ def ask_gpt(prompt: str, model: str = "gpt-4o-mini", temperature: float = 0.1, m
                 return content
         return raw
     except Exception:
-        return raw
\ No newline at end of file
+        return raw
+
+
+def ask_gpt(prompt: str, model: str = "gpt-4o-mini", temperature: float = 0.1, max_tokens: int = 200) -> str:
+    stream = GPT_STREAM
+
+    def call() -> str:
+        with upstream_slot("gpt"):
+            if stream:
+                raw = call_fortebank_gpt_stream(prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+            else:
+                raw = call_fortebank_gpt(prompt, model=model, temperature=temperature, max_tokens=max_tokens)
+        # Only the request that reached the gateway is billed (coalesced callers get its answer)
+        record_call(model, prompt, raw, completion=_completion_text(raw))
+        return raw
+
+    # Identical prompts already in flight (double-submits, batch bursts) share one request
+    with tracing.span("gpt.request", model=model, prompt_chars=len(prompt)):
+        raw = gpt_flight.do(payload_key(model, temperature, max_tokens, stream, prompt), call)
+    return _completion_text(raw)
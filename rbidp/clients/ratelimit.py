@@ -0,0 +1,236 @@
+import os
+import time
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from rbidp.core import metrics, tracing
+from rbidp.core.config import (
+    RATELIMIT_BURST,
+    RATELIMIT_CONCURRENCY,
+    RATELIMIT_DB_PATH,
+    RATELIMIT_LEASE_SECONDS,
+    RATELIMIT_POLL_SECONDS,
+    RATELIMIT_RPS,
+)
+
+# Node-wide budgets for the upstream gateways. Every process on the node (Streamlit replicas, API
+# pool workers, job workers) that points at the same SQLite file shares one token bucket
+# (requests per second) and one in-flight budget per endpoint. Callers take a ticket and are
+# served strictly in ticket order, so a burst queues instead of tripping upstream throttling.
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    endpoint TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    endpoint TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    seen_at REAL NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS tickets_endpoint ON tickets (endpoint, state, id);
+"""
+
+# A waiting ticket whose process stopped polling for this long is dropped from the queue
+_STALE_WAITER_SECONDS = 10.0
+# Longest single sleep of a waiter, so it keeps its ticket fresh and notices freed budget
+_MAX_SLEEP_SECONDS = 1.0
+
+
+def _pid_alive(pid: int) -> bool:
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class NodeRateLimiter:
+    """
+    Token bucket (`rps`, up to `burst` requests at once after idling) plus a cap of
+    `max_concurrent` requests in flight, for one endpoint, shared through SQLite.
+    rps = 0 or max_concurrent = 0 leaves that dimension unlimited.
+    An active ticket is held until release(); one left behind by a crashed process is reclaimed
+    when its pid is gone or after `lease_seconds`.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        db_path: str,
+        rps: float = 0.0,
+        burst: float = 0.0,
+        max_concurrent: int = 0,
+        lease_seconds: float = RATELIMIT_LEASE_SECONDS,
+        poll_seconds: float = RATELIMIT_POLL_SECONDS,
+    ):
+        self.endpoint = endpoint
+        self.db_path = str(db_path)
+        self.rps = max(0.0, float(rps))
+        self.burst = max(1.0, float(burst or self.rps))
+        self.max_concurrent = max(0, int(max_concurrent))
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = max(0.001, poll_seconds)
+        self._local = threading.local()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # Per thread, and never inherited across fork (ProcessPoolExecutor workers)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _enqueue(self, conn: sqlite3.Connection, now: float) -> int:
+        cur = conn.execute(
+            "INSERT INTO tickets (endpoint, pid, state, seen_at) VALUES (?, ?, 'waiting', ?)",
+            (self.endpoint, os.getpid(), now),
+        )
+        return int(cur.lastrowid)
+
+    def _reap_dead(self, conn: sqlite3.Connection) -> int:
+        rows = conn.execute(
+            "SELECT id, pid FROM tickets WHERE endpoint = ? AND state = 'active' AND pid != ?",
+            (self.endpoint, os.getpid()),
+        ).fetchall()
+        dead = [(tid,) for tid, pid in rows if not _pid_alive(pid)]
+        if dead:
+            conn.executemany("DELETE FROM tickets WHERE id = ?", dead)
+            metrics.inc("ratelimit_reclaimed_total", len(dead), endpoint=self.endpoint)
+        return len(dead)
+
+    def _try_grant(self, conn: sqlite3.Connection, ticket: int) -> Tuple[int, float]:
+        """One attempt: (ticket, 0.0) when granted, else (ticket, seconds to sleep before the next)."""
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM tickets WHERE endpoint = ? AND "
+                "((state = 'waiting' AND seen_at < ?) OR (state = 'active' AND expires_at < ?))",
+                (self.endpoint, now - _STALE_WAITER_SECONDS, now),
+            )
+            if conn.execute("UPDATE tickets SET seen_at = ? WHERE id = ?", (now, ticket)).rowcount == 0:
+                # Reaped as stale (the process stalled): rejoin at the back of the queue
+                ticket = self._enqueue(conn, now)
+            head = conn.execute(
+                "SELECT MIN(id) FROM tickets WHERE endpoint = ? AND state = 'waiting'", (self.endpoint,)
+            ).fetchone()[0]
+            delay = self.poll_seconds
+            granted = head == ticket
+            if granted and self.max_concurrent:
+                active = conn.execute(
+                    "SELECT COUNT(*) FROM tickets WHERE endpoint = ? AND state = 'active'", (self.endpoint,)
+                ).fetchone()[0]
+                granted = active < self.max_concurrent or active - self._reap_dead(conn) < self.max_concurrent
+            if granted and self.rps:
+                row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE endpoint = ?", (self.endpoint,)).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rps)
+                granted = tokens >= 1.0
+                if granted:
+                    tokens -= 1.0
+                else:
+                    delay = (1.0 - tokens) / self.rps
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (endpoint, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self.endpoint, tokens, now),
+                )
+            if granted:
+                conn.execute(
+                    "UPDATE tickets SET state = 'active', expires_at = ? WHERE id = ?",
+                    (now + self.lease_seconds, ticket),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return ticket, 0.0 if granted else min(_MAX_SLEEP_SECONDS, max(self.poll_seconds, delay))
+
+    def acquire(self) -> Tuple[int, float]:
+        """Block until this caller's ticket is served; returns (ticket, seconds waited)."""
+        start = time.monotonic()
+        conn = self._conn()
+        ticket = self._enqueue(conn, time.time())
+        try:
+            while True:
+                ticket, delay = self._try_grant(conn, ticket)
+                if not delay:
+                    break
+                time.sleep(delay)
+        except BaseException:
+            conn.execute("DELETE FROM tickets WHERE id = ?", (ticket,))
+            raise
+        return ticket, time.monotonic() - start
+
+    def release(self, ticket: int) -> None:
+        self._conn().execute("DELETE FROM tickets WHERE id = ?", (ticket,))
+
+    def status(self) -> Dict[str, int]:
+        rows = self._conn().execute(
+            "SELECT state, COUNT(*) FROM tickets WHERE endpoint = ? GROUP BY state", (self.endpoint,)
+        ).fetchall()
+        counts = dict(rows)
+        return {"active": counts.get("active", 0), "waiting": counts.get("waiting", 0)}
+
+
+_limiters: Dict[str, Optional[NodeRateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(endpoint: str) -> Optional[NodeRateLimiter]:
+    """The node-wide limiter of an endpoint ("ocr" | "gpt"), or None when it has no budget set."""
+    with _limiters_lock:
+        if endpoint not in _limiters:
+            rps = RATELIMIT_RPS.get(endpoint, 0.0)
+            concurrency = RATELIMIT_CONCURRENCY.get(endpoint, 0)
+            limiter = None
+            if rps > 0 or concurrency > 0:
+                limiter = NodeRateLimiter(
+                    endpoint, RATELIMIT_DB_PATH, rps=rps, burst=RATELIMIT_BURST.get(endpoint, 0.0), max_concurrent=concurrency
+                )
+            _limiters[endpoint] = limiter
+        return _limiters[endpoint]
+
+
+@contextmanager
+def rate_limit(endpoint: str) -> Iterator[None]:
+    """Hold one request of the node-wide `endpoint` budget for the duration of the block."""
+    limiter = get_limiter(endpoint)
+    ticket: Optional[int] = None
+    if limiter is not None:
+        try:
+            ticket, waited = limiter.acquire()
+        except sqlite3.Error as e:
+            # The limiter protects the upstream; it must never take the pipeline down itself
+            logger.warning("Rate limiter for %s unavailable, proceeding without it: %s", endpoint, e)
+            metrics.inc("ratelimit_errors_total", endpoint=endpoint)
+        else:
+            metrics.observe("ratelimit_wait_seconds", waited, endpoint=endpoint)
+            tracing.set_attributes(ratelimit_wait_ms=round(waited * 1000, 3))
+    try:
+        yield
+    finally:
+        if ticket is not None:
+            try:
+                limiter.release(ticket)  # type: ignore[union-attr]
+            except sqlite3.Error as e:
+                # The lease expiry reclaims it
+                logger.warning("Rate limiter for %s: release failed: %s", endpoint, e)
+                metrics.inc("ratelimit_errors_total", endpoint=endpoint)
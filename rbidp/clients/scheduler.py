@@ -0,0 +1,162 @@
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from rbidp.core import metrics, tracing
+from rbidp.core.config import (
+    SCHED_SLOTS,
+    SCHED_INTERACTIVE_RESERVED,
+    SCHED_WEIGHTS,
+)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+_current_priority: contextvars.ContextVar[str] = contextvars.ContextVar("rbidp_priority", default=PRIORITY_INTERACTIVE)
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+@contextmanager
+def priority_scope(priority: Optional[str]) -> Iterator[str]:
+    """Tag all upstream calls made inside the block (same thread/context) with a priority class."""
+    p = priority if priority in PRIORITY_CLASSES else PRIORITY_INTERACTIVE
+    token = _current_priority.set(p)
+    try:
+        yield p
+    finally:
+        _current_priority.reset(token)
+
+
+class _Waiter:
+    __slots__ = ("priority", "granted")
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.granted = False
+
+
+class SlotScheduler:
+    """
+    Weighted-fair concurrency slots for one upstream resource (OCR or GPT).
+    - `slots` calls may be in flight at once.
+    - `reserved` of them can only ever be used by interactive traffic, so a backfill
+      can never take the whole pool.
+    - When several classes wait, slots go to the class with the lowest virtual time
+      (grants / weight), i.e. interactive:batch = 3:1 by default.
+    """
+
+    def __init__(self, name: str, slots: int, reserved: int, weights: Dict[str, float]):
+        self.name = name
+        self.slots = max(1, int(slots))
+        self._reserved = max(0, int(reserved))
+        self.reserved = min(self._reserved, self.slots - 1)
+        self.weights = {p: float(weights.get(p, 1.0)) or 1.0 for p in PRIORITY_CLASSES}
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Waiter]] = {p: deque() for p in PRIORITY_CLASSES}
+        self._in_use: Dict[str, int] = {p: 0 for p in PRIORITY_CLASSES}
+        self._vtime: Dict[str, float] = {p: 0.0 for p in PRIORITY_CLASSES}
+
+    def set_limit(self, slots: int) -> None:
+        """Resize the pool (adaptive concurrency); calls already in flight above a lower limit finish normally."""
+        with self._cond:
+            self.slots = max(1, int(slots))
+            self.reserved = min(self._reserved, self.slots - 1)
+            self._dispatch()
+            self._publish()
+
+    def in_use(self) -> int:
+        with self._cond:
+            return sum(self._in_use.values())
+
+    def _can_run(self, priority: str) -> bool:
+        used = sum(self._in_use.values())
+        if used >= self.slots:
+            return False
+        if priority == PRIORITY_BATCH:
+            return self._in_use[PRIORITY_BATCH] < self.slots - self.reserved
+        return True
+
+    def _dispatch(self) -> None:
+        while True:
+            candidates = [p for p in PRIORITY_CLASSES if self._queues[p] and self._can_run(p)]
+            if not candidates:
+                return
+            p = min(candidates, key=lambda c: self._vtime[c])
+            w = self._queues[p].popleft()
+            w.granted = True
+            self._in_use[p] += 1
+            self._vtime[p] += 1.0 / self.weights[p]
+            self._cond.notify_all()
+
+    def acquire(self, priority: str) -> float:
+        """Block until a slot is granted; returns seconds waited."""
+        start = time.monotonic()
+        w = _Waiter(priority)
+        with self._cond:
+            if not self._queues[priority]:
+                # A class that was idle must not bank credit: it rejoins at the backlogged classes' pace
+                backlogged = [self._vtime[p] for p in PRIORITY_CLASSES if self._queues[p]]
+                if backlogged:
+                    self._vtime[priority] = max(self._vtime[priority], min(backlogged))
+            self._queues[priority].append(w)
+            self._dispatch()
+            while not w.granted:
+                self._cond.wait()
+            self._publish()
+        waited = time.monotonic() - start
+        metrics.observe("scheduler_wait_seconds", waited, resource=self.name, priority=priority)
+        return waited
+
+    def release(self, priority: str) -> None:
+        with self._cond:
+            self._in_use[priority] -= 1
+            self._dispatch()
+            self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("scheduler_limit", self.slots, resource=self.name)
+        for p in PRIORITY_CLASSES:
+            metrics.set_gauge("scheduler_in_use", self._in_use[p], resource=self.name, priority=p)
+            metrics.set_gauge("scheduler_queued", len(self._queues[p]), resource=self.name, priority=p)
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None) -> Iterator[None]:
+        p = priority or current_priority()
+        waited = self.acquire(p)
+        tracing.set_attributes(priority=p, sched_wait_ms=round(waited * 1000, 3))
+        try:
+            yield
+        finally:
+            self.release(p)
+
+
+_schedulers: Dict[str, SlotScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(resource: str) -> SlotScheduler:
+    with _schedulers_lock:
+        s = _schedulers.get(resource)
+        if s is None:
+            s = SlotScheduler(
+                resource,
+                slots=SCHED_SLOTS.get(resource, 4),
+                reserved=SCHED_INTERACTIVE_RESERVED.get(resource, 1),
+                weights=SCHED_WEIGHTS,
+            )
+            _schedulers[resource] = s
+        return s
+
+
+@contextmanager
+def upstream_slot(resource: str) -> Iterator[None]:
+    """Hold one `resource` ("ocr" | "gpt") slot for the current priority class."""
+    with get_scheduler(resource).slot():
+        yield
@@ -0,0 +1,135 @@
+import hashlib
+import threading
+import contextvars
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import asyncio
+
+from rbidp.core import metrics, tracing
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters", "followers")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters: List[Tuple["asyncio.AbstractEventLoop", "asyncio.Future"]] = []
+        self.followers = 0
+
+
+def _resolve(fut: "asyncio.Future", call: _Call) -> None:
+    if fut.done():
+        return
+    if call.error is not None:
+        fut.set_exception(call.error)
+    else:
+        fut.set_result(call.result)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical upstream calls: while a call for `key` is in flight, other
+    callers (threads or asyncio tasks, in any mix) wait for it and receive its result or its error
+    instead of issuing their own request. Nothing is cached once the call has finished.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                metrics.inc("singleflight_coalesced_total", group=self.name)
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.leaders += 1
+            return call, True
+
+    def _finish(self, key: str, call: _Call) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+            waiters, call.waiters = call.waiters, []
+            call.event.set()
+        for loop, fut in waiters:
+            loop.call_soon_threadsafe(_resolve, fut, call)
+
+    def do(self, key: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Blocking variant for threaded callers."""
+        call, leader = self._join(key)
+        # A follower is served the leader's response: the upstream "cache hit" on traces
+        tracing.set_attributes(singleflight="leader" if leader else "follower")
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    async def do_async(self, key: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        asyncio variant. fn may be a coroutine function, or a blocking function which the leader
+        runs in the loop's default executor. Followers await without occupying a thread.
+        """
+        import asyncio  # only async callers pay for it; threaded workers never load asyncio
+
+        loop = asyncio.get_running_loop()
+        call, leader = self._join(key)
+        tracing.set_attributes(singleflight="leader" if leader else "follower")
+        if not leader:
+            fut = loop.create_future()
+            with self._lock:
+                if call.event.is_set():
+                    _resolve(fut, call)
+                else:
+                    call.waiters.append((loop, fut))
+            return await fut
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                call.result = await fn(*args, **kwargs)
+            else:
+                ctx = contextvars.copy_context()
+                call.result = await loop.run_in_executor(None, lambda: ctx.run(fn, *args, **kwargs))
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+def payload_key(*parts: Any) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        if isinstance(p, (bytes, bytearray, memoryview)):
+            h.update(p)
+        else:
+            h.update(str(p).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+# One group per upstream; shared by every caller in the process
+ocr_flight = SingleFlight("ocr")
+gpt_flight = SingleFlight("gpt")
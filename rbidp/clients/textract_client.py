@@ -1,21 +1,42 @@
+import re
+import urllib.error
 import urllib.request
 import ssl
 import mimetypes
 import os
 import uuid
 import json
-from typing import Optional
-from rbidp.processors.image_to_pdf_converter import convert_image_to_pdf
- 
-def call_fortebank_textract(pdf_path: str, ocr_engine: str = "textract") -> str:
-    """
-    Sends a PDF to ForteBank Textract OCR endpoint and returns the raw response.
-    """
-    url = "https://dev-ocr.fortebank.com/v1/pdf"
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from rbidp.processors.image_to_pdf_converter import convert_image_to_pdf_bytes
+from rbidp.processors.pdf_splitter import split_document
+from rbidp.processors.textract_pages import OcrDocument, parse_ocr_stream
+from rbidp.clients.adaptive import sample, size_class
+from rbidp.core.run_store import write_artifact
+from rbidp.clients.ratelimit import rate_limit
+from rbidp.clients.scheduler import upstream_slot
+from rbidp.clients.singleflight import ocr_flight, payload_key
+from rbidp.core import tracing
+from rbidp.core.profiling import profiled_task
+from rbidp.core.config import IMAGE_PREPROCESS, OCR_PAGE_CONCURRENCY, OCR_PAGE_RETRIES, TEXTRACT_URL
+
+logger = logging.getLogger(__name__)
+
+_PAGE_RE = re.compile(rb"/Type\s*/Page\b")
+
+
+def _page_class(body: bytes) -> str:
+    """Adaptive-concurrency call class of an OCR request: its page count bucket."""
+    return size_class("pages", len(_PAGE_RE.findall(body)) or 1)
  
+def _textract_request(pdf_path: str, ocr_engine: str, file_data: Optional[bytes]) -> urllib.request.Request:
     # Read file bytes
-    with open(pdf_path, "rb") as f:
-        file_data = f.read()
+    if file_data is None:
+        with open(pdf_path, "rb") as f:
+            file_data = f.read()
  
     # Prepare multipart/form-data body manually
     boundary = "----WebKitFormBoundary" + uuid.uuid4().hex
@@ -39,54 +60,221 @@ def call_fortebank_textract(pdf_path: str, ocr_engine: str = "textract") -> str:
     ).encode("utf-8")
  
     # Prepare request
-    req = urllib.request.Request(url, data=body, method="POST")
+    req = urllib.request.Request(TEXTRACT_URL, data=body, method="POST")
     req.add_header("Content-Type", content_type)
     req.add_header("Accept", "*/*")
+    return req
+
+
+def call_fortebank_textract(pdf_path: str, ocr_engine: str = "textract", file_data: Optional[bytes] = None) -> str:
+    """
+    Sends a PDF to ForteBank Textract OCR endpoint and returns the raw response.
+    file_data: PDF bytes already in memory (pdf_path then only supplies the upload filename).
+    """
+    req = _textract_request(pdf_path, ocr_engine, file_data)
  
     # For dev servers (non-SSL)
     context = ssl._create_unverified_context()
  
-    with urllib.request.urlopen(req, context=context) as response:
-        result = response.read().decode("utf-8")
+    with tracing.span("ocr.http", url=req.full_url, request_bytes=len(req.data)) as s, rate_limit("ocr"), sample("ocr", _page_class(req.data)):
+        try:
+            with urllib.request.urlopen(req, context=context) as response:
+                data = response.read()
+                s.set(http_status=response.status, response_bytes=len(data))
+        except urllib.error.HTTPError as e:
+            s.set(http_status=e.code)
+            raise
+        result = data.decode("utf-8")
  
     return result
 
+
+def call_fortebank_textract_parsed(
+    pdf_path: str, ocr_engine: str = "textract", file_data: Optional[bytes] = None, keep_raw: bool = False
+) -> OcrDocument:
+    """
+    Same request as call_fortebank_textract, but the response is parsed while it streams in
+    (parse_ocr_stream): Textract blocks are reduced to the compact page model one at a time and
+    the body is never held as one string. keep_raw=True also keeps the body bytes (doc.raw).
+    """
+    req = _textract_request(pdf_path, ocr_engine, file_data)
+    context = ssl._create_unverified_context()
+
+    with tracing.span("ocr.http", url=req.full_url, request_bytes=len(req.data), streamed=True) as s, rate_limit("ocr"), sample("ocr", _page_class(req.data)):
+        try:
+            with urllib.request.urlopen(req, context=context) as response:
+                s.set(http_status=response.status)
+                counter = _CountingReader(response)
+                doc = parse_ocr_stream(counter, keep_raw=keep_raw)
+                s.set(response_bytes=counter.bytes_read, pages=len(doc.pages))
+        except urllib.error.HTTPError as e:
+            s.set(http_status=e.code)
+            raise
+    return doc
+
+
+class _CountingReader:
+    def __init__(self, fp: Any):
+        self.fp = fp
+        self.bytes_read = 0
+
+    def read(self, n: int = -1) -> bytes:
+        data = self.fp.read(n)
+        self.bytes_read += len(data)
+        return data
+
+
+def request_ocr(filename: str, payload: bytes, ocr_engine: str = "textract", keep_raw: bool = False) -> OcrDocument:
+    """
+    One OCR request for an in-memory PDF: concurrent callers with the same payload share a single
+    in-flight request (and its parsed OcrDocument, which is read-only); only that request holds
+    an OCR scheduler slot.
+    """
+    def call() -> OcrDocument:
+        with upstream_slot("ocr"):
+            return call_fortebank_textract_parsed(filename, ocr_engine=ocr_engine, file_data=payload, keep_raw=keep_raw)
+
+    with tracing.span("ocr.request", filename=filename, payload_bytes=len(payload)):
+        return ocr_flight.do(payload_key(ocr_engine, keep_raw, payload), call)
+
+
+def _preprocess_report(report: Optional[Dict[str, Any]], pdf_path: str, bytes_out: int) -> Optional[Dict[str, Any]]:
+    """The finished image preprocessing report, or None when no frame was preprocessed."""
+    if not report or not report.get("frames"):
+        return None
+    from rbidp.processors.image_preprocess import finish_report
+    return finish_report(report, os.path.getsize(pdf_path), bytes_out)
+
+
 def ask_textract(pdf_path: str, output_dir: str = "output", save_json: bool = True) -> dict:
     work_path = pdf_path
-    converted_pdf: Optional[str] = None
+    work_data: Optional[bytes] = None
+    # Image preprocessing (RBIDP_IMAGE_PREPROCESS) fills this with its per-step report
+    report: Optional[Dict[str, Any]] = {} if IMAGE_PREPROCESS else None
     mt, _ = mimetypes.guess_type(pdf_path)
     is_pdf = bool(mt == "application/pdf" or pdf_path.lower().endswith(".pdf"))
     is_image = bool((mt and mt.startswith("image/")) or os.path.splitext(pdf_path)[1].lower() in {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp", ".heic", ".heif"})
     if not is_pdf and is_image:
-        base_dir = os.path.dirname(pdf_path)
+        # Converted in memory: the PDF only exists as the request body, never as _converted.pdf
         base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-        desired_path = os.path.join(base_dir, f"{base_name}_converted.pdf")
-        converted_pdf = convert_image_to_pdf(pdf_path, output_path=desired_path)
-        work_path = converted_pdf
-    raw = call_fortebank_textract(work_path)
-    os.makedirs(output_dir, exist_ok=True)
+        work_path = f"{base_name}_converted.pdf"
+        work_data = convert_image_to_pdf_bytes(pdf_path, report=report)
+    elif is_pdf and report is not None:
+        # Image-only PDFs (scans) are rebuilt from their preprocessed page images
+        try:
+            from rbidp.processors.image_preprocess import frames_to_pdf_bytes, image_pages, preprocess_frames
+            frames = image_pages(pdf_path)
+            if frames:
+                work_data = frames_to_pdf_bytes(preprocess_frames(frames, report))
+        except Exception as e:
+            logger.warning("Image preprocessing of %s skipped: %s", pdf_path, e)
+            report.clear()
+    if work_data is None:
+        with open(pdf_path, "rb") as f:
+            work_data = f.read()
+    return _ocr_payload(work_path, work_data, output_dir, save_json, _preprocess_report(report, pdf_path, len(work_data)))
+
+
+def _ocr_payload(work_path: str, work_data: bytes, output_dir: str, save_json: bool, preprocess: Optional[Dict[str, Any]]) -> dict:
+    doc = request_ocr(os.path.basename(work_path), work_data, keep_raw=save_json)
     raw_path = os.path.join(output_dir, "textract_response_raw.json")
-    if save_json:
-        with open(raw_path, "w", encoding="utf-8") as f:
-            f.write(raw)
-    # Parse raw JSON safely
-    obj = {}
-    parse_err = None
-    try:
-        obj = json.loads(raw)
-    except Exception as e:
-        parse_err = str(e)
-        obj = {}
-    # Determine success and error message
-    success = bool(obj.get("success")) if isinstance(obj, dict) else False
-    error = None
-    if not success:
-        error = (obj.get("message") or obj.get("error") or parse_err or "Unknown OCR error") if isinstance(obj, dict) else (parse_err or "Unknown OCR error")
+    # The full raw object is only built when raw persistence was asked for
+    obj: Dict[str, Any] = {}
+    if save_json and doc.raw is not None:
+        write_artifact(raw_path, doc.raw)
+        try:
+            parsed = json.loads(doc.raw)
+            obj = parsed if isinstance(parsed, dict) else {}
+        except Exception:
+            obj = {}
+    success = doc.success
+    error = None if success else (doc.message or "Unknown OCR error")
     result = {
         "success": success,
         "error": error,
         "raw_path": raw_path,
-        "raw_obj": obj if isinstance(obj, dict) else {},
-        "converted_pdf": converted_pdf
+        "raw_obj": obj,
+        "document": doc,
+        "preprocess": preprocess,
+    }
+    return result
+
+
+def _ocr_page(page_index: int, payload: bytes, base_name: str, retries: int) -> Tuple[bool, Any]:
+    """OCR one single-page PDF; retried on its own. Returns (True, pages) or (False, error)."""
+    error: Any = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(min(2.0, 0.25 * (2 ** (attempt - 1))))
+        with tracing.span("ocr.page", page=page_index + 1, attempt=attempt + 1) as s:
+            try:
+                doc = request_ocr(f"{base_name}_p{page_index + 1}.pdf", payload)
+                if doc.success:
+                    return True, doc.to_pages()
+                error = doc.message or "Unknown OCR error"
+            except Exception as e:
+                error = str(e)
+            s.fail(error)
+        logger.warning("OCR page %s attempt %s failed: %s", page_index + 1, attempt + 1, error)
+    return False, error
+
+
+def ask_textract_per_page(
+    pdf_path: str,
+    output_dir: str = "output",
+    save_json: bool = True,
+    max_concurrency: int = OCR_PAGE_CONCURRENCY,
+    retries: int = OCR_PAGE_RETRIES,
+) -> dict:
+    """
+    Parallel OCR: split the PDF / multi-frame image into single-page payloads, OCR them
+    concurrently (at most max_concurrency per document) and reassemble the result as
+    {"success": true, "data": {"pages": [...]}} so filter_textract_response yields exactly the
+    same {"pages": [...]} with page_number = position in the document.
+    Falls back to ask_textract for single-page or unsplittable documents.
+    """
+    report: Optional[Dict[str, Any]] = {} if IMAGE_PREPROCESS else None
+    payloads = split_document(pdf_path, report=report)
+    preprocess = _preprocess_report(report, pdf_path, sum(len(p) for p in payloads)) if payloads else None
+    if payloads and len(payloads) == 1 and preprocess is not None:
+        # Already preprocessed while splitting: not done again by ask_textract
+        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        return _ocr_payload(f"{base_name}_converted.pdf", payloads[0], output_dir, save_json, preprocess)
+    if not payloads or len(payloads) < 2:
+        return ask_textract(pdf_path, output_dir=output_dir, save_json=save_json)
+
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    workers = max(1, min(int(max_concurrency), len(payloads)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rbidp-ocr-page") as pool:
+        # Each task runs in a copy of the caller's context so the run's priority class and profiler apply
+        futures = [
+            pool.submit(contextvars.copy_context().run, profiled_task, _ocr_page, i, payload, base_name, retries)
+            for i, payload in enumerate(payloads)
+        ]
+        results = [f.result() for f in futures]
+
+    pages: List[Dict[str, Any]] = []
+    failed: List[str] = []
+    for i, (ok, value) in enumerate(results):
+        if not ok:
+            failed.append(f"page {i + 1}: {value}")
+            continue
+        text = "\n".join(p.get("text", "") for p in value if p.get("text")).strip()
+        pages.append({"page_number": i + 1, "text": text})
+
+    success = not failed
+    obj: Dict[str, Any] = {"success": success, "data": {"pages": pages}}
+    if failed:
+        obj["message"] = "; ".join(failed)
+
+    raw_path = os.path.join(output_dir, "textract_response_raw.json")
+    if save_json:
+        write_artifact(raw_path, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+    return {
+        "success": success,
+        "error": obj.get("message"),
+        "raw_path": raw_path,
+        "raw_obj": obj,
+        "document": OcrDocument.from_pages(pages, success, obj.get("message")),
+        "preprocess": preprocess,
     }
-    return result
\ No newline at end of file
@@ -1,4 +1,5 @@
 # Centralized filenames and constants used across the pipeline
+import os
 
 # OCR outputs
 TEXTRACT_RAW = "textract_response_raw.json"
@@ -12,6 +13,9 @@ GPT_DOC_TYPE_FILTERED = "gpt_doc_type_check_filtered.json"
 GPT_EXTRACTOR_RAW = "gpt_extractor_response_raw.json"
 GPT_EXTRACTOR_FILTERED = "gpt_extractor_response_filtered.json"
 
+# GPT: combined doc type check + extraction (GPT_MODE = "combined"); its filtered answer is merged.json
+GPT_COMBINED_RAW = "gpt_combined_response_raw.json"
+
 # Merge and validation
 MERGED_FILENAME = "merged.json"
 VALIDATION_FILENAME = "validation.json"
@@ -22,3 +26,175 @@ METADATA_FILENAME = "metadata.json"
 # Global settings
 MAX_PDF_PAGES = 3
 UTC_OFFSET_HOURS = 5
+
+# Upstream endpoints (overridable, e.g. to point the benchmark suite at local stub servers)
+TEXTRACT_URL = os.getenv("RBIDP_TEXTRACT_URL", "https://dev-ocr.fortebank.com/v1/pdf")
+GPT_URL = os.getenv("RBIDP_GPT_URL", "https://dl-ai-dev-app01-uv01.fortebank.com/openai/v1/completions/v2")
+# Ask the GPT gateway for a server-sent event stream and stop reading once the answer's JSON
+# object is complete (rbidp.clients.gpt_client.call_fortebank_gpt_stream)
+GPT_STREAM = os.getenv("RBIDP_GPT_STREAM", "0") == "1"
+# "separate": doc-type check and extraction as two GPT calls; "combined": one call returning
+# single_doc_type together with the extracted fields (rbidp.processors.agent_combined)
+GPT_MODE = os.getenv("RBIDP_GPT_MODE", "separate")
+# Extraction prompt in "separate" mode: "generic" (all doc types) or "specialized" (short prompt
+# for the declared doc type, rbidp.processors.prompt_registry; generic for unknown types)
+GPT_EXTRACT_PROMPTS = os.getenv("RBIDP_GPT_EXTRACT_PROMPTS", "generic")
+# An answer that is not valid JSON even after local repair is sent back (alone, without the OCR
+# text) with a small max_tokens to be fixed (rbidp.processors.agent_json_repair)
+GPT_JSON_REASK = os.getenv("RBIDP_GPT_JSON_REASK", "0") == "1"
+# Local multi-document detector ahead of the GPT single-doc-type check, "separate" mode only
+# (rbidp.processors.multidoc_detector): "off"; "shadow" (GPT always asked, agreement counted);
+# "on" (GPT asked only when the detector is uncertain)
+MULTIDOC_DETECTOR = os.getenv("RBIDP_MULTIDOC_DETECTOR", "off")
+
+# Token accounting and preflight admission (rbidp.core.usage, rbidp.processors.preflight).
+# Local tokenizer for estimates: "heuristic" (no dependencies) or "tiktoken" (exact, if installed)
+GPT_TOKENIZER = os.getenv("RBIDP_GPT_TOKENIZER", "heuristic")
+# Budgets checked before a run's first GPT call (0 = unlimited): tokens of its largest prompt,
+# and the estimated latency of all its GPT calls
+GPT_PROMPT_TOKEN_BUDGET = int(os.getenv("RBIDP_GPT_PROMPT_TOKEN_BUDGET", "0"))
+GPT_LATENCY_BUDGET_MS = float(os.getenv("RBIDP_GPT_LATENCY_BUDGET_MS", "0"))
+# Latency model of one call: base + per prompt token + per completion token (max_tokens)
+GPT_LATENCY_BASE_MS = float(os.getenv("RBIDP_GPT_LATENCY_BASE_MS", "400"))
+GPT_LATENCY_MS_PER_PROMPT_TOKEN = float(os.getenv("RBIDP_GPT_LATENCY_MS_PER_PROMPT_TOKEN", "0.1"))
+GPT_LATENCY_MS_PER_COMPLETION_TOKEN = float(os.getenv("RBIDP_GPT_LATENCY_MS_PER_COMPLETION_TOKEN", "15"))
+# Over budget: "reject" (GPT_BUDGET_EXCEEDED) or "route" (page-chunked long-document calls,
+# rejected only if those are over budget too)
+GPT_BUDGET_ACTION = os.getenv("RBIDP_GPT_BUDGET_ACTION", "reject")
+
+# HTTP service (rbidp.service.http_api); overridable per deployment via env
+RUNS_DIR = os.getenv("RBIDP_RUNS_DIR", "runs")
+API_HOST = os.getenv("RBIDP_API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("RBIDP_API_PORT", "8080"))
+API_POOL_KIND = os.getenv("RBIDP_API_POOL_KIND", "thread")  # "thread" | "process"
+API_POOL_WORKERS = int(os.getenv("RBIDP_API_POOL_WORKERS", "4"))
+API_MAX_IN_FLIGHT = int(os.getenv("RBIDP_API_MAX_IN_FLIGHT", "16"))
+API_MAX_UPLOAD_BYTES = int(os.getenv("RBIDP_API_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+# Service processes (API pool workers, job workers) load the lazily imported stage
+# dependencies before taking traffic (rbidp.orchestrator.warmup)
+WARMUP_ON_START = os.getenv("RBIDP_WARMUP_ON_START", "1") == "1"
+
+# Durable job queue (rbidp.service.jobs); the SQLite file lives under RUNS_DIR
+JOBS_DB_FILENAME = "jobs.sqlite3"
+JOBS_MAX_DEPTH = int(os.getenv("RBIDP_JOBS_MAX_DEPTH", "1000"))
+JOBS_LEASE_SECONDS = float(os.getenv("RBIDP_JOBS_LEASE_SECONDS", "120"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("RBIDP_JOBS_MAX_ATTEMPTS", "3"))
+JOBS_POLL_INTERVAL_SECONDS = float(os.getenv("RBIDP_JOBS_POLL_INTERVAL_SECONDS", "0.5"))
+JOBS_WORKERS = int(os.getenv("RBIDP_JOBS_WORKERS", "2"))
+
+# Priority scheduling of upstream calls (rbidp.clients.scheduler), per process
+SCHED_SLOTS = {
+    "ocr": int(os.getenv("RBIDP_SCHED_OCR_SLOTS", "4")),
+    "gpt": int(os.getenv("RBIDP_SCHED_GPT_SLOTS", "8")),
+}
+# Slots that batch/backfill traffic can never occupy
+SCHED_INTERACTIVE_RESERVED = {
+    "ocr": int(os.getenv("RBIDP_SCHED_OCR_RESERVED", "1")),
+    "gpt": int(os.getenv("RBIDP_SCHED_GPT_RESERVED", "2")),
+}
+SCHED_WEIGHTS = {
+    "interactive": float(os.getenv("RBIDP_SCHED_WEIGHT_INTERACTIVE", "3")),
+    "batch": float(os.getenv("RBIDP_SCHED_WEIGHT_BATCH", "1")),
+}
+
+# Adaptive concurrency (rbidp.clients.adaptive): the per-process slot limits above become the
+# starting point of an AIMD controller per endpoint, kept within [MIN, MAX] slots
+ADAPTIVE_CONCURRENCY = os.getenv("RBIDP_ADAPTIVE_CONCURRENCY", "0") == "1"
+ADAPTIVE_MIN_SLOTS = int(os.getenv("RBIDP_ADAPTIVE_MIN_SLOTS", "1"))
+ADAPTIVE_MAX_SLOTS = {
+    "ocr": int(os.getenv("RBIDP_ADAPTIVE_OCR_MAX_SLOTS", "32")),
+    "gpt": int(os.getenv("RBIDP_ADAPTIVE_GPT_MAX_SLOTS", "64")),
+}
+# Multiplicative decrease on 429/5xx/connection errors or when smoothed latency exceeds
+# TOLERANCE x the no-load latency
+ADAPTIVE_BACKOFF = float(os.getenv("RBIDP_ADAPTIVE_BACKOFF", "0.75"))
+ADAPTIVE_LATENCY_TOLERANCE = float(os.getenv("RBIDP_ADAPTIVE_LATENCY_TOLERANCE", "2.0"))
+
+# Node-wide upstream budgets (rbidp.clients.ratelimit), shared by every process that uses the
+# same SQLite file: requests per second (token bucket of BURST requests, 0 = one second's worth)
+# and requests in flight, per endpoint. 0 = unlimited; an endpoint with neither is not limited.
+RATELIMIT_DB_PATH = os.getenv("RBIDP_RATELIMIT_DB_PATH", os.path.join(RUNS_DIR, "ratelimit.sqlite3"))
+RATELIMIT_RPS = {
+    "ocr": float(os.getenv("RBIDP_RATELIMIT_OCR_RPS", "0")),
+    "gpt": float(os.getenv("RBIDP_RATELIMIT_GPT_RPS", "0")),
+}
+RATELIMIT_BURST = {
+    "ocr": float(os.getenv("RBIDP_RATELIMIT_OCR_BURST", "0")),
+    "gpt": float(os.getenv("RBIDP_RATELIMIT_GPT_BURST", "0")),
+}
+RATELIMIT_CONCURRENCY = {
+    "ocr": int(os.getenv("RBIDP_RATELIMIT_OCR_CONCURRENCY", "0")),
+    "gpt": int(os.getenv("RBIDP_RATELIMIT_GPT_CONCURRENCY", "0")),
+}
+# An in-flight request older than this is reclaimed (its process hung or died on another node)
+RATELIMIT_LEASE_SECONDS = float(os.getenv("RBIDP_RATELIMIT_LEASE_SECONDS", "600"))
+RATELIMIT_POLL_SECONDS = float(os.getenv("RBIDP_RATELIMIT_POLL_SECONDS", "0.02"))
+
+# OCR mode: "document" sends the whole file in one request; "per_page" splits it and
+# OCRs pages concurrently (rbidp.clients.textract_client.ask_textract_per_page)
+OCR_MODE = os.getenv("RBIDP_OCR_MODE", "document")
+OCR_PAGE_CONCURRENCY = int(os.getenv("RBIDP_OCR_PAGE_CONCURRENCY", "4"))
+OCR_PAGE_RETRIES = int(os.getenv("RBIDP_OCR_PAGE_RETRIES", "2"))
+# Image preprocessing before OCR (rbidp.processors.image_preprocess): uploaded images and
+# image-only PDF pages are cropped, deskewed, made grayscale and downscaled to this resolution
+# (pixels per inch of an A4 long side); skews beyond IMAGE_PREPROCESS_MAX_SKEW degrees are not searched
+IMAGE_PREPROCESS = os.getenv("RBIDP_IMAGE_PREPROCESS", "0") == "1"
+IMAGE_PREPROCESS_DPI = int(os.getenv("RBIDP_IMAGE_PREPROCESS_DPI", "200"))
+IMAGE_PREPROCESS_MAX_SKEW = float(os.getenv("RBIDP_IMAGE_PREPROCESS_MAX_SKEW", "10"))
+
+# Long-document mode (rbidp.processors.agent_long_extractor): documents above MAX_PDF_PAGES
+# (up to LONG_DOC_MAX_PAGES) are processed as page chunks with map-reduce GPT calls
+LONG_DOC_MODE = os.getenv("RBIDP_LONG_DOC_MODE", "0") == "1"
+LONG_DOC_MAX_PAGES = int(os.getenv("RBIDP_LONG_DOC_MAX_PAGES", "15"))
+LONG_DOC_CHUNK_PAGES = int(os.getenv("RBIDP_LONG_DOC_CHUNK_PAGES", "3"))
+LONG_DOC_MAX_PAGE_CHARS = int(os.getenv("RBIDP_LONG_DOC_MAX_PAGE_CHARS", "4000"))
+LONG_DOC_CONCURRENCY = int(os.getenv("RBIDP_LONG_DOC_CONCURRENCY", "4"))
+GPT_EXTRACTOR_CHUNKS = "gpt_extractor_chunks.json"
+
+# Idempotent submissions (rbidp.core.idempotency); the SQLite index lives under the runs root
+IDEMPOTENCY_ENABLED = os.getenv("RBIDP_IDEMPOTENCY", "1") == "1"
+IDEMPOTENCY_DB_FILENAME = "idempotency.sqlite3"
+IDEMPOTENCY_WINDOW_SECONDS = float(os.getenv("RBIDP_IDEMPOTENCY_WINDOW_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("RBIDP_IDEMPOTENCY_WAIT_SECONDS", "300"))
+IDEMPOTENCY_INFLIGHT_TIMEOUT_SECONDS = float(os.getenv("RBIDP_IDEMPOTENCY_INFLIGHT_TIMEOUT_SECONDS", "900"))
+
+# Run storage format: "files" (plain JSON artifacts) or "bundle" (one compressed
+# run.bundle per run, see rbidp.core.run_store)
+RUN_STORAGE_FORMAT = os.getenv("RBIDP_RUN_STORAGE_FORMAT", "files")
+
+# Retention of the runs/ tree (rbidp.core.retention). Days per artifact kind; -1 keeps forever.
+# verdict = meta/ (final result, manifest, validation), ocr = ocr/, gpt = gpt/, original = input/
+RETENTION_DAYS = {
+    "verdict": int(os.getenv("RBIDP_RETENTION_VERDICT_DAYS", "-1")),
+    "gpt": int(os.getenv("RBIDP_RETENTION_GPT_DAYS", "180")),
+    "ocr": int(os.getenv("RBIDP_RETENTION_OCR_DAYS", "90")),
+    "original": int(os.getenv("RBIDP_RETENTION_ORIGINAL_DAYS", "30")),
+}
+# Days after which a date dir is compacted into one runs/<date>/day.bundle (-1 = never)
+RETENTION_COMPACT_AFTER_DAYS = int(os.getenv("RBIDP_RETENTION_COMPACT_AFTER_DAYS", "7"))
+# Cold tier: compacted days older than this move to RETENTION_TIER_DIR/<date>.bundle
+# (a mounted object-store bucket or any other volume); -1 or an empty dir disables it
+RETENTION_TIER_AFTER_DAYS = int(os.getenv("RBIDP_RETENTION_TIER_AFTER_DAYS", "-1"))
+RETENTION_TIER_DIR = os.getenv("RBIDP_RETENTION_TIER_DIR", "")
+# I/O budget of the job (bytes read + written per second) so it can share a node with live traffic
+RETENTION_IO_BYTES_PER_SEC = int(os.getenv("RBIDP_RETENTION_IO_BYTES_PER_SEC", str(20 * 1024 * 1024)))
+RETENTION_STATE_FILENAME = "retention_state.json"
+
+# Per-run profiling (rbidp.core.profiling); artifacts are written next to meta/manifest.json
+PROFILE_ENGINE = os.getenv("RBIDP_PROFILE_ENGINE", "sample")  # "sample" | "cprofile"
+PROFILE_SAMPLE_PERCENT = float(os.getenv("RBIDP_PROFILE_SAMPLE_PERCENT", "0"))
+# Runs slower than this keep a low-overhead sampled CPU profile (0 = off)
+PROFILE_SLOW_MS = float(os.getenv("RBIDP_PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("RBIDP_PROFILE_INTERVAL_MS", "5"))
+PROFILE_MEMORY_TOP = int(os.getenv("RBIDP_PROFILE_MEMORY_TOP", "30"))
+
+# Tracing (rbidp.core.tracing): spans per pipeline stage and upstream call, tagged with run_id
+TRACING_EXPORTER = os.getenv("RBIDP_TRACING_EXPORTER", "none")  # "none" | "jsonl" | "otlp"
+TRACING_JSONL_PATH = os.getenv("RBIDP_TRACING_JSONL_PATH", os.path.join(RUNS_DIR, "traces.jsonl"))
+TRACING_OTLP_ENDPOINT = os.getenv("RBIDP_TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_SERVICE_NAME = os.getenv("RBIDP_TRACING_SERVICE_NAME", "rbidp")
+# Spans waiting for export; beyond this they are dropped (tracing_dropped_spans_total)
+TRACING_QUEUE_SIZE = int(os.getenv("RBIDP_TRACING_QUEUE_SIZE", "10000"))
+TRACING_BATCH_SIZE = int(os.getenv("RBIDP_TRACING_BATCH_SIZE", "256"))
+TRACING_FLUSH_SECONDS = float(os.getenv("RBIDP_TRACING_FLUSH_SECONDS", "2"))
@@ -20,6 +20,7 @@ ERROR_MESSAGES_RU: Dict[str, str] = {
     "EXTRACT_FAILED": "Ошибка извлечения данных GPT",
     "GPT_FILTER_PARSE_ERROR": "Ошибка фильтрации ответа GPT",
     "EXTRACT_SCHEMA_INVALID": "Некорректная схема данных извлечения",
+    "GPT_BUDGET_EXCEEDED": "Документ превышает допустимый объём для обработки",
 
     # Merge/Validation
     "MERGE_FAILED": "Ошибка при формировании итогового JSON",
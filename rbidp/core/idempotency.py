@@ -0,0 +1,164 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from rbidp.core import metrics
+from rbidp.core.config import (
+    IDEMPOTENCY_DB_FILENAME,
+    IDEMPOTENCY_WINDOW_SECONDS,
+    IDEMPOTENCY_INFLIGHT_TIMEOUT_SECONDS,
+)
+
+# Outcomes that depend on upstream availability (or a non-deterministic GPT answer) are never
+# reused: the next identical submission processes the file again. Nor are rejections decided by
+# configuration (GPT budgets and their route/reject action, page limits of the long-doc mode),
+# which may change within the idempotency window.
+NON_CACHEABLE_ERRORS = {
+    "FILE_SAVE_FAILED",
+    "OCR_FAILED",
+    "OCR_FILTER_FAILED",
+    "DTC_FAILED",
+    "DTC_PARSE_ERROR",
+    "EXTRACT_FAILED",
+    "EXTRACT_SCHEMA_INVALID",
+    "GPT_FILTER_PARSE_ERROR",
+    "MERGE_FAILED",
+    "VALIDATION_FAILED",
+    "GPT_BUDGET_EXCEEDED",
+    "PDF_TOO_MANY_PAGES",
+}
+
+CLAIM_OWNER = "owner"
+CLAIM_DUPLICATE = "duplicate"
+CLAIM_IN_FLIGHT = "in_flight"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    key TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    final_result_path TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def normalize_fio(fio: Any) -> str:
+    if not isinstance(fio, str):
+        return ""
+    return re.sub(r"\s+", " ", fio.strip()).casefold().replace("ё", "е")
+
+
+def submission_key(sha256: str, fio: Any, doc_type: Any, reason: Any, date_bucket: str) -> str:
+    """
+    Identity of a submission: same file, applicant, doc type and reason on the same local day.
+    The day is part of the key because the validity check compares against "now".
+    """
+    parts = [sha256 or "", normalize_fio(fio), (doc_type or "").strip(), (reason or "").strip(), date_bucket]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def is_cacheable(error_code: Optional[str]) -> bool:
+    return error_code not in NON_CACHEABLE_ERRORS
+
+
+class SubmissionIndex:
+    """SQLite index of submissions -> run that owns them (running or done)."""
+
+    def __init__(
+        self,
+        db_path: str,
+        window_seconds: float = IDEMPOTENCY_WINDOW_SECONDS,
+        inflight_timeout_seconds: float = IDEMPOTENCY_INFLIGHT_TIMEOUT_SECONDS,
+    ):
+        self.db_path = str(db_path)
+        self.window_seconds = window_seconds
+        self.inflight_timeout_seconds = inflight_timeout_seconds
+        self._local = threading.local()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str, run_id: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Returns (CLAIM_DUPLICATE, row) for a fresh finished run, (CLAIM_IN_FLIGHT, row) while another
+        run is still processing it, otherwise records run_id as the owner and returns (CLAIM_OWNER, None).
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM submissions WHERE key = ?", (key,)).fetchone()
+            if row is not None and row["run_id"] != run_id:
+                if row["status"] == "done" and now - row["updated_at"] <= self.window_seconds:
+                    conn.execute("COMMIT")
+                    return CLAIM_DUPLICATE, dict(row)
+                if row["status"] == "running" and now - row["created_at"] <= self.inflight_timeout_seconds:
+                    conn.execute("COMMIT")
+                    return CLAIM_IN_FLIGHT, dict(row)
+            conn.execute(
+                "INSERT OR REPLACE INTO submissions (key, run_id, status, final_result_path, created_at, updated_at) "
+                "VALUES (?, ?, 'running', NULL, ?, ?)",
+                (key, run_id, now, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return CLAIM_OWNER, None
+
+    def complete(self, key: str, run_id: str, final_result_path: str) -> None:
+        self._conn().execute(
+            "UPDATE submissions SET status = 'done', final_result_path = ?, updated_at = ? WHERE key = ? AND run_id = ?",
+            (final_result_path, time.time(), key, run_id),
+        )
+
+    def abandon(self, key: str, run_id: str) -> None:
+        self._conn().execute("DELETE FROM submissions WHERE key = ? AND run_id = ?", (key, run_id))
+
+    def claim_or_wait(self, key: str, run_id: str, wait_seconds: float, poll_seconds: float = 0.25) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        claim(), but attach to an in-flight identical run: wait up to wait_seconds for it to finish
+        (-> CLAIM_DUPLICATE) or be abandoned (-> CLAIM_OWNER). After the wait, process independently.
+        """
+        deadline = time.monotonic() + wait_seconds
+        attached = False
+        while True:
+            state, row = self.claim(key, run_id)
+            if state != CLAIM_IN_FLIGHT:
+                if state == CLAIM_DUPLICATE:
+                    metrics.inc("idempotency_hits_total", kind="attached" if attached else "finished")
+                return state, row
+            attached = True
+            if time.monotonic() >= deadline:
+                metrics.inc("idempotency_attach_timeouts_total")
+                return CLAIM_IN_FLIGHT, row
+            time.sleep(poll_seconds)
+
+
+_indexes: Dict[str, SubmissionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(runs_root: Path) -> SubmissionIndex:
+    path = str(Path(runs_root).resolve() / IDEMPOTENCY_DB_FILENAME)
+    with _indexes_lock:
+        idx = _indexes.get(path)
+        if idx is None:
+            idx = SubmissionIndex(path)
+            _indexes[path] = idx
+        return idx
@@ -0,0 +1,107 @@
+import os
+import hashlib
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Tuple, Union
+
+# What run_pipeline accepts as its input document
+InputSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file(path: Path) -> Tuple[str, int]:
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def _write_buffer(buf: memoryview, dest: Path) -> Tuple[str, int]:
+    with open(dest, "wb") as f:
+        f.write(buf)
+    return hashlib.sha256(buf).hexdigest(), buf.nbytes
+
+
+def _copy_stream(src: BinaryIO, dest: Path) -> Tuple[str, int]:
+    """Single pass: every chunk is hashed and written once."""
+    h = hashlib.sha256()
+    size = 0
+    with open(dest, "wb") as out:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return h.hexdigest(), size
+
+
+def _link_or_move(src: Path, dest: Path, move: bool) -> bool:
+    try:
+        if move:
+            os.replace(src, dest)
+        else:
+            os.link(src, dest)
+        return True
+    except OSError:
+        # Different filesystem, or links not supported: caller falls back to a copy
+        return False
+
+
+def source_name(source: InputSource) -> str:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(os.fspath(source))
+    name = getattr(source, "name", None)
+    return os.path.basename(name) if isinstance(name, str) else ""
+
+
+def ingest_input(source: InputSource, dest: Path, move: bool = False) -> Dict[str, Any]:
+    """
+    Place the input document at dest with one write at most, computing size and SHA-256 on the way.
+    - path already at dest (API streamed it into the run): hashed in place, no write
+    - path on the same filesystem: hardlinked (or renamed when move=True), no write
+    - path elsewhere / bytes / memoryview / file-like: written once, hashed in the same pass
+    Returns {"path", "size_bytes", "sha256", "method"}.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+
+    if isinstance(source, (str, os.PathLike)):
+        src = Path(source)
+        if dest.exists() and os.path.samefile(src, dest):
+            method = "in_place"
+            sha256, size = _hash_file(dest)
+        elif _link_or_move(src, dest, move):
+            method = "rename" if move else "hardlink"
+            sha256, size = _hash_file(dest)
+        else:
+            method = "copy"
+            with open(src, "rb") as f:
+                sha256, size = _copy_stream(f, dest)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        method = "buffer"
+        sha256, size = _write_buffer(memoryview(source), dest)
+    elif hasattr(source, "getbuffer"):
+        # io.BytesIO (and Streamlit's UploadedFile): use its buffer without an intermediate copy
+        method = "buffer"
+        buf = source.getbuffer()
+        try:
+            sha256, size = _write_buffer(buf, dest)
+        finally:
+            buf.release()
+    elif hasattr(source, "read"):
+        method = "stream"
+        if getattr(source, "seekable", lambda: False)():
+            source.seek(0)
+        sha256, size = _copy_stream(source, dest)
+    else:
+        raise TypeError(f"Unsupported input source: {type(source).__name__}")
+
+    return {"path": dest, "size_bytes": size, "sha256": sha256, "method": method}
@@ -0,0 +1,81 @@
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, Tuple
+
+# In-process metrics registry (counters, gauges, summaries); exposed via the API's GET /metrics
+
+_RESERVOIR_SIZE = 1024
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_summaries: Dict[str, Dict[str, Any]] = {}
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{inner}}}"
+
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    k = _key(name, labels)
+    with _lock:
+        s = _summaries.get(k)
+        if s is None:
+            s = {"count": 0, "sum": 0.0, "min": value, "max": value, "recent": deque(maxlen=_RESERVOIR_SIZE)}
+            _summaries[k] = s
+        s["count"] += 1
+        s["sum"] += value
+        s["min"] = min(s["min"], value)
+        s["max"] = max(s["max"], value)
+        s["recent"].append(value)
+
+
+def percentiles(values: Iterable[float]) -> Tuple[float, float, float]:
+    """(p50, p95, p99) of the given samples (nearest rank)."""
+    data = sorted(values)
+    if not data:
+        return 0.0, 0.0, 0.0
+
+    def pick(q: float) -> float:
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+    return pick(0.50), pick(0.95), pick(0.99)
+
+
+def snapshot() -> Dict[str, Any]:
+    with _lock:
+        summaries = {}
+        for k, s in _summaries.items():
+            p50, p95, p99 = percentiles(s["recent"])
+            summaries[k] = {
+                "count": s["count"],
+                "sum": s["sum"],
+                "min": s["min"],
+                "max": s["max"],
+                "avg": s["sum"] / s["count"] if s["count"] else 0.0,
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+            }
+        return {"counters": dict(_counters), "gauges": dict(_gauges), "summaries": summaries}
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _summaries.clear()
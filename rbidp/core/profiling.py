@@ -0,0 +1,348 @@
+import io
+import sys
+import json
+import time
+import random
+import threading
+import contextvars
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    import cProfile
+
+from rbidp.core.config import (
+    RUNS_DIR,
+    PROFILE_ENGINE,
+    PROFILE_SAMPLE_PERCENT,
+    PROFILE_SLOW_MS,
+    PROFILE_INTERVAL_MS,
+    PROFILE_MEMORY_TOP,
+)
+from rbidp.core.run_store import artifact_exists, iter_run_dirs, load_json, write_artifact, write_json
+
+# Opt-in per-run profiling (see run_pipeline(profile=...)). Artifacts go to meta/ next to manifest.json:
+#   profile.json       summary + per-function self/cumulative seconds (what `aggregate` reads)
+#   profile_cpu.txt    top functions (pstats listing, or collapsed stacks from the sampler)
+#   profile_mem.txt    tracemalloc top allocation sites
+
+PROFILE_SUMMARY = "profile.json"
+PROFILE_CPU = "profile_cpu.txt"
+PROFILE_MEM = "profile_mem.txt"
+
+TRIGGER_REQUESTED = "requested"
+TRIGGER_SAMPLED = "sampled"
+TRIGGER_SLOW = "slow"
+
+# tracemalloc and cProfile are process-wide: concurrent profiled runs share them. tracemalloc is
+# only stopped when the profilers started it (not when it was already on, e.g. PYTHONTRACEMALLOC).
+_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+_cprofile_busy = False
+
+# The run's profiler, for pool tasks started with copy_context().run (see profiled_task)
+_current: "contextvars.ContextVar[Optional[RunProfiler]]" = contextvars.ContextVar("rbidp_profiler", default=None)
+
+T = TypeVar("T")
+
+
+def _func_key(code: Any) -> str:
+    # Same shape as pstats keys, so sampler and cProfile output aggregate together
+    return f"{code.co_filename}:{code.co_firstlineno}({code.co_name})"
+
+
+class _Sampler(threading.Thread):
+    """
+    Samples the stacks of the run's threads every interval (the calling thread plus pool workers
+    while they run the run's tasks); cheap enough to leave on for slow-run capture.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="rbidp-profiler", daemon=True)
+        self.thread_ids: Set[int] = {thread_id}
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(_func_key(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[tuple(reversed(stack))] += 1
+                    self.samples += 1
+
+    def functions(self) -> Dict[str, Dict[str, float]]:
+        out: Dict[str, Dict[str, float]] = {}
+        for stack, n in self.stacks.items():
+            secs = n * self.interval
+            leaf = stack[-1]
+            out.setdefault(leaf, {"self": 0.0, "cum": 0.0})["self"] += secs
+            for key in set(stack):
+                out.setdefault(key, {"self": 0.0, "cum": 0.0})["cum"] += secs
+        return out
+
+    def collapsed(self, limit: int = 200) -> str:
+        # flamegraph.pl / speedscope "collapsed stack" format
+        lines = [";".join(stack) + f" {n}" for stack, n in self.stacks.most_common(limit)]
+        return "\n".join(lines) + "\n"
+
+
+class RunProfiler:
+    def __init__(self, trigger: str, engine: Optional[str] = None, memory: bool = True, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.trigger = trigger
+        self.engine = engine or PROFILE_ENGINE
+        self.memory = memory
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self._profile: Optional["cProfile.Profile"] = None
+        self._thread_profiles: List["cProfile.Profile"] = []
+        self._sampler: Optional[_Sampler] = None
+        self._token: Optional[contextvars.Token] = None
+        self._started = 0.0
+        self.duration = 0.0
+        self.memory_peak: Optional[int] = None
+
+    def start(self) -> "RunProfiler":
+        global _tracemalloc_users, _tracemalloc_owned, _cprofile_busy
+        with _lock:
+            if self.engine == "cprofile" and not _cprofile_busy:
+                import cProfile  # loaded by profiled runs only
+
+                _cprofile_busy = True
+                self._profile = cProfile.Profile()
+            if self.memory:
+                if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start(1)
+                    _tracemalloc_owned = True
+                _tracemalloc_users += 1
+        if self._profile is not None:
+            try:
+                self._profile.enable()
+            except ValueError:
+                # Another profiler is active in this interpreter; fall back to sampling
+                self._release_cprofile()
+                self._profile = None
+        if self._profile is None:
+            self.engine = "sample"
+            self._sampler = _Sampler(threading.get_ident(), self.interval)
+            self._sampler.start()
+        self._token = _current.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    @contextmanager
+    def thread(self) -> Iterator[None]:
+        """Profile the calling (pool) thread for the duration of the block."""
+        if self._sampler is not None:
+            ident = threading.get_ident()
+            self._sampler.thread_ids.add(ident)
+            try:
+                yield
+            finally:
+                self._sampler.thread_ids.discard(ident)
+            return
+        profile = None
+        if self._profile is not None:
+            import cProfile
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+: the run's profile already sees every thread
+                profile = None
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                with _lock:
+                    self._thread_profiles.append(profile)
+
+    def _release_cprofile(self) -> None:
+        global _cprofile_busy
+        with _lock:
+            _cprofile_busy = False
+
+    def stop(self) -> Optional[tracemalloc.Snapshot]:
+        """Stops collection; returns the allocation snapshot (if memory was traced)."""
+        global _tracemalloc_users, _tracemalloc_owned
+        self.duration = time.perf_counter() - self._started
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                pass
+            self._token = None
+        if self._profile is not None:
+            self._profile.disable()
+            self._release_cprofile()
+        if self._sampler is not None:
+            self._sampler.stop_event.set()
+            self._sampler.join()
+        snapshot = None
+        if self.memory:
+            with _lock:
+                if tracemalloc.is_tracing():
+                    self.memory_peak = tracemalloc.get_traced_memory()[1]
+                    snapshot = tracemalloc.take_snapshot()
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0 and _tracemalloc_owned:
+                    tracemalloc.stop()
+                    _tracemalloc_owned = False
+        return snapshot
+
+    def _cpu(self) -> Tuple[Dict[str, Dict[str, float]], str]:
+        if self._profile is not None:
+            import pstats
+
+            buf = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=buf)
+            if self._thread_profiles:
+                stats.add(*self._thread_profiles)
+            functions = {
+                f"{file}:{line}({name})": {"self": tt, "cum": ct}
+                for (file, line, name), (_, _, tt, ct, _) in stats.stats.items()  # type: ignore[attr-defined]
+            }
+            stats.sort_stats("cumulative").print_stats(60)
+            return functions, buf.getvalue()
+        assert self._sampler is not None
+        return self._sampler.functions(), self._sampler.collapsed()
+
+    def save(self, meta_dir: Path, snapshot: Optional[tracemalloc.Snapshot], extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        functions, cpu_text = self._cpu()
+        top = sorted(functions.items(), key=lambda kv: kv[1]["self"], reverse=True)
+        summary: Dict[str, Any] = {
+            "trigger": self.trigger,
+            "engine": self.engine,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": self._sampler.samples if self._sampler is not None else None,
+            "interval_ms": self.interval * 1000 if self._sampler is not None else None,
+            "memory_peak_bytes": self.memory_peak,
+            "functions": {k: {"self": round(v["self"], 6), "cum": round(v["cum"], 6)} for k, v in top[:500]},
+        }
+        if extra:
+            summary.update(extra)
+        write_artifact(meta_dir / PROFILE_CPU, cpu_text.encode("utf-8"))
+        artifacts = {"summary": str(meta_dir / PROFILE_SUMMARY), "cpu": str(meta_dir / PROFILE_CPU)}
+        if snapshot is not None:
+            stats = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]).statistics("lineno")[:PROFILE_MEMORY_TOP]
+            summary["memory_top"] = [
+                {"site": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "size_bytes": s.size, "count": s.count}
+                for s in stats
+            ]
+            lines = ["# process-wide tracemalloc snapshot at the end of the run (concurrent runs included)"]
+            lines.extend(str(s) for s in stats)
+            write_artifact(meta_dir / PROFILE_MEM, ("\n".join(lines) + "\n").encode("utf-8"))
+            artifacts["memory"] = str(meta_dir / PROFILE_MEM)
+        write_json(meta_dir / PROFILE_SUMMARY, summary)
+        return {"trigger": self.trigger, "engine": self.engine, "artifacts": artifacts}
+
+
+def start_run_profile(requested: Optional[bool]) -> Optional[RunProfiler]:
+    """
+    requested=True profiles this run (CPU + memory); False never profiles it; None applies config:
+    PROFILE_SAMPLE_PERCENT of runs get a full profile, and with PROFILE_SLOW_MS a low-overhead
+    stack sampler (no tracemalloc) runs and is kept only when the run turns out slow.
+    """
+    if requested is False:
+        return None
+    if requested:
+        return RunProfiler(TRIGGER_REQUESTED).start()
+    if PROFILE_SAMPLE_PERCENT > 0 and random.random() * 100 < PROFILE_SAMPLE_PERCENT:
+        return RunProfiler(TRIGGER_SAMPLED).start()
+    if PROFILE_SLOW_MS > 0:
+        return RunProfiler(TRIGGER_SLOW, engine="sample", memory=False).start()
+    return None
+
+
+def profiled_task(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Run a pool task under the run's profiler, if any: submit it as
+    pool.submit(contextvars.copy_context().run, profiled_task, fn, *args).
+    """
+    profiler = _current.get()
+    if profiler is None:
+        return fn(*args)
+    with profiler.thread():
+        return fn(*args)
+
+
+def finish_run_profile(profiler: RunProfiler, meta_dir: Optional[Path], total_ms: float) -> Optional[Dict[str, Any]]:
+    """Stop the profiler and store its artifacts; slow-triggered profiles are dropped for fast runs."""
+    snapshot = profiler.stop()
+    if meta_dir is None:
+        return None
+    if profiler.trigger == TRIGGER_SLOW and total_ms < PROFILE_SLOW_MS:
+        return None
+    return profiler.save(meta_dir, snapshot, extra={"run_total_ms": round(total_ms, 3)})
+
+
+def aggregate(runs_root: Path, top: int = 30) -> Dict[str, Any]:
+    """Sum per-function self/cumulative seconds and allocation sites over every profiled run."""
+    functions: Dict[str, Dict[str, float]] = {}
+    memory: Dict[str, Dict[str, int]] = {}
+    runs = 0
+    for run_dir in iter_run_dirs(runs_root):
+        path = run_dir / "meta" / PROFILE_SUMMARY
+        if not artifact_exists(path):
+            continue
+        summary = load_json(path)
+        runs += 1
+        for key, v in summary.get("functions", {}).items():
+            acc = functions.setdefault(key, {"self": 0.0, "cum": 0.0, "runs": 0})
+            acc["self"] += v.get("self", 0.0)
+            acc["cum"] += v.get("cum", 0.0)
+            acc["runs"] += 1
+        for m in summary.get("memory_top", []):
+            acc_m = memory.setdefault(m["site"], {"size_bytes": 0, "count": 0, "runs": 0})
+            acc_m["size_bytes"] += m.get("size_bytes", 0)
+            acc_m["count"] += m.get("count", 0)
+            acc_m["runs"] += 1
+    by_self = sorted(functions.items(), key=lambda kv: kv[1]["self"], reverse=True)[:top]
+    by_mem = sorted(memory.items(), key=lambda kv: kv[1]["size_bytes"], reverse=True)[:top]
+    return {
+        "runs": runs,
+        "functions": [{"function": k, **{n: round(x, 6) if isinstance(x, float) else x for n, x in v.items()}} for k, v in by_self],
+        "memory": [{"site": k, **v} for k, v in by_mem],
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggregate per-run profiles")
+    parser.add_argument("--runs-root", default=RUNS_DIR)
+    parser.add_argument("--top", type=int, default=30)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    report = aggregate(Path(args.runs_root), top=args.top)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"Profiled runs: {report['runs']}\n")
+    print(f"{'self s':>10} {'cum s':>10} {'runs':>5}  function")
+    for f in report["functions"]:
+        print(f"{f['self']:>10.3f} {f['cum']:>10.3f} {f['runs']:>5}  {f['function']}")
+    if report["memory"]:
+        print(f"\n{'bytes':>12} {'count':>8} {'runs':>5}  allocation site")
+        for m in report["memory"]:
+            print(f"{m['size_bytes']:>12} {m['count']:>8} {m['runs']:>5}  {m['site']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from rbidp.core import metrics
+from rbidp.core.config import (
+    RUNS_DIR,
+    RETENTION_DAYS,
+    RETENTION_COMPACT_AFTER_DAYS,
+    RETENTION_TIER_AFTER_DAYS,
+    RETENTION_TIER_DIR,
+    RETENTION_IO_BYTES_PER_SEC,
+    RETENTION_STATE_FILENAME,
+)
+from rbidp.core.run_store import (
+    BUNDLE_FILENAME,
+    DAY_BUNDLE_FILENAME,
+    read_entry,
+    read_index,
+    write_bundle_iter,
+)
+
+logger = logging.getLogger(__name__)
+
+# Artifact kind by the first path component inside a run dir; anything unknown is kept like a verdict
+_KINDS = {"meta": "verdict", "ocr": "ocr", "gpt": "gpt", "input": "original"}
+
+# (name relative to the run dir, stored size, loader)
+_Entry = Tuple[str, int, Callable[[], bytes]]
+
+
+def artifact_kind(rel: str) -> str:
+    return _KINDS.get(rel.split("/", 1)[0], "verdict")
+
+
+class Throttle:
+    """Caps the average I/O rate of the job; compression CPU scales with the same bytes."""
+
+    def __init__(self, bytes_per_sec: int):
+        self.bytes_per_sec = bytes_per_sec
+        self.start = time.monotonic()
+        self.used = 0
+        self.slept = 0.0
+
+    def consume(self, n: int) -> None:
+        if self.bytes_per_sec <= 0:
+            return
+        self.used += n
+        ahead = self.used / self.bytes_per_sec - (time.monotonic() - self.start)
+        if ahead > 0:
+            time.sleep(ahead)
+            self.slept += ahead
+
+
+def _parse_day(name: str) -> Optional[date]:
+    try:
+        return datetime.strptime(name, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def iter_day_dirs(runs_root: Path) -> Iterator[Tuple[date, Path]]:
+    """runs/<YYYY-MM-DD>/ directories, oldest first."""
+    for p in sorted(Path(runs_root).iterdir()):
+        d = _parse_day(p.name)
+        if d is not None and p.is_dir():
+            yield d, p
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _file_loader(path: Path) -> Callable[[], bytes]:
+    def load() -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+    return load
+
+
+def _bundle_loader(path: Path, entry: List[Any]) -> Callable[[], bytes]:
+    return lambda: read_entry(path, entry)
+
+
+def _run_entries(run_dir: Path) -> List[_Entry]:
+    """Every artifact of one run: plain files plus whatever is packed in its run.bundle."""
+    entries: List[_Entry] = []
+    bundle = run_dir / BUNDLE_FILENAME
+    if bundle.exists():
+        for name, entry in read_index(bundle).items():
+            entries.append((name, entry[1], _bundle_loader(bundle, entry)))
+    for p in sorted(run_dir.rglob("*")):
+        if p.is_file() and p != bundle and not p.name.endswith(".tmp"):
+            entries.append((p.relative_to(run_dir).as_posix(), p.stat().st_size, _file_loader(p)))
+    return entries
+
+
+def _day_entries(day_dir: Path) -> Dict[str, List[_Entry]]:
+    """{run_id: entries} for a date dir, from run dirs and from an existing day.bundle."""
+    runs: Dict[str, List[_Entry]] = {}
+    day_bundle = day_dir / DAY_BUNDLE_FILENAME
+    if day_bundle.exists():
+        for name, entry in read_index(day_bundle).items():
+            run_id, rel = name.split("/", 1)
+            runs.setdefault(run_id, []).append((rel, entry[1], _bundle_loader(day_bundle, entry)))
+    for run_dir in sorted(p for p in day_dir.iterdir() if p.is_dir()):
+        # Run dirs win over older copies in day.bundle (an interrupted compaction is redone)
+        runs[run_dir.name] = _run_entries(run_dir)
+    return runs
+
+
+def _drop_from_run_dir(run_dir: Path, expired: Set[str], throttle: Throttle) -> None:
+    bundle = run_dir / BUNDLE_FILENAME
+    if bundle.exists():
+        index = read_index(bundle)
+        keep = {n: e for n, e in index.items() if artifact_kind(n) not in expired}
+        if len(keep) != len(index):
+            if keep:
+                def items() -> Iterator[Tuple[str, bytes]]:
+                    for name in sorted(keep):
+                        data = read_entry(bundle, keep[name])
+                        throttle.consume(2 * keep[name][1])
+                        yield name, data
+                write_bundle_iter(bundle, items())
+            else:
+                bundle.unlink()
+    for kind_dir, kind in _KINDS.items():
+        if kind in expired and (run_dir / kind_dir).exists():
+            shutil.rmtree(run_dir / kind_dir)
+
+
+def _compact_day(day_dir: Path, runs: Dict[str, List[_Entry]], expired: Set[str], throttle: Throttle) -> int:
+    """Write day.bundle from the non-expired artifacts, then remove the run dirs. Returns runs packed."""
+    day_bundle = day_dir / DAY_BUNDLE_FILENAME
+    keep = [
+        (f"{run_id}/{rel}", size, load)
+        for run_id in sorted(runs)
+        for rel, size, load in runs[run_id]
+        if artifact_kind(rel) not in expired
+    ]
+
+    def items() -> Iterator[Tuple[str, bytes]]:
+        for name, size, load in keep:
+            data = load()
+            throttle.consume(2 * size)
+            yield name, data
+
+    if keep:
+        write_bundle_iter(day_bundle, items())
+    elif day_bundle.exists():
+        day_bundle.unlink()
+    run_dirs = [p for p in day_dir.iterdir() if p.is_dir()]
+    for p in run_dirs:
+        shutil.rmtree(p)
+    return len(run_dirs)
+
+
+def _move_to_tier(day_dir: Path, day: date, tier_dir: Path, throttle: Throttle) -> int:
+    """Copy day.bundle to the cold tier (fsynced), then drop the local date dir. Returns bytes moved."""
+    src = day_dir / DAY_BUNDLE_FILENAME
+    moved = 0
+    if src.exists():
+        tier_dir.mkdir(parents=True, exist_ok=True)
+        dst = tier_dir / f"{day.isoformat()}.bundle"
+        tmp = dst.with_name(dst.name + ".tmp")
+        with open(src, "rb") as fin, open(tmp, "wb") as fout:
+            while True:
+                block = fin.read(1024 * 1024)
+                if not block:
+                    break
+                fout.write(block)
+                moved += len(block)
+                throttle.consume(2 * len(block))
+            fout.flush()
+            os.fsync(fout.fileno())
+        os.replace(tmp, dst)
+    shutil.rmtree(day_dir)
+    return moved
+
+
+def _load_state(path: Path) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"days": {}}
+
+
+def _save_state(path: Path, state: Dict[str, Any]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def run_retention(
+    runs_root: Path,
+    policy: Optional[Dict[str, int]] = None,
+    compact_after_days: int = RETENTION_COMPACT_AFTER_DAYS,
+    tier_after_days: int = RETENTION_TIER_AFTER_DAYS,
+    tier_dir: Optional[str] = RETENTION_TIER_DIR,
+    io_bytes_per_sec: int = RETENTION_IO_BYTES_PER_SEC,
+    max_seconds: Optional[float] = None,
+    today: Optional[date] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    One incremental pass over runs/<date>/ dirs, oldest first:
+    - artifacts whose kind is older than its retention (RETENTION_DAYS) are deleted
+    - days older than compact_after_days are packed into runs/<date>/day.bundle
+    - compacted days older than tier_after_days move to tier_dir/<date>.bundle
+    Each date dir is finished (new bundle written and fsynced before anything is deleted) and
+    checkpointed in RETENTION_STATE_FILENAME, so a pass stopped by max_seconds resumes where it
+    left off and days with nothing new to do are skipped without being read.
+    Today's and yesterday's dirs are never touched. Returns a report with reclaimed bytes.
+    """
+    runs_root = Path(runs_root)
+    policy = dict(RETENTION_DAYS if policy is None else policy)
+    today = today or date.today()
+    tier = Path(tier_dir) if tier_dir and tier_after_days >= 0 else None
+    throttle = Throttle(io_bytes_per_sec)
+    state_path = runs_root / RETENTION_STATE_FILENAME
+    state = _load_state(state_path)
+    started = time.monotonic()
+
+    report: Dict[str, Any] = {
+        "days_scanned": 0,
+        "days_processed": 0,
+        "runs_compacted": 0,
+        "bytes_before": 0,
+        "bytes_after": 0,
+        "reclaimed_bytes": 0,
+        "reclaimed_by_kind": {kind: 0 for kind in sorted(set(_KINDS.values()))},
+        "tiered_bytes": 0,
+        "complete": True,
+        "dry_run": dry_run,
+    }
+
+    for day, day_dir in iter_day_dirs(runs_root) if runs_root.exists() else []:
+        age = (today - day).days
+        if age < 2:
+            continue
+        report["days_scanned"] += 1
+        expired = {kind for kind, days in policy.items() if days >= 0 and age > days}
+        to_tier = tier is not None and age > tier_after_days
+        compact = to_tier or (compact_after_days >= 0 and age > compact_after_days)
+        target = {"expired": sorted(expired), "compacted": compact, "tiered": to_tier}
+        if state["days"].get(day.isoformat()) == target:
+            continue
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            report["complete"] = False
+            break
+
+        runs = _day_entries(day_dir)
+        has_run_dirs = any(p.is_dir() for p in day_dir.iterdir())
+        dropped: Dict[str, int] = {}
+        for entries in runs.values():
+            for rel, size, _ in entries:
+                kind = artifact_kind(rel)
+                if kind in expired:
+                    dropped[kind] = dropped.get(kind, 0) + size
+        before = _tree_size(day_dir)
+        report["bytes_before"] += before
+
+        if dry_run:
+            for kind, n in dropped.items():
+                report["reclaimed_by_kind"][kind] += n
+            report["bytes_after"] += before - sum(dropped.values())
+            continue
+
+        if compact and (has_run_dirs or dropped):
+            report["runs_compacted"] += _compact_day(day_dir, runs, expired, throttle)
+        elif dropped:
+            for run_dir in (p for p in day_dir.iterdir() if p.is_dir()):
+                _drop_from_run_dir(run_dir, expired, throttle)
+        moved = _move_to_tier(day_dir, day, tier, throttle) if to_tier else 0
+
+        after = _tree_size(day_dir) if day_dir.exists() else 0
+        for kind, n in dropped.items():
+            report["reclaimed_by_kind"][kind] += n
+            metrics.inc("retention_reclaimed_bytes_total", n, kind=kind)
+        report["tiered_bytes"] += moved
+        report["bytes_after"] += after
+        report["days_processed"] += 1
+        state["days"][day.isoformat()] = target
+        _save_state(state_path, state)
+        logger.info("Retention %s: %s -> %s bytes (expired=%s, compacted=%s, tiered=%s)", day, before, after, sorted(expired), compact, to_tier)
+
+    report["reclaimed_bytes"] = report["bytes_before"] - report["bytes_after"]
+    # What compaction alone saved (small-file overhead, JSON whitespace, compression)
+    report["reclaimed_by_kind"]["compaction"] = max(
+        0, report["reclaimed_bytes"] - report["tiered_bytes"] - sum(report["reclaimed_by_kind"].values())
+    )
+    report["throttled_seconds"] = round(throttle.slept, 3)
+    report["elapsed_seconds"] = round(time.monotonic() - started, 3)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="RB IDP runs/ retention, compaction and archival")
+    parser.add_argument("--runs-root", default=RUNS_DIR)
+    for kind in RETENTION_DAYS:
+        parser.add_argument(f"--{kind}-days", type=int, default=RETENTION_DAYS[kind], help="-1 keeps forever")
+    parser.add_argument("--compact-after-days", type=int, default=RETENTION_COMPACT_AFTER_DAYS)
+    parser.add_argument("--tier-after-days", type=int, default=RETENTION_TIER_AFTER_DAYS)
+    parser.add_argument("--tier-dir", default=RETENTION_TIER_DIR)
+    parser.add_argument("--io-bytes-per-sec", type=int, default=RETENTION_IO_BYTES_PER_SEC, help="0 = unthrottled")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Stop after this long; the next pass resumes")
+    parser.add_argument("--nice", type=int, default=10, help="CPU niceness increment for this process")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.nice > 0 and hasattr(os, "nice"):
+        os.nice(args.nice)
+    report = run_retention(
+        Path(args.runs_root),
+        policy={kind: getattr(args, f"{kind}_days") for kind in RETENTION_DAYS},
+        compact_after_days=args.compact_after_days,
+        tier_after_days=args.tier_after_days,
+        tier_dir=args.tier_dir,
+        io_bytes_per_sec=args.io_bytes_per_sec,
+        max_seconds=args.max_seconds,
+        dry_run=args.dry_run,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import zlib
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import zstandard as _zstd  # type: ignore
+except Exception:
+    _zstd = None
+
+# Single-file run storage: one compressed bundle per run instead of ~10 small JSON files.
+#
+# Layout of <run_dir>/run.bundle:
+#   MAGIC
+#   record*            (compressed artifact bytes, back to back)
+#   index              (compact JSON: {name: [offset, length, codec, raw_size]})
+#   u64 index_offset, u64 index_length, INDEX_MAGIC
+#
+# Artifact names are paths relative to the run dir, e.g. "meta/final_result.json".
+# A run in bundle mode never writes the small files: its artifacts go to an in-memory
+# BundleWriter (open_run_bundle) and run.bundle is written once when the run ends.
+# pack_run is only the converter for runs stored as plain files.
+# A compacted day (rbidp.core.retention) uses the same format in runs/<date>/day.bundle,
+# with names prefixed by the run id, e.g. "<run_id>/meta/final_result.json".
+
+BUNDLE_FILENAME = "run.bundle"
+DAY_BUNDLE_FILENAME = "day.bundle"
+MAGIC = b"RBIDPB1\n"
+INDEX_MAGIC = b"RBIDPIX1"
+_TRAILER = struct.Struct("<QQ8s")
+
+# Only pipeline artifacts are bundled; the input original stays a plain file
+BUNDLED_DIRS = ("meta", "ocr", "gpt")
+
+PathLike = Union[str, os.PathLike]
+
+
+def _default_codec() -> str:
+    return "zstd" if _zstd is not None else "zlib"
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _zstd.ZstdCompressor(level=3).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    return data
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if _zstd is None:
+            raise RuntimeError("zstandard is required to read this bundle")
+        return _zstd.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    return data
+
+
+def _compact_json(data: bytes) -> bytes:
+    # Pretty-printed artifacts are re-serialized compactly; anything else is stored as-is
+    try:
+        return json.dumps(json.loads(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    except Exception:
+        return data
+
+
+def write_bundle(path: Path, artifacts: Dict[str, bytes], codec: Optional[str] = None) -> Path:
+    """Write artifacts {name: bytes} into one bundle file (atomically, fsynced once)."""
+    return write_bundle_iter(path, ((name, artifacts[name]) for name in sorted(artifacts)), codec=codec)
+
+
+def write_bundle_iter(path: Path, items: Iterable[Tuple[str, bytes]], codec: Optional[str] = None) -> Path:
+    """write_bundle for (name, bytes) pairs produced one at a time, so only one artifact is held in memory."""
+    codec = codec or _default_codec()
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    index: Dict[str, List[Any]] = {}
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for name, raw in items:
+            blob = _compress(raw, codec)
+            f.write(blob)
+            index[name] = [offset, len(blob), codec, len(raw)]
+            offset += len(blob)
+        index_bytes = json.dumps(index, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        f.write(index_bytes)
+        f.write(_TRAILER.pack(offset, len(index_bytes), INDEX_MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+class BundleWriter:
+    """A run's artifacts held in memory until the run ends, then written as run.bundle in one go."""
+
+    def __init__(self, run_dir: Path, codec: Optional[str] = None):
+        self.run_dir = run_dir
+        self.codec = codec
+        self.artifacts: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def put(self, name: str, data: bytes) -> None:
+        with self._lock:
+            self.artifacts[name] = data
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            return self.artifacts.get(name)
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            self.artifacts.pop(name, None)
+
+    def close(self) -> Optional[Path]:
+        with self._lock:
+            artifacts, self.artifacts = self.artifacts, {}
+        bundle = self.run_dir / BUNDLE_FILENAME
+        if bundle.exists():
+            for name, entry in read_index(bundle).items():
+                if name not in artifacts:
+                    artifacts[name] = read_entry(bundle, entry)
+        if not artifacts:
+            return None
+        return write_bundle(bundle, artifacts, codec=self.codec)
+
+
+# Open writers by run dir; pool threads of a run write through the same one
+_writers: Dict[Path, BundleWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def open_run_bundle(run_dir: PathLike, codec: Optional[str] = None) -> BundleWriter:
+    writer = BundleWriter(Path(run_dir), codec=codec)
+    with _writers_lock:
+        _writers[writer.run_dir] = writer
+    return writer
+
+
+def close_run_bundle(run_dir: PathLike) -> Optional[Path]:
+    """Write the run's collected artifacts to run.bundle (fsynced once) and forget the writer."""
+    with _writers_lock:
+        writer = _writers.pop(Path(run_dir), None)
+    return writer.close() if writer is not None else None
+
+
+def _writer_for(path: PathLike) -> Optional[Tuple[BundleWriter, str]]:
+    if not _writers:
+        return None
+    p = Path(path)
+    # Only run_dir/<meta|ocr|gpt>/name: a "meta" higher up (e.g. in the runs root) is not the run's
+    if p.parent.name not in BUNDLED_DIRS:
+        return None
+    writer = _writers.get(p.parent.parent)
+    return (writer, f"{p.parent.name}/{p.name}") if writer is not None else None
+
+
+def write_artifact(path: PathLike, data: bytes) -> None:
+    """Store an artifact under its path: in the run's open bundle writer, else as a plain file."""
+    target = _writer_for(path)
+    if target is not None:
+        writer, name = target
+        writer.put(name, _compact_json(data) if name.endswith(".json") else data)
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def write_json(path: PathLike, obj: Any) -> None:
+    """JSON artifact: compact inside a bundle, pretty-printed as a plain file."""
+    target = _writer_for(path)
+    if target is not None:
+        target[0].put(target[1], json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        return
+    write_artifact(path, json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def remove_artifact(path: PathLike) -> None:
+    target = _writer_for(path)
+    if target is not None:
+        target[0].remove(target[1])
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def read_index(path: PathLike) -> Dict[str, List[Any]]:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a run bundle: {path}")
+        f.seek(-_TRAILER.size, os.SEEK_END)
+        index_offset, index_length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Corrupt run bundle trailer: {path}")
+        f.seek(index_offset)
+        return json.loads(f.read(index_length))
+
+
+def read_entry(path: PathLike, entry: List[Any]) -> bytes:
+    """Read one record given its index entry (avoids re-reading the index per artifact)."""
+    offset, length, codec, _ = entry
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return _decompress(f.read(length), codec)
+
+
+def read_bundle_artifact(path: PathLike, name: str) -> bytes:
+    index = read_index(path)
+    if name not in index:
+        raise FileNotFoundError(f"{name} not in {path}")
+    return read_entry(path, index[name])
+
+
+def _locate(path: PathLike) -> Optional[Tuple[Path, str]]:
+    """
+    Map an artifact path (run_dir/<meta|ocr|gpt>/name or run_dir/input/original/name) to
+    (bundle path, artifact name): the run's own run.bundle, else the compacted day.bundle of its
+    date dir.
+    """
+    p = Path(path)
+    # Matched at the run level only, like _writer_for
+    if p.parent.name in BUNDLED_DIRS:
+        run_dir = p.parent.parent
+    elif p.parent.name == "original" and p.parent.parent.name == "input":
+        run_dir = p.parent.parent.parent
+    else:
+        return None
+    rel = p.relative_to(run_dir).as_posix()
+    bundle = run_dir / BUNDLE_FILENAME
+    if p.parent.name in BUNDLED_DIRS and bundle.exists():
+        return bundle, rel
+    day_bundle = run_dir.parent / DAY_BUNDLE_FILENAME
+    if day_bundle.exists():
+        return day_bundle, f"{run_dir.name}/{rel}"
+    return None
+
+
+def artifact_exists(path: PathLike) -> bool:
+    target = _writer_for(path)
+    if target is not None and target[0].get(target[1]) is not None:
+        return True
+    if os.path.exists(path):
+        return True
+    loc = _locate(path)
+    return bool(loc and loc[1] in read_index(loc[0]))
+
+
+def read_artifact(path: PathLike) -> bytes:
+    """Read an artifact by its original path: from the run's open writer, a plain file or run.bundle."""
+    target = _writer_for(path)
+    if target is not None:
+        data = target[0].get(target[1])
+        if data is not None:
+            return data
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    loc = _locate(path)
+    if loc is None:
+        raise FileNotFoundError(str(path))
+    return read_bundle_artifact(loc[0], loc[1])
+
+
+def load_json(path: PathLike) -> Any:
+    return json.loads(read_artifact(path).decode("utf-8"))
+
+
+def _iter_run_files(run_dir: Path) -> Iterator[Tuple[str, Path]]:
+    for d in BUNDLED_DIRS:
+        base = run_dir / d
+        if not base.is_dir():
+            continue
+        for p in sorted(base.rglob("*")):
+            if p.is_file():
+                yield p.relative_to(run_dir).as_posix(), p
+
+
+def pack_run(run_dir: PathLike, remove: bool = True, codec: Optional[str] = None) -> Optional[Path]:
+    """
+    Pack meta/, ocr/ and gpt/ of a run stored as plain files into run.bundle and (by default)
+    delete the small files and their now-empty directories. The converter for existing runs;
+    new runs in bundle mode go through open_run_bundle instead.
+    """
+    run_dir = Path(run_dir)
+    bundle = run_dir / BUNDLE_FILENAME
+    files = list(_iter_run_files(run_dir))
+    if not files:
+        return bundle if bundle.exists() else None
+    artifacts: Dict[str, bytes] = {}
+    if bundle.exists():
+        # Re-packing after new files appeared: keep what is already bundled
+        for name in read_index(bundle):
+            artifacts[name] = read_bundle_artifact(bundle, name)
+    for name, p in files:
+        with open(p, "rb") as f:
+            data = f.read()
+        artifacts[name] = _compact_json(data) if name.endswith(".json") else data
+    write_bundle(bundle, artifacts, codec=codec)
+    if remove:
+        for _, p in files:
+            p.unlink()
+        for d in BUNDLED_DIRS:
+            for sub in sorted((run_dir / d).glob("**/"), key=lambda x: len(x.parts), reverse=True):
+                try:
+                    sub.rmdir()
+                except OSError:
+                    pass
+    return bundle
+
+
+def unpack_run(run_dir: PathLike, remove: bool = True) -> int:
+    """Restore the plain file layout (pretty-printed JSON) from run.bundle."""
+    run_dir = Path(run_dir)
+    bundle = run_dir / BUNDLE_FILENAME
+    index = read_index(bundle)
+    for name in index:
+        data = read_bundle_artifact(bundle, name)
+        out = run_dir / name
+        out.parent.mkdir(parents=True, exist_ok=True)
+        if name.endswith(".json"):
+            try:
+                data = json.dumps(json.loads(data), ensure_ascii=False, indent=2).encode("utf-8")
+            except Exception:
+                pass
+        with open(out, "wb") as f:
+            f.write(data)
+    if remove:
+        bundle.unlink()
+    return len(index)
+
+
+def iter_run_dirs(runs_root: PathLike) -> Iterator[Path]:
+    """runs/<YYYY-MM-DD>/<run_id>/ directories, oldest first."""
+    root = Path(runs_root)
+    for day in sorted(p for p in root.iterdir() if p.is_dir()):
+        for run_dir in sorted(p for p in day.iterdir() if p.is_dir()):
+            if (run_dir / "meta").is_dir() or (run_dir / BUNDLE_FILENAME).exists():
+                yield run_dir
+
+
+def convert_runs(runs_root: PathLike, codec: Optional[str] = None) -> Dict[str, int]:
+    converted = skipped = 0
+    for run_dir in iter_run_dirs(runs_root):
+        if pack_run(run_dir, codec=codec) is not None:
+            converted += 1
+        else:
+            skipped += 1
+    return {"converted": converted, "skipped": skipped}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse  # CLI only; the pipeline imports this module
+
+    parser = argparse.ArgumentParser(description="Run bundle tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_conv = sub.add_parser("convert", help="Pack every existing run under a runs root")
+    p_conv.add_argument("runs_root")
+    p_pack = sub.add_parser("pack", help="Pack one run dir")
+    p_pack.add_argument("run_dir")
+    p_unpack = sub.add_parser("unpack", help="Restore plain files of one run dir")
+    p_unpack.add_argument("run_dir")
+    p_ls = sub.add_parser("ls", help="List artifacts in a run bundle")
+    p_ls.add_argument("run_dir")
+    p_cat = sub.add_parser("cat", help="Print one artifact, e.g. meta/final_result.json")
+    p_cat.add_argument("run_dir")
+    p_cat.add_argument("name")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "convert":
+        print(json.dumps(convert_runs(args.runs_root)))
+    elif args.cmd == "pack":
+        print(pack_run(args.run_dir))
+    elif args.cmd == "unpack":
+        print(unpack_run(args.run_dir))
+    elif args.cmd == "ls":
+        for name, (_, length, codec, raw_size) in read_index(Path(args.run_dir) / BUNDLE_FILENAME).items():
+            print(f"{name}\t{raw_size}\t{length}\t{codec}")
+    elif args.cmd == "cat":
+        sys.stdout.buffer.write(read_artifact(Path(args.run_dir) / args.name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import contextvars
+import urllib.request
+import logging.handlers
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from rbidp.core import metrics
+from rbidp.core.config import (
+    TRACING_EXPORTER,
+    TRACING_JSONL_PATH,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_SERVICE_NAME,
+    TRACING_QUEUE_SIZE,
+    TRACING_BATCH_SIZE,
+    TRACING_FLUSH_SECONDS,
+)
+
+# Lightweight tracing: a span per pipeline stage and per upstream call, correlated by run_id.
+# Spans follow contextvars, so pool tasks started with copy_context().run nest under the
+# caller's span. Finished spans are exported off the request path by a background thread.
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("rbidp_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "run_id", "start_ns", "end_ns", "attributes", "status", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, run_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else _new_id(16)
+        self.span_id = _new_id(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.run_id = run_id or (parent.run_id if parent is not None else None)
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def fail(self, error: Any) -> None:
+        self.status = "error"
+        self.error = str(error)[:500]
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        processor = _get_processor()
+        if processor is not None:
+            processor.submit(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "run_id": self.run_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_run_id() -> Optional[str]:
+    s = _current.get()
+    return s.run_id if s is not None else None
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Annotate the current span (no-op outside a span)."""
+    s = _current.get()
+    if s is not None:
+        s.attributes.update(attributes)
+
+
+def start_span(name: str, run_id: Optional[str] = None, **attributes: Any) -> Span:
+    """A child of the current span; not activated (see activate())."""
+    return Span(name, parent=_current.get(), run_id=run_id, attributes=attributes)
+
+
+def activate(s: Optional[Span]) -> contextvars.Token:
+    return _current.set(s)
+
+
+def deactivate(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def span(name: str, run_id: Optional[str] = None, **attributes: Any) -> Iterator[Span]:
+    """Open a span as the current one for the block; exceptions mark it as failed."""
+    s = start_span(name, run_id=run_id, **attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.fail(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+
+
+# --- Exporters ----------------------------------------------------------------------------------
+
+class JsonlExporter:
+    """One JSON object per span, appended to a local file (offline analysis, jq, pandas)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for s in spans:
+                f.write(json.dumps(s, ensure_ascii=False) + "\n")
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP with the JSON encoding (POST {endpoint}, e.g. an OpenTelemetry Collector on :4318/v1/traces)."""
+
+    def __init__(self, endpoint: str, service_name: str = TRACING_SERVICE_NAME, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _span(self, s: Dict[str, Any]) -> Dict[str, Any]:
+        attrs = dict(s["attributes"])
+        if s.get("run_id"):
+            attrs["rbidp.run_id"] = s["run_id"]
+        out = {
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attrs.items() if v is not None],
+            "status": {"code": 2, "message": s.get("error") or ""} if s["status"] == "error" else {"code": 1},
+        }
+        if s.get("parent_id"):
+            out["parentSpanId"] = s["parent_id"]
+        return out
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "rbidp"}, "spans": [self._span(s) for s in spans]}],
+            }]
+        }
+        req = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            resp.read()
+
+
+class BatchSpanProcessor:
+    """Bounded queue + exporter thread; a full queue drops spans instead of blocking a run."""
+
+    def __init__(self, exporter: Any, max_queue: int = TRACING_QUEUE_SIZE, batch_size: int = TRACING_BATCH_SIZE, flush_seconds: float = TRACING_FLUSH_SECONDS):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._loop, name="rbidp-trace-export", daemon=True)
+        self._thread.start()
+
+    def submit(self, span_dict: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(span_dict)
+        except queue.Full:
+            metrics.inc("tracing_dropped_spans_total")
+
+    def _export(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.exporter.export(batch)
+            metrics.inc("tracing_exported_spans_total", len(batch))
+        except Exception:
+            metrics.inc("tracing_export_errors_total")
+
+    def _loop(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_seconds
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+                if batch:
+                    self._export(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_seconds
+                continue
+            if item is None:
+                if batch:
+                    self._export(batch)
+                return
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._export(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_seconds
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+_processor: Optional[BatchSpanProcessor] = None
+_processor_ready = False
+_processor_lock = threading.Lock()
+
+
+def make_exporter(kind: str) -> Optional[Any]:
+    if kind == "jsonl":
+        return JsonlExporter(TRACING_JSONL_PATH)
+    if kind == "otlp":
+        return OtlpHttpExporter(TRACING_OTLP_ENDPOINT)
+    return None
+
+
+def configure(exporter: Optional[Any]) -> None:
+    """Install an exporter (anything with export(list_of_span_dicts)); None turns exporting off."""
+    global _processor, _processor_ready
+    with _processor_lock:
+        old = _processor
+        _processor = BatchSpanProcessor(exporter) if exporter is not None else None
+        _processor_ready = True
+    if old is not None:
+        old.shutdown()
+
+
+def _get_processor() -> Optional[BatchSpanProcessor]:
+    global _processor, _processor_ready
+    if not _processor_ready:
+        with _processor_lock:
+            if not _processor_ready:
+                exporter = make_exporter(TRACING_EXPORTER)
+                _processor = BatchSpanProcessor(exporter) if exporter is not None else None
+                _processor_ready = True
+    return _processor
+
+
+def _shutdown() -> None:
+    if _processor is not None:
+        _processor.shutdown()
+
+
+atexit.register(_shutdown)
+
+
+# --- Logging ------------------------------------------------------------------------------------
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [run=%(run_id)s span=%(span_id)s]: %(message)s"
+
+
+class RunContextFilter(logging.Filter):
+    """Stamps run_id / trace_id / span_id of the current span on every record (in the caller's thread)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        s = _current.get()
+        record.run_id = s.run_id if s is not None and s.run_id else "-"
+        record.trace_id = s.trace_id if s is not None else "-"
+        record.span_id = s.span_id if s is not None else "-"
+        return True
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_logging_lock = threading.Lock()
+
+
+def setup_logging(level: Any = logging.INFO, fmt: str = LOG_FORMAT, handler: Optional[logging.Handler] = None) -> None:
+    """
+    Route the root logger through a QueueHandler: callers only enqueue the record, a listener
+    thread formats and writes it. Safe to call repeatedly (Streamlit re-runs app.py); later
+    calls only change the level.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    with _logging_lock:
+        if _listener is not None:
+            return
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(RunContextFilter())
+        target = handler or logging.StreamHandler()
+        target.setFormatter(logging.Formatter(fmt))
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        root.addHandler(queue_handler)
+        _listener = logging.handlers.QueueListener(log_queue, target, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
@@ -0,0 +1,211 @@
+import re
+import json
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from rbidp.core import metrics, tracing
+from rbidp.core.config import GPT_TOKENIZER, RUNS_DIR
+from rbidp.core.run_store import artifact_exists, iter_run_dirs, load_json
+
+# GPT token accounting. Every call a run makes is recorded in the run's ledger (activated by the
+# orchestrator and followed by contextvars into pool tasks) under the pipeline stage that made it;
+# the summary goes to manifest "usage". The provider's usage block is taken when the response has
+# one; otherwise (streamed answers, gateways without usage) both counts are local estimates.
+#
+#   python -m rbidp.core.usage      # tokens per day, stage and doc type over runs/
+
+# Model-like tokens: short pieces of words, punctuation on its own (whitespace joins the next token)
+_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]")
+
+_encoders: Dict[str, Any] = {}
+_encoders_lock = threading.Lock()
+
+
+def _encoder(model: str) -> Any:
+    if GPT_TOKENIZER != "tiktoken":
+        return None
+    with _encoders_lock:
+        if model not in _encoders:
+            try:
+                import tiktoken  # type: ignore
+
+                try:
+                    enc = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    enc = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                enc = None  # not installed (or no encoding files): the heuristic below
+            _encoders[model] = enc
+        return _encoders[model]
+
+
+def estimate_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Token count of `text` for `model`: exact with tiktoken (GPT_TOKENIZER), else a close estimate."""
+    if not text:
+        return 0
+    enc = _encoder(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return len(_TOKEN_RE.findall(text))
+
+
+def _first_int(d: Dict[str, Any], *keys: str) -> Optional[int]:
+    for k in keys:
+        v = d.get(k)
+        if isinstance(v, int) and not isinstance(v, bool):
+            return v
+    return None
+
+
+def usage_from_response(raw: str) -> Optional[Dict[str, int]]:
+    """The provider's usage block of a response body (the gateway may put it on any JSON line)."""
+    if not raw or ("usage" not in raw and "Usage" not in raw):
+        return None
+    candidates: List[str] = [raw]
+    if "\n" in raw:
+        candidates.extend(line for line in raw.splitlines() if "sage" in line)  # usage / Usage
+    for text in candidates:
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            continue
+        usage = obj.get("usage") or obj.get("Usage") if isinstance(obj, dict) else None
+        if not isinstance(usage, dict):
+            continue
+        prompt = _first_int(usage, "prompt_tokens", "input_tokens", "PromptTokens")
+        completion = _first_int(usage, "completion_tokens", "output_tokens", "CompletionTokens")
+        if prompt is None or completion is None:
+            continue
+        total = _first_int(usage, "total_tokens", "TotalTokens")
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": total if total is not None else prompt + completion}
+    return None
+
+
+def _add(acc: Dict[str, int], call: Dict[str, Any]) -> None:
+    acc["calls"] = acc.get("calls", 0) + 1
+    for k in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        acc[k] = acc.get(k, 0) + call[k]
+
+
+class UsageLedger:
+    """GPT calls of one run; thread-safe (long-document chunks call from a pool)."""
+
+    def __init__(self, doc_type: Optional[str] = None):
+        self.doc_type = doc_type or "other"  # metric label: a known doc type or "other"
+        self.stage = "unknown"
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, call: Dict[str, Any]) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = list(self.calls)
+        total: Dict[str, int] = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        by_stage: Dict[str, Dict[str, int]] = {}
+        for c in calls:
+            _add(total, c)
+            _add(by_stage.setdefault(c["stage"], {}), c)
+        return {**total, "estimated_calls": sum(1 for c in calls if c["source"] == "estimate"), "by_stage": by_stage}
+
+
+_ledger: contextvars.ContextVar[Optional[UsageLedger]] = contextvars.ContextVar("rbidp_usage", default=None)
+
+
+@contextmanager
+def usage_scope(ledger: UsageLedger) -> Iterator[UsageLedger]:
+    """Record the GPT calls made inside the block (same thread/context) into `ledger`."""
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+
+
+def set_stage(stage: str) -> None:
+    ledger = _ledger.get()
+    if ledger is not None:
+        ledger.stage = stage
+
+
+def record_call(model: str, prompt: str, raw: str, completion: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Account one finished GPT call: the usage block of `raw` when present, else estimates of the
+    prompt and of the completion text (`completion`, default `raw`).
+    """
+    usage = usage_from_response(raw)
+    if usage is not None:
+        call: Dict[str, Any] = {**usage, "source": "provider"}
+    else:
+        p = estimate_tokens(prompt, model)
+        c = estimate_tokens(raw if completion is None else completion, model)
+        call = {"prompt_tokens": p, "completion_tokens": c, "total_tokens": p + c, "source": "estimate"}
+    call["model"] = model
+    ledger = _ledger.get()
+    stage = ledger.stage if ledger is not None else "unknown"
+    doc_type = ledger.doc_type if ledger is not None else "other"
+    call["stage"] = stage
+    if ledger is not None:
+        ledger.add(call)
+    metrics.inc("gpt_tokens_total", call["prompt_tokens"], kind="prompt", stage=stage, doc_type=doc_type)
+    metrics.inc("gpt_tokens_total", call["completion_tokens"], kind="completion", stage=stage, doc_type=doc_type)
+    tracing.set_attributes(prompt_tokens=call["prompt_tokens"], completion_tokens=call["completion_tokens"], usage_source=call["source"])
+    return call
+
+
+def aggregate(runs_root: Path) -> Dict[str, Any]:
+    """Sum manifest "usage" per day, and per stage and declared doc type within each day."""
+    days: Dict[str, Dict[str, Any]] = {}
+    for run_dir in iter_run_dirs(runs_root):
+        path = run_dir / "meta" / "manifest.json"
+        if not artifact_exists(path):
+            continue
+        try:
+            manifest = load_json(path)
+        except Exception:
+            continue
+        usage = manifest.get("usage")
+        if not isinstance(usage, dict) or not usage.get("calls"):
+            continue
+        day = days.setdefault(run_dir.parent.name, {"runs": 0, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "by_stage": {}, "by_doc_type": {}})
+        doc_type = (manifest.get("user_input") or {}).get("doc_type") or "unknown"
+        day["runs"] += 1
+        acc_doc = day["by_doc_type"].setdefault(doc_type, {"runs": 0, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})
+        acc_doc["runs"] += 1
+        for acc in (day, acc_doc):
+            for k in ("calls", "prompt_tokens", "completion_tokens", "total_tokens"):
+                acc[k] += usage.get(k, 0)
+        for stage, v in (usage.get("by_stage") or {}).items():
+            acc_stage = day["by_stage"].setdefault(stage, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0})
+            for k in acc_stage:
+                acc_stage[k] += v.get(k, 0)
+    return {"days": days}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="GPT token usage per day, stage and doc type")
+    parser.add_argument("--runs-root", default=RUNS_DIR)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args(argv)
+
+    report = aggregate(Path(args.runs_root))
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    for day, d in sorted(report["days"].items()):
+        print(f"{day}: {d['runs']} runs, {d['calls']} calls, {d['prompt_tokens']} prompt + {d['completion_tokens']} completion = {d['total_tokens']} tokens")
+        for stage, v in sorted(d["by_stage"].items()):
+            print(f"  stage {stage:<12} {v['calls']:>6} calls {v['prompt_tokens']:>10} + {v['completion_tokens']:>8}")
+        for doc_type, v in sorted(d["by_doc_type"].items(), key=lambda kv: -kv[1]["total_tokens"]):
+            print(f"  {v['runs']:>5} runs {v['total_tokens']:>10} tokens  {doc_type}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,81 @@
 import os
 import re
 import json
+import time
 import uuid
-import shutil
 import logging
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
 
-from rbidp.clients.textract_client import ask_textract
+from rbidp.clients.textract_client import ask_textract, ask_textract_per_page
+from rbidp.clients.scheduler import priority_scope
 from rbidp.processors.filter_textract_response import filter_textract_response
+from rbidp.processors.image_to_pdf_converter import pil_image
 from rbidp.processors.agent_doc_type_checker import check_single_doc_type
+from rbidp.processors.agent_combined import check_and_extract
 from rbidp.processors.agent_extractor import extract_doc_data
+from rbidp.processors.prompt_registry import canonical_doc_type, prompt_for
+from rbidp.processors.preflight import estimate, over_budget, plan_calls
+from rbidp.processors.agent_long_extractor import extract_doc_data_long, check_single_doc_type_long
+from rbidp.processors.multidoc_detector import detect_multiple_documents
 from rbidp.processors.filter_gpt_generic_response import filter_gpt_generic_response
 from rbidp.processors.merge_outputs import merge_extractor_and_doc_type
 from rbidp.processors.validator import validate_run
+from rbidp.core import metrics, tracing, usage
 from rbidp.core.errors import make_error
+from rbidp.core.ingest import InputSource, ingest_input, source_name
+from rbidp.core.run_store import (
+    artifact_exists,
+    close_run_bundle,
+    load_json,
+    open_run_bundle,
+    remove_artifact,
+    write_artifact,
+    write_json,
+)
+from rbidp.core.profiling import finish_run_profile, start_run_profile
+from rbidp.core.idempotency import CLAIM_DUPLICATE, CLAIM_OWNER, index_for, is_cacheable, submission_key
 from rbidp.core.config import (
     TEXTRACT_PAGES,
     GPT_DOC_TYPE_RAW,
     GPT_DOC_TYPE_FILTERED,
     GPT_EXTRACTOR_RAW,
     GPT_EXTRACTOR_FILTERED,
+    GPT_COMBINED_RAW,
+    GPT_MODE,
+    GPT_EXTRACT_PROMPTS,
+    GPT_JSON_REASK,
+    MULTIDOC_DETECTOR,
+    GPT_BUDGET_ACTION,
+    GPT_PROMPT_TOKEN_BUDGET,
+    GPT_LATENCY_BUDGET_MS,
     MERGED_FILENAME,
     VALIDATION_FILENAME,
     METADATA_FILENAME,
     MAX_PDF_PAGES,
     UTC_OFFSET_HOURS,
+    OCR_MODE,
+    IMAGE_PREPROCESS,
+    LONG_DOC_MODE,
+    LONG_DOC_MAX_PAGES,
+    IDEMPOTENCY_ENABLED,
+    IDEMPOTENCY_WAIT_SECONDS,
+    RUN_STORAGE_FORMAT,
 )
 from rbidp.core.validity import compute_valid_until, format_date
 
 
 logger = logging.getLogger(__name__)
 
+# Keys of an extraction answer (valid_until may be null)
+_EXTRACT_KEYS = ("fio", "doc_type", "doc_date", "valid_until")
+
 
 def _safe_filename(name: str) -> str:
-    name = re.sub(r"[^\w\-\.\s]", "_", (name or "").strip())
+    # Client-side directories (either separator) are dropped, then unsafe characters replaced
+    name = re.split(r"[\\/]", (name or "").strip())[-1]
+    name = re.sub(r"[^\w\-\.\s]", "_", name.strip())
     name = re.sub(r"\s+", "_", name)
     return name or "file"
 
@@ -68,10 +108,37 @@ def _count_pdf_pages(path: str) -> Optional[int]:
         return None
 
 
-def _write_json(path: Path, obj: Dict[str, Any]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+def warmup() -> Dict[str, float]:
+    """
+    Import and exercise the dependencies that stages load on first use (pypdf, Pillow, rapidfuzz,
+    the TLS context of the upstream clients), so a fresh worker's first run does not pay for them.
+    Missing optional packages are skipped. Returns milliseconds per step.
+    """
+    def fuzz() -> None:
+        from rapidfuzz import fuzz as _fuzz
+        _fuzz.token_sort_ratio("Иванов Иван", "Иван Иванов")
+
+    def tls() -> None:
+        import ssl
+        ssl._create_unverified_context()
+
+    steps = {
+        "pypdf": lambda: __import__("pypdf"),
+        "pillow": pil_image,
+        "rapidfuzz": fuzz,
+        "tls": tls,
+    }
+    if IMAGE_PREPROCESS:
+        steps["numpy"] = lambda: __import__("numpy")
+    timings: Dict[str, float] = {}
+    for name, step in steps.items():
+        t0 = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.debug("Warm-up step %s skipped: %s", name, e)
+        timings[name] = round((time.perf_counter() - t0) * 1000, 3)
+    return timings
 
 
 def _write_manifest(
@@ -84,9 +151,10 @@ def _write_manifest(
     status: str,
     error: Optional[str],
     created_at: str,
+    extra: Optional[Dict[str, Any]] = None,
 ) -> None:
     final_result_path = artifacts.get("final_result_path") or str(meta_dir / "final_result.json")
-    side_by_side_path = str(meta_dir / "side_by_side.json") if (meta_dir / "side_by_side.json").exists() else None
+    side_by_side_path = str(meta_dir / "side_by_side.json") if artifact_exists(meta_dir / "side_by_side.json") else None
     merged_path = artifacts.get("gpt_merged_path")
     manifest = {
         "run_id": run_id,
@@ -101,7 +169,50 @@ def _write_manifest(
         "status": status,
         "error": error,
     }
-    _write_json(meta_dir / "manifest.json", manifest)
+    if extra:
+        manifest.update(extra)
+    write_json(meta_dir / "manifest.json", manifest)
+
+
+def _stage(state: Dict[str, Any], name: str) -> None:
+    """Close the running stage and open `name`: its duration goes to manifest "timings_ms" and
+    its span becomes the current one, so upstream calls made during the stage nest under it."""
+    _end_stage(state)
+    stage_span = tracing.start_span("stage." + name, stage=name)
+    usage.set_stage(name)
+    state["stage"] = (name, time.perf_counter(), stage_span, tracing.activate(stage_span))
+
+
+def _end_stage(state: Dict[str, Any], error: Optional[str] = None) -> None:
+    if not state.get("stage"):
+        return
+    name, started, stage_span, token = state.pop("stage")
+    state.setdefault("timings_ms", {})[name] = round((time.perf_counter() - started) * 1000, 3)
+    tracing.deactivate(token)
+    if error:
+        stage_span.fail(error)
+    stage_span.end()
+
+
+def _record_timings(result: Dict[str, Any], state: Dict[str, Any]) -> None:
+    timings = state.get("timings_ms") or {}
+    for stage, ms in timings.items():
+        metrics.observe("pipeline_stage_seconds", ms / 1000.0, stage=stage)
+    manifest_path = Path(result["final_result_path"]).parent / "manifest.json"
+    try:
+        manifest = load_json(manifest_path)
+        manifest["timings_ms"] = timings
+        if state.get("profile"):
+            manifest["profile"] = state["profile"]
+        if state.get("usage"):
+            manifest["usage"] = state["usage"]
+        if state.get("multidoc"):
+            manifest["multidoc"] = state["multidoc"]
+        if state.get("preprocess"):
+            manifest["preprocess"] = state["preprocess"]
+        write_json(manifest_path, manifest)
+    except Exception as e:
+        logger.debug("Failed to record stage timings: %s", e, exc_info=True)
 
 
 def _now_id() -> str:
@@ -110,14 +221,27 @@ def _now_id() -> str:
     return f"{ts}_{short_id}"
 
 
+def _run_date(run_id: str) -> str:
+    # run_id starts with YYYYMMDD; keep the date dir stable for pre-allocated runs
+    try:
+        return datetime.strptime(run_id[:8], "%Y%m%d").strftime("%Y-%m-%d")
+    except Exception:
+        return datetime.now().strftime("%Y-%m-%d")
+
+
+def _run_dir(runs_root: Path, run_id: str) -> Path:
+    return runs_root / _run_date(run_id) / run_id
+
+
 def _mk_run_dirs(runs_root: Path, run_id: str) -> Dict[str, Path]:
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    base_dir = runs_root / date_str / run_id
+    base_dir = _run_dir(runs_root, run_id)
     input_dir = base_dir / "input" / "original"
     ocr_dir = base_dir / "ocr"
     gpt_dir = base_dir / "gpt"
     meta_dir = base_dir / "meta"
-    for d in (input_dir, ocr_dir, gpt_dir, meta_dir):
+    # In bundle mode the artifact dirs only exist inside run.bundle
+    made = (input_dir,) if RUN_STORAGE_FORMAT == "bundle" else (input_dir, ocr_dir, gpt_dir, meta_dir)
+    for d in made:
         d.mkdir(parents=True, exist_ok=True)
     return {
         "base": base_dir,
@@ -128,6 +252,16 @@ def _mk_run_dirs(runs_root: Path, run_id: str) -> Dict[str, Path]:
     }
 
 
+def allocate_run(runs_root: Path) -> Dict[str, Any]:
+    """
+    Create a run id and its directory tree up front, so callers (e.g. the HTTP API)
+    can stream the upload straight into input/original before calling run_pipeline(run_id=...).
+    """
+    run_id = _now_id()
+    dirs = _mk_run_dirs(Path(runs_root), run_id)
+    return {"run_id": run_id, **dirs}
+
+
 def _build_final(
     run_id: str,
     errors: List[Dict[str, Any]],
@@ -149,7 +283,7 @@ def _build_final(
         "verdict": bool(verdict),
         "errors": file_errors,
     }
-    _write_json(final_path, file_result)
+    write_json(final_path, file_result)
     # Return a minimal in-memory result as well, with a pointer to the file
     return {
         "run_id": run_id,
@@ -163,12 +297,155 @@ def run_pipeline(
     fio: Optional[str],
     reason: Optional[str],
     doc_type: str,
-    source_file_path: str,
+    source_file_path: InputSource,
     original_filename: str,
     content_type: Optional[str],
     runs_root: Path,
+    run_id: Optional[str] = None,
+    priority: Optional[str] = None,
+    profile: Optional[bool] = None,
 ) -> Dict[str, Any]:
-    run_id = _now_id()
+    """
+    source_file_path: a path, a bytes buffer or a binary file-like object (e.g. the Streamlit
+    upload). It is placed into runs/.../input/original/ with a single write (or a hardlink
+    when it is a path on the same filesystem), hashing it on the way.
+    priority: "interactive" (default; UI/API uploads) or "batch" (backfills). Decides which
+    OCR/GPT scheduler class the run's upstream calls queue in.
+    profile: True captures a CPU/memory profile of this run into meta/ (see rbidp.core.profiling);
+    None leaves it to the sampling / slow-run settings, False disables it.
+    """
+    state: Dict[str, Any] = {}
+    started = time.perf_counter()
+    run_id = run_id or _now_id()
+    with tracing.span("pipeline.run", run_id=run_id, priority=priority or "interactive", doc_type=doc_type) as root:
+        if RUN_STORAGE_FORMAT == "bundle":
+            open_run_bundle(_run_dir(Path(runs_root), run_id))
+        profiler = start_run_profile(profile)
+        ledger = usage.UsageLedger(canonical_doc_type(doc_type))
+        with priority_scope(priority), usage.usage_scope(ledger):
+            try:
+                result = _run_pipeline(
+                    fio=fio,
+                    reason=reason,
+                    doc_type=doc_type,
+                    source_file_path=source_file_path,
+                    original_filename=original_filename,
+                    content_type=content_type,
+                    runs_root=runs_root,
+                    run_id=run_id,
+                    state=state,
+                )
+            except BaseException as e:
+                _end_stage(state, error=type(e).__name__)
+                if profiler is not None:
+                    profiler.stop()
+                if state.get("idempotency_key"):
+                    index_for(runs_root).abandon(state["idempotency_key"], state["run_id"])
+                if RUN_STORAGE_FORMAT == "bundle":
+                    _close_bundle(runs_root, run_id)
+                raise
+        codes = [e.get("code") for e in result.get("errors", []) if isinstance(e, dict)]
+        # A stage still open here returned early: it is the one that failed
+        _end_stage(state, error=codes[0] if codes and not result.get("duplicate_of") else None)
+        root.set(verdict=bool(result.get("verdict")), error_codes=",".join(c for c in codes if c), duplicate_of=result.get("duplicate_of"))
+        if state.get("idempotency_key"):
+            index = index_for(runs_root)
+            if all(is_cacheable(c) for c in codes):
+                index.complete(state["idempotency_key"], result["run_id"], result["final_result_path"])
+            else:
+                index.abandon(state["idempotency_key"], result["run_id"])
+        summary = ledger.summary()
+        if state.get("preflight"):
+            summary["preflight"] = state["preflight"]
+        if summary["calls"] or state.get("preflight"):
+            state["usage"] = summary
+        total_ms = (time.perf_counter() - started) * 1000
+        state.setdefault("timings_ms", {})["total"] = round(total_ms, 3)
+        if profiler is not None:
+            try:
+                state["profile"] = finish_run_profile(profiler, Path(result["final_result_path"]).parent, total_ms)
+            except Exception as e:
+                logger.warning("Failed to save profile of run %s: %s", result.get("run_id"), e, exc_info=True)
+        _record_timings(result, state)
+        if RUN_STORAGE_FORMAT == "bundle":
+            _close_bundle(runs_root, run_id)
+    return result
+
+
+def _close_bundle(runs_root: Path, run_id: str) -> None:
+    try:
+        close_run_bundle(_run_dir(Path(runs_root), run_id))
+    except Exception as e:
+        logger.warning("Failed to write the bundle of run %s: %s", run_id, e, exc_info=True)
+
+
+def _reuse_prior_result(
+    prior: Dict[str, Any],
+    *,
+    run_id: str,
+    meta_dir: Path,
+    saved_path: Path,
+    user_input: Dict[str, Any],
+    file_info: Dict[str, Any],
+    created_at: str,
+) -> Optional[Dict[str, Any]]:
+    """Answer a duplicate submission with the verdict of the run that already processed it."""
+    try:
+        prior_final = load_json(prior["final_result_path"])
+    except Exception as e:
+        logger.debug("Prior result unreadable, processing again: %s", e, exc_info=True)
+        return None
+
+    errors = [make_error(e.get("code")) for e in prior_final.get("errors", []) if isinstance(e, dict)]
+    final_path = meta_dir / "final_result.json"
+    result = _build_final(
+        run_id, errors, verdict=bool(prior_final.get("verdict")), checks=None, artifacts={}, final_path=final_path
+    )
+    result["duplicate_of"] = prior["run_id"]
+
+    # The bytes are identical to the original run's input: keep only that copy, when there is one
+    prior_input = None
+    try:
+        prior_input = load_json(Path(prior["final_result_path"]).parent / "manifest.json").get("file", {}).get("saved_path")
+    except Exception as e:
+        logger.debug("Prior manifest unreadable, keeping this run's input: %s", e, exc_info=True)
+    if prior_input and not os.path.exists(prior_input):
+        # e.g. dropped by retention: this run's copy stays the input
+        prior_input = None
+    if prior_input:
+        try:
+            saved_path.unlink()
+        except OSError:
+            prior_input = None
+    _write_manifest(
+        meta_dir,
+        run_id=run_id,
+        user_input=user_input,
+        file_info={**file_info, "saved_path": prior_input or file_info.get("saved_path")},
+        artifacts={"final_result_path": str(final_path)},
+        status="duplicate",
+        error=None,
+        created_at=created_at,
+        extra={"duplicate_of": {"run_id": prior["run_id"], "final_result_path": prior["final_result_path"]}},
+    )
+    return result
+
+
+def _run_pipeline(
+    fio: Optional[str],
+    reason: Optional[str],
+    doc_type: str,
+    source_file_path: InputSource,
+    original_filename: str,
+    content_type: Optional[str],
+    runs_root: Path,
+    run_id: Optional[str] = None,
+    state: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    run_id = run_id or _now_id()
+    state = state if state is not None else {}
+    state["run_id"] = run_id
+    _stage(state, "ingest")
     request_created_at = datetime.now(timezone(timedelta(hours=UTC_OFFSET_HOURS))).strftime("%d.%m.%Y")
     dirs = _mk_run_dirs(runs_root, run_id)
     base_dir, input_dir, ocr_dir, gpt_dir, meta_dir = (
@@ -178,10 +455,17 @@ def run_pipeline(
     errors: List[Dict[str, Any]] = []
     artifacts: Dict[str, str] = {}
 
-    base_name = _safe_filename(original_filename or os.path.basename(source_file_path))
+    base_name = _safe_filename(original_filename or source_name(source_file_path))
     saved_path = input_dir / base_name
+    file_info: Dict[str, Any] = {
+        "original_filename": original_filename,
+        "saved_path": str(saved_path),
+        "content_type": content_type,
+        "size_bytes": None,
+        "sha256": None,
+    }
     try:
-        shutil.copyfile(source_file_path, saved_path)
+        ingested = ingest_input(source_file_path, saved_path)
     except Exception as e:
         errors.append(make_error("FILE_SAVE_FAILED", details=str(e)))
         final_path = meta_dir / "final_result.json"
@@ -190,12 +474,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": None,
-            },
+            file_info=file_info,
             artifacts={"final_result_path": str(final_path)},
             status="error",
             error="FILE_SAVE_FAILED",
@@ -203,18 +482,39 @@ def run_pipeline(
         )
         return result
 
-    size_bytes = None
-    try:
-        size_bytes = saved_path.stat().st_size
-    except Exception:
-        pass
+    file_info["size_bytes"] = ingested["size_bytes"]
+    file_info["sha256"] = ingested["sha256"]
+    logger.debug("Input ingested via %s: %s bytes", ingested["method"], ingested["size_bytes"])
+
+    # Idempotency: the same file/fio/doc_type/reason on the same day reuses (or waits for) the prior run
+    if IDEMPOTENCY_ENABLED:
+        _stage(state, "idempotency")
+        idem_key = submission_key(ingested["sha256"], fio, doc_type, reason, request_created_at)
+        claim, prior = index_for(runs_root).claim_or_wait(idem_key, run_id, IDEMPOTENCY_WAIT_SECONDS)
+        tracing.set_attributes(claim=claim)
+        if claim == CLAIM_OWNER:
+            state["idempotency_key"] = idem_key
+        elif claim == CLAIM_DUPLICATE and prior is not None:
+            duplicate = _reuse_prior_result(
+                prior,
+                run_id=run_id,
+                meta_dir=meta_dir,
+                saved_path=saved_path,
+                user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
+                file_info=file_info,
+                created_at=request_created_at,
+            )
+            if duplicate is not None:
+                return duplicate
 
+    _stage(state, "page_count")
     metadata = {"fio": fio or None, "reason": reason, "doc_type": doc_type}
-    _write_json(meta_dir / METADATA_FILENAME, metadata)
+    write_json(meta_dir / METADATA_FILENAME, metadata)
 
     if saved_path.suffix.lower() == ".pdf":
         pages = _count_pdf_pages(str(saved_path))
-        if pages is not None and pages > MAX_PDF_PAGES:
+        max_pages = LONG_DOC_MAX_PAGES if LONG_DOC_MODE else MAX_PDF_PAGES
+        if pages is not None and pages > max_pages:
             errors.append(make_error("PDF_TOO_MANY_PAGES"))
             final_path = meta_dir / "final_result.json"
             result = _build_final(run_id, errors, verdict=False, checks=None, artifacts=artifacts, final_path=final_path)
@@ -222,12 +522,7 @@ def run_pipeline(
                 meta_dir,
                 run_id=run_id,
                 user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-                file_info={
-                    "original_filename": original_filename,
-                    "saved_path": str(saved_path),
-                    "content_type": content_type,
-                    "size_bytes": size_bytes,
-                },
+                file_info=file_info,
                 artifacts={"final_result_path": str(final_path)},
                 status="error",
                 error="PDF_TOO_MANY_PAGES",
@@ -236,7 +531,12 @@ def run_pipeline(
             return result
 
     # OCR
-    textract_result = ask_textract(str(saved_path), output_dir=str(ocr_dir), save_json=False)
+    _stage(state, "ocr")
+    ocr_fn = ask_textract_per_page if OCR_MODE == "per_page" else ask_textract
+    textract_result = ocr_fn(str(saved_path), output_dir=str(ocr_dir), save_json=False)
+    if textract_result.get("preprocess"):
+        state["preprocess"] = textract_result["preprocess"]
+    _stage(state, "ocr_filter")
     if not textract_result.get("success"):
         errors.append(make_error("OCR_FAILED", details=str(textract_result.get("error"))) )
         final_path = meta_dir / "final_result.json"
@@ -245,12 +545,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": size_bytes,
-            },
+            file_info=file_info,
             artifacts={"final_result_path": str(final_path)},
             status="error",
             error="OCR_FAILED",
@@ -260,10 +555,11 @@ def run_pipeline(
 
     # Filter OCR pages
     try:
-        filtered_pages_path = filter_textract_response(textract_result.get("raw_obj", {}), str(ocr_dir), filename=TEXTRACT_PAGES)
+        # The parsed page model when the client provides it; the raw object otherwise
+        ocr_source = textract_result.get("document") or textract_result.get("raw_obj", {})
+        filtered_pages_path = filter_textract_response(ocr_source, str(ocr_dir), filename=TEXTRACT_PAGES)
         artifacts["ocr_pages_filtered_path"] = str(filtered_pages_path)
-        with open(filtered_pages_path, "r", encoding="utf-8") as f:
-            pages_obj = json.load(f)
+        pages_obj = load_json(filtered_pages_path)
         if not isinstance(pages_obj, dict) or not isinstance(pages_obj.get("pages"), list):
             raise ValueError("Invalid pages object")
         if len(pages_obj["pages"]) == 0:
@@ -274,12 +570,7 @@ def run_pipeline(
                 meta_dir,
                 run_id=run_id,
                 user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-                file_info={
-                    "original_filename": original_filename,
-                    "saved_path": str(saved_path),
-                    "content_type": content_type,
-                    "size_bytes": size_bytes,
-                },
+                file_info=file_info,
                 artifacts={"final_result_path": str(final_path)},
                 status="error",
                 error="OCR_EMPTY_PAGES",
@@ -294,12 +585,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": size_bytes,
-            },
+            file_info=file_info,
             artifacts={"final_result_path": str(final_path)},
             status="error",
             error="OCR_FILTER_FAILED",
@@ -307,17 +593,95 @@ def run_pipeline(
         )
         return result
 
+    # Long documents: bounded-size page chunks with map-reduce GPT calls
+    long_doc = LONG_DOC_MODE and len(pages_obj["pages"]) > MAX_PDF_PAGES
+    # Combined mode: one GPT answer carries single_doc_type and the extracted fields (already merged)
+    combined = GPT_MODE == "combined" and not long_doc
+
+    # Preflight (only with a budget set): the run's prompts tokenized locally, admitted against
+    # the token/latency budgets before anything is sent
+    specialized = GPT_EXTRACT_PROMPTS == "specialized"
+    if GPT_PROMPT_TOKEN_BUDGET or GPT_LATENCY_BUDGET_MS:
+        _stage(state, "preflight")
+        est = estimate(plan_calls(pages_obj, doc_type, combined=combined, long_doc=long_doc, specialized=specialized))
+        exceeded = over_budget(est)
+        if exceeded and GPT_BUDGET_ACTION == "route" and not long_doc:
+            # Page chunks bound every prompt; take that path if it fits the budgets
+            routed = estimate(plan_calls(pages_obj, doc_type, combined=False, long_doc=True, specialized=specialized))
+            if over_budget(routed) is None:
+                metrics.inc("gpt_admission_total", outcome="routed", budget=exceeded)
+                long_doc, combined, est, exceeded = True, False, {**routed, "routed_from": est}, None
+        state["preflight"] = {**est, "over_budget": exceeded}
+        tracing.set_attributes(est_prompt_tokens=est["prompt_tokens"], est_latency_ms=est["latency_ms"], over_budget=exceeded)
+        if exceeded:
+            metrics.inc("gpt_admission_total", outcome="rejected", budget=exceeded)
+            errors.append(make_error(
+                "GPT_BUDGET_EXCEEDED",
+                details=f"{exceeded}: ~{est['max_prompt_tokens']} prompt tokens, ~{est['latency_ms']:.0f} ms estimated",
+            ))
+            final_path = meta_dir / "final_result.json"
+            result = _build_final(run_id, errors, verdict=False, checks=None, artifacts=artifacts, final_path=final_path)
+            _write_manifest(
+                meta_dir,
+                run_id=run_id,
+                user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
+                file_info=file_info,
+                artifacts={"final_result_path": str(final_path)},
+                status="error",
+                error="GPT_BUDGET_EXCEEDED",
+                created_at=request_created_at,
+            )
+            return result
+
+    # Local multi-document detector; the combined call is needed for extraction anyway
+    detected: Optional[Dict[str, Any]] = None
+    if MULTIDOC_DETECTOR != "off" and not combined:
+        _stage(state, "multidoc")
+        try:
+            detected = detect_multiple_documents(pages_obj)
+        except Exception as e:
+            logger.debug("Multi-document detector failed: %s", e, exc_info=True)
+        if detected is not None:
+            verdict = detected["single_doc_type"]
+            metrics.inc("multidoc_detector_total", verdict="uncertain" if verdict is None else str(verdict).lower())
+            state["multidoc"] = {**detected, "mode": MULTIDOC_DETECTOR, "gpt_skipped": False}
+
+    _stage(state, "dtc_extract" if combined else "dtc")
+
     # Doc type checker (GPT)
     try:
-        dtc_raw_str = check_single_doc_type(pages_obj)
-        dtc_raw_path = gpt_dir / GPT_DOC_TYPE_RAW
-        with open(dtc_raw_path, "w", encoding="utf-8") as f:
-            f.write(dtc_raw_str or "")
-        dtc_filtered_path = filter_gpt_generic_response(str(dtc_raw_path), str(gpt_dir), filename=GPT_DOC_TYPE_FILTERED)
+        if detected is not None and MULTIDOC_DETECTOR == "on" and isinstance(detected["single_doc_type"], bool):
+            # The detector is certain: its verdict stands in for the GPT answer
+            dtc_raw_str = json.dumps({"single_doc_type": detected["single_doc_type"]})
+            state["multidoc"]["gpt_skipped"] = True
+            metrics.inc("multidoc_gpt_skipped_total")
+        elif long_doc:
+            dtc_raw_str = check_single_doc_type_long(pages_obj, output_dir=str(gpt_dir))
+        elif combined:
+            dtc_raw_str = check_and_extract(pages_obj)
+        else:
+            dtc_raw_str = check_single_doc_type(pages_obj)
+        dtc_raw_path = gpt_dir / (GPT_COMBINED_RAW if combined else GPT_DOC_TYPE_RAW)
+        write_artifact(dtc_raw_path, (dtc_raw_str or "").encode("utf-8"))
+        dtc_filtered_path = filter_gpt_generic_response(
+            str(dtc_raw_path),
+            str(gpt_dir),
+            filename=MERGED_FILENAME if combined else GPT_DOC_TYPE_FILTERED,
+            reask=GPT_JSON_REASK,
+            keys=["single_doc_type", *_EXTRACT_KEYS] if combined else ["single_doc_type"],
+        )
         artifacts["gpt_doc_type_check_filtered_path"] = str(dtc_filtered_path)
-        with open(dtc_filtered_path, "r", encoding="utf-8") as f:
-            dtc_obj = json.load(f)
+        dtc_obj = load_json(dtc_filtered_path)
         is_single = dtc_obj.get("single_doc_type") if isinstance(dtc_obj, dict) else None
+        if detected is not None and not state["multidoc"]["gpt_skipped"]:
+            # Shadow comparison with the GPT answer (also for uncertain verdicts in "on" mode)
+            verdict = detected["single_doc_type"]
+            if verdict is None:
+                outcome = "uncertain"
+            else:
+                outcome = "agree" if verdict is is_single else "disagree"
+            state["multidoc"]["gpt"] = is_single
+            metrics.inc("multidoc_shadow_total", outcome=outcome)
         if not isinstance(is_single, bool):
             errors.append(make_error("DTC_PARSE_ERROR"))
             final_path = meta_dir / "final_result.json"
@@ -326,12 +690,7 @@ def run_pipeline(
                 meta_dir,
                 run_id=run_id,
                 user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-                file_info={
-                    "original_filename": original_filename,
-                    "saved_path": str(saved_path),
-                    "content_type": content_type,
-                    "size_bytes": size_bytes,
-                },
+                file_info=file_info,
                 artifacts={"final_result_path": str(final_path)},
                 status="error",
                 error="DTC_PARSE_ERROR",
@@ -346,12 +705,7 @@ def run_pipeline(
                 meta_dir,
                 run_id=run_id,
                 user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-                file_info={
-                    "original_filename": original_filename,
-                    "saved_path": str(saved_path),
-                    "content_type": content_type,
-                    "size_bytes": size_bytes,
-                },
+                file_info=file_info,
                 artifacts={"final_result_path": str(final_path)},
                 status="error",
                 error="MULTIPLE_DOCUMENTS",
@@ -366,12 +720,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": size_bytes,
-            },
+            file_info=file_info,
             artifacts={"final_result_path": str(final_path)},
             status="error",
             error="DTC_FAILED",
@@ -380,19 +729,32 @@ def run_pipeline(
         return result
 
     # Extraction (GPT)
+    _stage(state, "extract")
     try:
-        gpt_raw = extract_doc_data(pages_obj)
-        gpt_raw_path = gpt_dir / GPT_EXTRACTOR_RAW
-        with open(gpt_raw_path, "w", encoding="utf-8") as f:
-            f.write(gpt_raw or "")
-        filtered_path = filter_gpt_generic_response(str(gpt_raw_path), str(gpt_dir), filename=GPT_EXTRACTOR_FILTERED)
-        try:
-            os.remove(gpt_raw_path)
-        except Exception as e:
-            logger.debug("Failed to remove gpt_raw_path: %s", e, exc_info=True)
+        if combined:
+            # Same answer as the doc type check; only the schema check below remains
+            filtered_path = dtc_filtered_path
+        else:
+            if long_doc:
+                gpt_raw = extract_doc_data_long(pages_obj, output_dir=str(gpt_dir))
+            elif specialized:
+                # Short prompt for the declared doc type (generic when the type is unknown)
+                entry = prompt_for(doc_type)
+                tracing.set_attributes(extract_prompt="specialized" if entry["doc_type"] else "generic")
+                gpt_raw = extract_doc_data(pages_obj, prompt_template=entry["prompt"], max_tokens=entry["max_tokens"])
+            else:
+                gpt_raw = extract_doc_data(pages_obj)
+            gpt_raw_path = gpt_dir / GPT_EXTRACTOR_RAW
+            write_artifact(gpt_raw_path, (gpt_raw or "").encode("utf-8"))
+            filtered_path = filter_gpt_generic_response(
+                str(gpt_raw_path), str(gpt_dir), filename=GPT_EXTRACTOR_FILTERED, reask=GPT_JSON_REASK, keys=list(_EXTRACT_KEYS)
+            )
+            try:
+                remove_artifact(gpt_raw_path)
+            except Exception as e:
+                logger.debug("Failed to remove gpt_raw_path: %s", e, exc_info=True)
         artifacts["gpt_extractor_filtered_path"] = str(filtered_path)
-        with open(filtered_path, "r", encoding="utf-8") as f:
-            filtered_obj = json.load(f)
+        filtered_obj = load_json(filtered_path)
         # schema check
         if not isinstance(filtered_obj, dict):
             raise ValueError("Extractor filtered object is not a dict")
@@ -415,12 +777,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": size_bytes,
-            },
+            file_info=file_info,
             artifacts={"final_result_path": str(final_path)},
             status="error",
             error="EXTRACT_SCHEMA_INVALID",
@@ -435,12 +792,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": size_bytes,
-            },
+            file_info=file_info,
             artifacts={"final_result_path": str(final_path)},
             status="error",
             error="EXTRACT_FAILED",
@@ -449,21 +801,23 @@ def run_pipeline(
         return result
 
     # Merge
+    _stage(state, "merge")
     try:
-        merged_path = merge_extractor_and_doc_type(
-            extractor_filtered_path=artifacts.get("gpt_extractor_filtered_path", ""),
-            doc_type_filtered_path=artifacts.get("gpt_doc_type_check_filtered_path", ""),
-            output_dir=str(gpt_dir),
-            filename=MERGED_FILENAME,
-        )
+        if combined:
+            merged_path = artifacts["gpt_extractor_filtered_path"]
+        else:
+            merged_path = merge_extractor_and_doc_type(
+                extractor_filtered_path=artifacts.get("gpt_extractor_filtered_path", ""),
+                doc_type_filtered_path=artifacts.get("gpt_doc_type_check_filtered_path", ""),
+                output_dir=str(gpt_dir),
+                filename=MERGED_FILENAME,
+            )
         artifacts["gpt_merged_path"] = str(merged_path)
         # Build side-by-side comparison file in meta
         try:
             # Load meta and merged raw values
-            with open(meta_dir / METADATA_FILENAME, "r", encoding="utf-8") as mf:
-                meta_obj = json.load(mf)
-            with open(merged_path, "r", encoding="utf-8") as mg:
-                merged_obj = json.load(mg)
+            meta_obj = load_json(meta_dir / METADATA_FILENAME)
+            merged_obj = load_json(merged_path)
 
             fio_meta_raw = meta_obj.get("fio") if isinstance(meta_obj, dict) else None
             fio_extracted_raw = merged_obj.get("fio") if isinstance(merged_obj, dict) else None
@@ -499,7 +853,7 @@ def run_pipeline(
                     "extracted": single_doc_type_raw,
                 },
             }
-            _write_json(meta_dir / "side_by_side.json", side_by_side)
+            write_json(meta_dir / "side_by_side.json", side_by_side)
         except Exception:
             pass
     except Exception as e:
@@ -510,12 +864,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": size_bytes,
-            },
+            file_info=file_info,
             artifacts={"final_result_path": str(final_path)},
             status="error",
             error="MERGE_FAILED",
@@ -524,6 +873,7 @@ def run_pipeline(
         return result
 
     # Validation
+    _stage(state, "validate")
     try:
         validation = validate_run(
             meta_path=str(meta_dir / METADATA_FILENAME),
@@ -532,6 +882,7 @@ def run_pipeline(
             filename=VALIDATION_FILENAME,
             write_file=False,
         )
+        _end_stage(state)
         # validation file is suppressed; no artifacts path
         if not validation.get("success"):
             errors.append(make_error("VALIDATION_FAILED", details=str(validation.get("error"))))
@@ -541,12 +892,7 @@ def run_pipeline(
                 meta_dir,
                 run_id=run_id,
                 user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-                file_info={
-                    "original_filename": original_filename,
-                    "saved_path": str(saved_path),
-                    "content_type": content_type,
-                    "size_bytes": size_bytes,
-                },
+                file_info=file_info,
                 artifacts={"final_result_path": str(final_path), "gpt_merged_path": artifacts.get("gpt_merged_path", "")},
                 status="error",
                 error="VALIDATION_FAILED",
@@ -587,12 +933,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": size_bytes,
-            },
+            file_info=file_info,
             artifacts={
                 "final_result_path": str(final_path),
                 "gpt_merged_path": artifacts.get("gpt_merged_path", ""),
@@ -610,12 +951,7 @@ def run_pipeline(
             meta_dir,
             run_id=run_id,
             user_input={"fio": fio or None, "reason": reason, "doc_type": doc_type},
-            file_info={
-                "original_filename": original_filename,
-                "saved_path": str(saved_path),
-                "content_type": content_type,
-                "size_bytes": size_bytes,
-            },
+            file_info=file_info,
             artifacts={
                 "final_result_path": str(final_path),
                 "gpt_merged_path": artifacts.get("gpt_merged_path", ""),
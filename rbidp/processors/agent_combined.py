@@ -0,0 +1,53 @@
+from rbidp.clients.gpt_client import ask_gpt
+from rbidp.processors.agent_extractor import KNOWN_DOC_TYPES
+import json
+
+# One call instead of check_single_doc_type + extract_doc_data: the OCR text (the bulk of the
+# input tokens) is sent once, and the answer is already the object merge_extractor_and_doc_type
+# would build from the two separate answers.
+
+PROMPT = """
+You are an expert in multilingual document classification and information extraction.
+The input is a noisy OCR text that may contain both Kazakh and Russian fragments.
+
+TASK 1 — SINGLE DOCUMENT CHECK (single_doc_type)
+Decide if the text is ONE document or several distinct documents.
+- OCR noise, repeated headers, bilingual duplicates, repeated dates or form numbers, page numbers → still one document.
+- false ONLY if you can name two clearly different document titles or two unrelated issuers
+  (e.g. «ПРИКАЗ» followed by «СПРАВКА», two different form numbers like 026/у and 027/у).
+- If unclear → true.
+
+TASK 2 — EXTRACTION
+- fio: full name of the person (Фамилия Имя Отчество), nominative case, in Russian; prefer the full
+  explicit form over initials (e.g. "Аметовой Мереке Маратовне" → "Аметова Мереке Маратовна").
+- doc_type: exactly one of the values below, or null:
+{doc_types}
+- doc_date: main issuance date (near the header or "№"), DD.MM.YYYY.
+- valid_until: for "Приказ о выходе в декретный отпуск по уходу за ребенком" the last date of a stated
+  period «с DD.MM.YYYY … по DD.MM.YYYY», DD.MM.YYYY; otherwise null. For all other types null.
+- Missing values are null; never invent data.
+
+OUTPUT — only this JSON object (no explanations, no Markdown, no ```json):
+{{"single_doc_type": true | false, "fio": string | null, "doc_type": string | null, "doc_date": string | null, "valid_until": string | null}}
+
+Text for analysis:
+{text}
+"""
+
+# The answer carries five keys (the two-call path: 200 tokens for four)
+MAX_TOKENS = 250
+
+
+def render_prompt(pages_obj: dict) -> str:
+    pages_json_str = json.dumps(pages_obj, ensure_ascii=False)
+    if not pages_json_str:
+        return ""
+    doc_types = "\n".join(f'  - "{t}"' for t in KNOWN_DOC_TYPES)
+    return PROMPT.format(doc_types=doc_types, text=pages_json_str)
+
+
+def check_and_extract(pages_obj: dict) -> str:
+    prompt = render_prompt(pages_obj)
+    if not prompt:
+        return ""
+    return ask_gpt(prompt, max_tokens=MAX_TOKENS)
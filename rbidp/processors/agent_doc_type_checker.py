@@ -110,9 +110,15 @@ OCR INPUT:
 
 
 
-def check_single_doc_type(pages_obj: dict) -> str:
+def render_prompt(pages_obj: dict) -> str:
     pages_json_str = json.dumps(pages_obj, ensure_ascii=False)
     if not pages_json_str:
         return ""
-    prompt = PROMPT.replace("{}", pages_json_str, 1)
+    return PROMPT.replace("{}", pages_json_str, 1)
+
+
+def check_single_doc_type(pages_obj: dict) -> str:
+    prompt = render_prompt(pages_obj)
+    if not prompt:
+        return ""
     return ask_gpt(prompt)
@@ -1,6 +1,25 @@
 from rbidp.clients.gpt_client import ask_gpt
 import json
 
+# Canonical doc_type values the extractor may return (same list as in PROMPT)
+KNOWN_DOC_TYPES = [
+    "Лист временной нетрудоспособности (больничный лист)",
+    "Приказ о выходе в декретный отпуск по уходу за ребенком",
+    "Справка о выходе в декретный отпуск по уходу за ребенком",
+    "Выписка из стационара (выписной эпикриз)",
+    "Больничный лист на сопровождающего (если предусмотрено)",
+    "Заключение врачебно-консультативной комиссии (ВКК)",
+    "Справка об инвалидности",
+    "Справка о степени утраты общей трудоспособности",
+    "Приказ о расторжении трудового договора",
+    "Справка о расторжении трудового договора",
+    "Справка о регистрации в качестве безработного",
+    "Приказ работодателя о предоставлении отпуска без сохранения заработной платы",
+    "Справка о неполучении доходов",
+    "Уведомление о регистрации в качестве лица, ищущего работу",
+    "Лица, зарегистрированные в качестве безработных",
+]
+
 PROMPT = """
 You are an expert in multilingual document information extraction and normalization.
 Your task is to analyze a noisy OCR text that may contain both Kazakh and Russian fragments.
@@ -56,16 +75,23 @@ STEP 4 — OUTPUT STRICTLY IN THIS JSON FORMAT (no explanations, no extra text,
   "fio": string | null,
   "doc_type": string | null,
   "doc_date": string | null,
-  "valid_until": string | null,
+  "valid_until": string | null
 }
 
 Text for analysis:
 {}
 """
 
-def extract_doc_data(pages_obj: dict) -> str:
+def render_prompt(pages_obj: dict, prompt_template: str = PROMPT) -> str:
     pages_json_str = json.dumps(pages_obj, ensure_ascii=False)
     if not pages_json_str:
         return ""
-    prompt = PROMPT.replace("{}", pages_json_str, 1)
-    return ask_gpt(prompt)
+    return prompt_template.replace("{}", pages_json_str, 1)
+
+
+def extract_doc_data(pages_obj: dict, prompt_template: str = PROMPT, max_tokens: int = 200) -> str:
+    """prompt_template/max_tokens: a doc-type-specialized prompt (rbidp.processors.prompt_registry)."""
+    prompt = render_prompt(pages_obj, prompt_template)
+    if not prompt:
+        return ""
+    return ask_gpt(prompt, max_tokens=max_tokens)
@@ -0,0 +1,36 @@
+from typing import List, Optional
+
+from rbidp.clients.gpt_client import ask_gpt
+from rbidp.core.usage import estimate_tokens
+
+# Repair re-ask: an answer the local repair (filter_gpt_generic_response) could not parse is
+# sent back alone, so the call costs the broken answer's tokens instead of the OCR text again.
+
+PROMPT = """
+The text below was meant to be ONE JSON object but is not valid JSON (it may be cut off, contain
+comments, Markdown or unescaped quotes). Return the same object as valid JSON: the same keys and
+values, double quotes, no trailing commas; a value that is cut off or missing becomes null.
+Output only the JSON object, no explanations, no Markdown.
+"""
+
+_KEYS = """Keys of the object: {keys}
+"""
+
+_TEXT = """
+Text:
+{}
+"""
+
+# Longest broken answer sent back; an extraction answer is a few hundred characters
+MAX_INPUT_CHARS = 2000
+# The fixed object is about as long as the broken one
+_MIN_MAX_TOKENS = 32
+_MAX_MAX_TOKENS = 300
+
+
+def reask_json(broken: str, keys: Optional[List[str]] = None) -> str:
+    """keys: the keys the answer must have, so a key lost in a cut-off answer comes back as null."""
+    text = broken[:MAX_INPUT_CHARS]
+    prompt = PROMPT + (_KEYS.format(keys=", ".join(keys)) if keys else "") + _TEXT.replace("{}", text, 1)
+    max_tokens = min(_MAX_MAX_TOKENS, max(_MIN_MAX_TOKENS, estimate_tokens(text) + 8 * len(keys or ()) + 16))
+    return ask_gpt(prompt, max_tokens=max_tokens)
@@ -0,0 +1,206 @@
+import os
+import json
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from rbidp.clients.gpt_client import ask_gpt
+from rbidp.core.dates import parse_doc_date
+from rbidp.core.profiling import profiled_task
+from rbidp.core.run_store import artifact_exists, load_json, write_json
+from rbidp.core.config import (
+    LONG_DOC_CHUNK_PAGES,
+    LONG_DOC_MAX_PAGE_CHARS,
+    LONG_DOC_CONCURRENCY,
+    GPT_EXTRACTOR_CHUNKS,
+)
+from rbidp.processors import agent_doc_type_checker
+from rbidp.processors.agent_extractor import KNOWN_DOC_TYPES
+from rbidp.processors.filter_gpt_generic_response import parse_gpt_generic_response
+from rbidp.processors.multidoc_detector import HEADER_LINES
+
+CHUNK_PROMPT = """
+You extract data from a FRAGMENT (a few pages) of a longer noisy OCR document in Kazakh and/or Russian.
+Only use what is present in this fragment; use null for anything not found here.
+
+Keys:
+- fio: full name of the person the document is about, nominative case, Russian (Фамилия Имя Отчество)
+- doc_type: one of the values below if this fragment shows the document title/header, else null
+- doc_date: main issuance date near the header or "№", DD.MM.YYYY
+- valid_until: for "Приказ о выходе в декретный отпуск по уходу за ребенком" the last date of a period «с … по …», DD.MM.YYYY; else null
+
+doc_type values:
+{doc_types}
+
+Output only one JSON object, no Markdown:
+{{"fio": string | null, "doc_type": string | null, "doc_date": string | null, "valid_until": string | null}}
+
+Fragment (pages {first}-{last}):
+{text}
+"""
+
+CHUNK_MAX_TOKENS = 120
+
+
+def chunk_pages(pages_obj: dict, chunk_pages: int = LONG_DOC_CHUNK_PAGES, max_page_chars: int = LONG_DOC_MAX_PAGE_CHARS) -> List[Dict[str, Any]]:
+    """
+    Split {"pages": [...]} into chunks of at most chunk_pages pages, each page text capped at
+    max_page_chars, so any single prompt stays bounded regardless of the document length.
+    """
+    pages = pages_obj.get("pages", []) if isinstance(pages_obj, dict) else []
+    size = max(1, int(chunk_pages))
+    chunks = []
+    for i in range(0, len(pages), size):
+        part = [
+            {"page_number": p.get("page_number"), "text": (p.get("text") or "")[:max_page_chars]}
+            for p in pages[i:i + size]
+            if isinstance(p, dict)
+        ]
+        chunks.append({"pages": part})
+    return chunks
+
+
+def header_pages(pages_obj: dict, max_page_chars: int = LONG_DOC_MAX_PAGE_CHARS) -> Dict[str, Any]:
+    """
+    {"pages": [...]} with only the header lines of every page: one bounded prompt that sees the
+    titles of all chunks at once.
+    """
+    pages = pages_obj.get("pages", []) if isinstance(pages_obj, dict) else []
+    out = []
+    for p in pages:
+        if isinstance(p, dict):
+            lines = [ln for ln in (p.get("text") or "").splitlines() if ln.strip()][:HEADER_LINES]
+            out.append({"page_number": p.get("page_number"), "text": "\n".join(lines)[:max_page_chars]})
+    return {"pages": out}
+
+
+def chunk_prompt(chunk: Dict[str, Any]) -> str:
+    numbers = [p.get("page_number") for p in chunk["pages"]]
+    text = "\n\n".join(f"--- page {p.get('page_number')} ---\n{p.get('text', '')}" for p in chunk["pages"])
+    return CHUNK_PROMPT.format(
+        doc_types="\n".join(f"- {t}" for t in KNOWN_DOC_TYPES),
+        first=numbers[0] if numbers else "?",
+        last=numbers[-1] if numbers else "?",
+        text=text,
+    )
+
+
+def _map(fn, items: List[Any], concurrency: int) -> List[Any]:
+    workers = max(1, min(int(concurrency), len(items) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rbidp-long-doc") as pool:
+        # copy_context per task: keeps the run's priority class for upstream scheduling and its profiler
+        futures = [pool.submit(contextvars.copy_context().run, profiled_task, fn, item) for item in items]
+        return [f.result() for f in futures]
+
+
+def _str_or_none(v: Any) -> Optional[str]:
+    return v.strip() if isinstance(v, str) and v.strip() else None
+
+
+def _norm(s: str) -> str:
+    return " ".join(s.split()).casefold()
+
+
+def reduce_chunk_answers(answers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Deterministic merge of per-chunk answers (in page order):
+    - doc_type: most frequent non-null value; ties -> the earliest chunk (title pages come first)
+    - fio: most frequent normalized name; ties -> the most complete (most words), then earliest;
+      the first spelling of the winning name is returned
+    - doc_date: the first chunk that has a parseable date (issuance date sits on the first pages)
+    - valid_until: the latest parseable date (end of the stated period)
+    """
+    def vote(values: List[str], prefer_long: bool = False) -> Optional[str]:
+        if not values:
+            return None
+        counts = Counter(_norm(v) for v in values)
+        first_seen = {}
+        for idx, v in enumerate(values):
+            first_seen.setdefault(_norm(v), idx)
+        best = min(
+            counts,
+            key=lambda k: (-counts[k], -len(k.split()) if prefer_long else 0, first_seen[k]),
+        )
+        return next(v for v in values if _norm(v) == best)
+
+    doc_types = [v for v in (_str_or_none(a.get("doc_type")) for a in answers) if v]
+    fios = [v for v in (_str_or_none(a.get("fio")) for a in answers) if v]
+
+    doc_date = None
+    for a in answers:
+        d = _str_or_none(a.get("doc_date"))
+        if d and parse_doc_date(d) is not None:
+            doc_date = d
+            break
+
+    valid_until = None
+    latest = None
+    for a in answers:
+        v = _str_or_none(a.get("valid_until"))
+        dt = parse_doc_date(v) if v else None
+        if dt is not None and (latest is None or dt > latest):
+            latest, valid_until = dt, v
+
+    return {
+        "fio": vote(fios, prefer_long=True),
+        "doc_type": vote(doc_types),
+        "doc_date": doc_date,
+        "valid_until": valid_until,
+    }
+
+
+def _write_chunks(output_dir: Optional[str], key: str, answers: List[Dict[str, Any]]) -> None:
+    if not output_dir:
+        return
+    path = os.path.join(output_dir, GPT_EXTRACTOR_CHUNKS)
+    existing: Dict[str, Any] = load_json(path) if artifact_exists(path) else {}
+    existing[key] = answers
+    write_json(path, existing)
+
+
+def extract_doc_data_long(pages_obj: dict, output_dir: Optional[str] = None) -> str:
+    """
+    Map-reduce version of extract_doc_data for documents longer than MAX_PDF_PAGES.
+    Returns a raw JSON line with the reduced {fio, doc_type, doc_date, valid_until}, parseable by
+    filter_gpt_generic_response like a regular extractor response.
+    """
+    chunks = chunk_pages(pages_obj)
+
+    def run(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return parse_gpt_generic_response(ask_gpt(chunk_prompt(chunk), max_tokens=CHUNK_MAX_TOKENS))
+
+    answers = _map(run, chunks, LONG_DOC_CONCURRENCY)
+    _write_chunks(output_dir, "extractor", answers)
+    return json.dumps(reduce_chunk_answers(answers), ensure_ascii=False)
+
+
+def check_single_doc_type_long(pages_obj: dict, output_dir: Optional[str] = None) -> str:
+    """
+    Chunked single-doc-type check: the regular DTC prompt per chunk; the document is a single
+    type only if every chunk says so (a chunk that cannot be parsed counts as unknown).
+    A chunk only sees its own pages, so a second document starting in a later chunk looks single
+    to every chunk: one more check over the header lines of all pages (header_pages) runs next to
+    the chunk checks. The local detector (MULTIDOC_DETECTOR) is applied by the orchestrator ahead
+    of this check, in its own mode.
+    """
+    chunks = chunk_pages(pages_obj)
+    items = list(chunks)
+    if len(chunks) > 1:
+        items.append(header_pages(pages_obj))
+
+    def run(chunk: Dict[str, Any]) -> Dict[str, Any]:
+        return parse_gpt_generic_response(agent_doc_type_checker.check_single_doc_type(chunk))
+
+    answers = _map(run, items, LONG_DOC_CONCURRENCY)
+    _write_chunks(output_dir, "doc_type_check", answers[:len(chunks)])
+    if len(answers) > len(chunks):
+        _write_chunks(output_dir, "doc_type_check_headers", answers[len(chunks):])
+    flags = [a.get("single_doc_type") for a in answers]
+    if any(f is False for f in flags):
+        single: Any = False
+    elif flags and all(f is True for f in flags):
+        single = True
+    else:
+        single = None
+    return json.dumps({"single_doc_type": single}, ensure_ascii=False)
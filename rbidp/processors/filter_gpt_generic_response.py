@@ -1,6 +1,19 @@
 import os
+import re
 import json
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from rbidp.core import metrics
+from rbidp.core.run_store import read_artifact, write_json
+
+# Models do not always answer with strict JSON: ```json fences, trailing commas (echoed from
+# schema examples), single quotes, comments, Python literals, chatter around the object. When
+# the strict parse finds nothing, the answer is repaired locally; with reask=True
+# (GPT_JSON_REASK) an answer beyond repair is sent back alone
+# (rbidp.processors.agent_json_repair), never the OCR text.
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*[ \t]*\n?(.*?)(?:```|$)", re.S)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
 
 
 def _try_parse_inner_json(text: str) -> Optional[Dict[str, Any]]:
@@ -13,6 +26,104 @@ def _try_parse_inner_json(text: str) -> Optional[Dict[str, Any]]:
     return None
 
 
+def _skip_comment(text: str, i: int) -> int:
+    """End of the // or /* */ comment at text[i] (a // comment keeps its line break)."""
+    if text.startswith("//", i):
+        j = text.find("\n", i)
+    else:
+        j = text.find("*/", i + 2)
+        j = j + 2 if j >= 0 else j
+    return len(text) if j < 0 else j
+
+
+def _normalize_object(text: str) -> Optional[str]:
+    """
+    The first balanced {...} of `text` as strict JSON text: single-quoted strings become
+    double-quoted, commas before } or ] are dropped, // and /* */ comments are dropped,
+    True/False/None become JSON literals.
+    None when no object closes (e.g. a truncated answer).
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    out: List[str] = []
+    depth = 0
+    quote = ""  # the open string's quote character
+    i, n = start, len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if ch == "\\" and i + 1 < n:
+                nxt = text[i + 1]
+                # \' is not a JSON escape; inside a double-quoted result it is a plain quote
+                out.append("'" if nxt == "'" else ch + nxt)
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = ""
+            elif ch == '"':
+                out.append('\\"')  # a double quote inside a single-quoted string
+            else:
+                out.append(ch)
+        elif ch == '"' or ch == "'":
+            quote = ch
+            out.append('"')
+        elif ch == "/" and text[i + 1:i + 2] in ("/", "*"):
+            i = _skip_comment(text, i)
+            continue
+        elif ch == "{" or ch == "[":
+            depth += 1
+            out.append(ch)
+        elif ch == "}" or ch == "]":
+            depth -= 1
+            out.append(ch)
+            if depth == 0:
+                return "".join(out)
+        elif ch == ",":
+            j = i + 1
+            while j < n:
+                if text[j] in " \t\r\n":
+                    j += 1
+                elif text[j] == "/" and text[j + 1:j + 2] in ("/", "*"):
+                    j = _skip_comment(text, j)
+                else:
+                    break
+            if j >= n or text[j] not in "}]":
+                out.append(ch)
+        elif ch.isalpha():
+            j = i
+            while j < n and text[j].isalnum():
+                j += 1
+            word = text[i:j]
+            out.append(_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return None
+
+
+def repair_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Tolerant parse of a model answer: strict JSON first, then the repairs above."""
+    obj = _try_parse_inner_json(text)
+    if obj is not None:
+        return obj
+    fenced = _FENCE_RE.search(text)
+    normalized = _normalize_object(fenced.group(1) if fenced else text)
+    if normalized is None and fenced:
+        normalized = _normalize_object(text)
+    if normalized is None:
+        return None
+    try:
+        # strict=False: raw line breaks inside strings are common in model output
+        obj = json.loads(normalized, strict=False)
+    except ValueError:
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
 def _extract_from_openai_like(obj: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     choices = obj.get("choices")
     if isinstance(choices, list) and choices:
@@ -39,21 +150,62 @@ def _extract_from_openai_like(obj: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     return None
 
 
-def filter_gpt_generic_response(input_path: str, output_dir: str, filename: str) -> str:
+def _answer_text(raw: str) -> str:
+    """The model's answer in a raw response: choices/content of a provider line, else the text
+    without the provider's prompt-echo lines."""
+    kept = []
+    for line in (raw or "").splitlines():
+        stripped = line.strip()
+        if stripped.startswith("{") and stripped.endswith("}"):
+            try:
+                obj = json.loads(stripped)
+            except Exception:
+                obj = None
+            if isinstance(obj, dict):
+                if "Model" in obj and "Content" in obj:
+                    continue
+                choices = obj.get("choices")
+                c0 = choices[0] if isinstance(choices, list) and choices and isinstance(choices[0], dict) else {}
+                msg = c0.get("message")
+                for content in (msg.get("content") if isinstance(msg, dict) else None, c0.get("text"), obj.get("content")):
+                    if isinstance(content, str):
+                        return content
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def _parse(raw: str) -> Tuple[Dict[str, Any], str]:
+    """(object, "clean" | "repaired" | "failed")"""
+    obj = _parse_strict(raw)
+    if obj:
+        return obj, "clean"
+    if not (raw or "").strip():
+        return {}, "failed"
+    repaired = repair_json_object(_answer_text(raw))
+    if repaired:
+        return repaired, "repaired"
+    return {}, "failed"
+
+
+def parse_gpt_generic_response(raw: str) -> Dict[str, Any]:
     """
-    Generic GPT response filter that expects provider to write multiple JSON lines.
+    Generic GPT response parser for provider output with multiple JSON lines.
     Strategy per line:
       1) If dict: try to extract OpenAI-like inner JSON (choices[0].message.content). If found, use it.
       2) If dict: else use the dict as-is.
       3) If string: try to parse it as JSON dict.
-    The first successful dict is written as the filtered output. If none found, write {}.
+    When no line parses, the answer is repaired (fences, trailing commas, quotes; see
+    repair_json_object). Returns the first successful dict, or {} if none found.
     """
-    with open(input_path, "r", encoding="utf-8") as f:
-        raw = f.read()
+    obj, outcome = _parse(raw)
+    metrics.inc("gpt_json_parse_total", outcome=outcome)
+    return obj
+
 
+def _parse_strict(raw: str) -> Dict[str, Any]:
     result_obj: Dict[str, Any] = {}
 
-    for line in raw.splitlines():
+    for line in (raw or "").splitlines():
         line = line.strip()
         if not line:
             continue
@@ -75,6 +227,9 @@ def filter_gpt_generic_response(input_path: str, output_dir: str, filename: str)
             # Skip provider prompt-echo dicts (they usually contain 'Model' and 'Content')
             if "Model" in obj and "Content" in obj:
                 continue
+            # A provider envelope whose answer is not strict JSON: left to the repair pass
+            if "choices" in obj or isinstance(obj.get("content"), str):
+                continue
             # Otherwise, accept the dict as-is
             result_obj = obj
             break
@@ -83,9 +238,33 @@ def filter_gpt_generic_response(input_path: str, output_dir: str, filename: str)
             if isinstance(inner, dict):
                 result_obj = inner
                 break
+    return result_obj
+
+
+def filter_gpt_generic_response(
+    input_path: str, output_dir: str, filename: str, reask: bool = False, keys: Optional[List[str]] = None
+) -> str:
+    """
+    Generic GPT response filter: parse the raw response file with parse_gpt_generic_response
+    and write the first JSON dict found (or {}) to output_dir/filename.
+    reask: an answer beyond local repair is sent back to the model alone to be fixed, with the
+    expected `keys` when given.
+    """
+    raw = read_artifact(input_path).decode("utf-8")
+
+    result_obj = parse_gpt_generic_response(raw)
+    if not result_obj and reask:
+        broken = _answer_text(raw).strip()
+        if broken:
+            # Imported here: the agent's GPT client is only needed on this path
+            from rbidp.processors.agent_json_repair import reask_json
+
+            try:
+                result_obj, _ = _parse(reask_json(broken, keys))
+            except Exception:
+                result_obj = {}
+            metrics.inc("gpt_json_reask_total", outcome="repaired" if result_obj else "failed")
 
-    os.makedirs(output_dir, exist_ok=True)
     out_path = os.path.join(output_dir, filename)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(result_obj, f, ensure_ascii=False, indent=2)
+    write_json(out_path, result_obj)
     return out_path
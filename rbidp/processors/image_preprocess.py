@@ -0,0 +1,308 @@
+import io
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from rbidp.core import metrics, tracing
+from rbidp.core.config import IMAGE_PREPROCESS_DPI, IMAGE_PREPROCESS_MAX_SKEW
+from rbidp.processors.image_to_pdf_converter import pil_image, save_frames
+
+# Preprocessing of page images before OCR (RBIDP_IMAGE_PREPROCESS): uploaded photos/scans and
+# the pages of image-only PDFs. Each frame goes through
+#   grayscale -> crop -> deskew -> orientation -> warp -> contrast
+# The document boundary, the skew angle, the text line direction and the grey levels are
+# measured with NumPy on one small thumbnail; the full image is then resampled once (warp:
+# crop, rotation and downscale to the OCR resolution in a single affine transform) and its grey
+# levels stretched through a lookup table. numpy and Pillow are imported on first use; without
+# them frames pass through unchanged.
+#
+# Timings per step and the payload bytes in/out are collected in a report (manifest
+# "preprocess") and as metrics image_preprocess_seconds{step}, image_preprocess_bytes_total{kind}.
+
+STEPS = ("grayscale", "crop", "deskew", "orientation", "warp", "contrast")
+
+# Longest side of the analysis thumbnail
+_THUMB = 800
+# Target long side in pixels: IMAGE_PREPROCESS_DPI over the long side of an A4 page (inches)
+_A4_LONG_IN = 11.69
+# Crop: rows/columns that are mostly paper; ink rows/columns; margin kept around the ink
+_PAPER_SHARE = 0.5
+_INK_SHARE = 0.005
+_MARGIN = 0.02
+# Only crops that remove a noticeable part, and keep a plausible page
+_MIN_CROP_GAIN = 0.05
+_MIN_KEPT_AREA = 0.15
+# Text lines run top to bottom when the levelled line profile of the quarter-turned page scores
+# this much better than that of the page as it is
+_ORIENTATION_RATIO = 1.3
+# Deskew: coarse and fine search steps (degrees); smaller skews are left alone
+_SKEW_COARSE = 1.0
+_SKEW_FINE = 0.1
+_MIN_SKEW = 0.2
+_MAX_INK_POINTS = 15000
+# Contrast: these percentiles of the grey levels become black and white
+_BLACK_PCT = 0.01
+_WHITE_PCT = 0.90
+_MIN_SPREAD = 32
+
+
+def _modules() -> Optional[Tuple[Any, Any]]:
+    """(numpy, PIL.Image), or None when either is not installed."""
+    Image = pil_image()
+    if Image is None:
+        return None
+    try:
+        import numpy as np
+    except Exception:
+        return None
+    return np, Image
+
+
+def _otsu(np: Any, a: Any) -> int:
+    """Grey level separating ink from paper (Otsu's between-class variance maximum)."""
+    hist = np.bincount(a.ravel(), minlength=256).astype(np.float64)
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (m0[-1] * w0 / w0[-1] - m0) ** 2 / (w0 * w1)
+    return int(np.argmax(np.nan_to_num(between)))
+
+
+def _span(np: Any, mask: Any) -> Optional[Tuple[int, int]]:
+    idx = np.flatnonzero(mask)
+    return (int(idx[0]), int(idx[-1]) + 1) if idx.size else None
+
+
+def _thumb(np: Any, img: Any) -> Tuple[Any, int]:
+    """uint8 array of a box-filtered copy at most about _THUMB pixels long, and the reduction factor."""
+    factor = max(1, -(-max(img.size) // _THUMB))
+    return np.asarray(img.reduce(factor) if factor > 1 else img), factor
+
+
+def _crop_box(np: Any, a: Any) -> Optional[Tuple[int, int, int, int]]:
+    """(left, top, right, bottom) in thumbnail pixels: the paper, then the ink on it plus a margin."""
+    paper = a > _otsu(np, a)
+    rows = _span(np, paper.mean(axis=1) >= _PAPER_SHARE * paper.mean(axis=1).max())
+    if rows is None:
+        return None
+    cols = _span(np, paper[rows[0]:rows[1]].mean(axis=0) >= _PAPER_SHARE)
+    if cols is None:
+        return None
+    top, bottom, left, right = rows[0], rows[1], cols[0], cols[1]
+    ink = ~paper[top:bottom, left:right]
+    ink_rows = _span(np, ink.mean(axis=1) >= _INK_SHARE)
+    ink_cols = _span(np, ink.mean(axis=0) >= _INK_SHARE)
+    if ink_rows is not None and ink_cols is not None:
+        margin = round(_MARGIN * max(a.shape))
+        top, bottom = max(top, top + ink_rows[0] - margin), min(bottom, top + ink_rows[1] + margin)
+        left, right = max(left, left + ink_cols[0] - margin), min(right, left + ink_cols[1] + margin)
+    kept = (bottom - top) * (right - left) / float(a.shape[0] * a.shape[1])
+    if kept > 1 - _MIN_CROP_GAIN or kept < _MIN_KEPT_AREA:
+        return None
+    return left, top, right, bottom
+
+
+def _skew_scores(np: Any, ys: Any, xs: Any, angles: Any) -> Any:
+    """
+    Sharpness of the row histogram of the ink points rotated by each angle (peaks when lines are
+    level): sum of squared counts relative to a uniform spread over the same rows (1 = no lines).
+    """
+    rad = np.deg2rad(angles)
+    # Row coordinate of every point after rotating the page by each angle: (points, angles)
+    r = np.outer(ys, np.cos(rad)) + np.outer(xs, np.sin(rad))
+    r = np.rint(r - r.min()).astype(np.int64)
+    spans = r.max(axis=0) - r.min(axis=0) + 1
+    height = int(r.max()) + 1
+    flat = (r + np.arange(len(angles)) * height).ravel()
+    hist = np.bincount(flat, minlength=height * len(angles)).reshape(len(angles), height)
+    return (hist.astype(np.float64) ** 2).sum(axis=1) * spans / float(len(ys)) ** 2
+
+
+def _skew_fit(np: Any, a: Any) -> Tuple[float, float]:
+    """
+    (skew, score): counterclockwise skew of the text lines in degrees (rotate by minus this to
+    level them) and how sharp the line profile is once levelled (0 without enough ink).
+    """
+    ys, xs = np.nonzero(a <= _otsu(np, a))
+    if ys.size < 100:
+        return 0.0, 0.0
+    step = max(1, ys.size // _MAX_INK_POINTS)
+    ys, xs = ys[::step].astype(np.float64), xs[::step].astype(np.float64)
+    coarse = np.arange(-IMAGE_PREPROCESS_MAX_SKEW, IMAGE_PREPROCESS_MAX_SKEW + _SKEW_COARSE / 2, _SKEW_COARSE)
+    best = float(coarse[np.argmax(_skew_scores(np, ys, xs, coarse))])
+    fine = np.arange(best - _SKEW_COARSE, best + _SKEW_COARSE + _SKEW_FINE / 2, _SKEW_FINE)
+    fine = fine[np.abs(fine) <= IMAGE_PREPROCESS_MAX_SKEW + _SKEW_FINE / 2]
+    scores = _skew_scores(np, ys, xs, fine)
+    i = int(np.argmax(scores))
+    return round(float(fine[i]), 2), float(scores[i])
+
+
+def _contrast_lut(np: Any, a: Any) -> Optional[List[int]]:
+    """Linear stretch of the grey levels between the black and white percentiles."""
+    cdf = np.cumsum(np.bincount(a.ravel(), minlength=256))
+    lo = int(np.searchsorted(cdf, _BLACK_PCT * cdf[-1]))
+    hi = int(np.searchsorted(cdf, _WHITE_PCT * cdf[-1]))
+    if hi - lo < _MIN_SPREAD or (lo == 0 and hi == 255):
+        return None
+    lut = np.clip((np.arange(256) - lo) * 255.0 / (hi - lo), 0, 255)
+    return np.rint(lut).astype(np.uint8).tolist()
+
+
+def _warp(Image: Any, img: Any, box: Tuple[int, int, int, int], angle: float, scale: float) -> Any:
+    """
+    Crop to `box`, rotate counterclockwise by `angle` degrees (canvas expanded, white fill) and
+    scale by `scale`, in one resampling pass over the output pixels.
+    """
+    left, top, right, bottom = box
+    w, h = right - left, bottom - top
+    rad = math.radians(angle)
+    cos, sin = math.cos(rad), math.sin(rad)
+    out_w = max(1, round((w * abs(cos) + h * abs(sin)) * scale))
+    out_h = max(1, round((w * abs(sin) + h * abs(cos)) * scale))
+    # Output pixel -> input pixel: around the centres, inverse rotation and scale (as Image.rotate)
+    cx, cy = left + w / 2.0, top + h / 2.0
+    ox, oy = out_w / 2.0, out_h / 2.0
+    a, b = cos / scale, -sin / scale
+    d, e = sin / scale, cos / scale
+    data = (a, b, cx - a * ox - b * oy, d, e, cy - d * ox - e * oy)
+    return img.transform((out_w, out_h), Image.AFFINE, data, resample=Image.BILINEAR, fillcolor=255)
+
+
+def preprocess_frame(img: Any, steps_ms: Dict[str, float]) -> Tuple[Any, Dict[str, Any]]:
+    """One page image -> (preprocessed grayscale image, what was done); adds step times to steps_ms."""
+    mods = _modules()
+    if mods is None:
+        return img, {"skipped": "numpy/Pillow not installed"}
+    np, Image = mods
+    info: Dict[str, Any] = {"size_in": list(img.size)}
+
+    def timed(step: str, t0: float) -> float:
+        t1 = time.perf_counter()
+        steps_ms[step] = steps_ms.get(step, 0.0) + (t1 - t0) * 1000
+        return t1
+
+    t = time.perf_counter()
+    gray = img if img.mode == "L" else img.convert("L")
+    t = timed("grayscale", t)
+
+    # Everything is measured on one thumbnail; the full image is resampled once (warp)
+    thumb, thumb_scale = _thumb(np, gray)
+    box = _crop_box(np, thumb)
+    if box is not None:
+        full = (round(box[0] * thumb_scale), round(box[1] * thumb_scale), round(box[2] * thumb_scale), round(box[3] * thumb_scale))
+        thumb = thumb[box[1]:box[3], box[0]:box[2]]
+        info["crop"] = list(full)
+    else:
+        full = (0, 0, gray.width, gray.height)
+    t = timed("crop", t)
+
+    # Skew first: a skewed page smears the line profile, so the orientation is decided between
+    # the levelled page and the levelled quarter-turned page
+    skew, score = _skew_fit(np, thumb)
+    t = timed("deskew", t)
+
+    turn = 0
+    turned = np.rot90(thumb)
+    turned_skew, turned_score = _skew_fit(np, turned)
+    if turned_score > _ORIENTATION_RATIO * score:
+        # Quarter turn only: upside-down pages (and the 90/270 ambiguity) are left to the OCR engine
+        turn, thumb, skew = 90, turned, turned_skew
+        info["rotated"] = 90
+    t = timed("orientation", t)
+
+    if abs(skew) >= _MIN_SKEW:
+        info["skew_deg"] = skew
+    else:
+        skew = 0.0
+
+    # Downscale to the target resolution (never up); a box filter takes large factors first
+    target = round(IMAGE_PREPROCESS_DPI * _A4_LONG_IN)
+    scale = min(1.0, target / max(full[2] - full[0], full[3] - full[1]))
+    if box is not None or turn or skew or scale < 1.0:
+        src = gray
+        factor = int(1 / scale)
+        if factor >= 2:
+            src = gray.reduce(factor)
+            full = tuple(v // factor for v in full)
+            scale *= factor
+        gray = _warp(Image, src, full, turn - skew, scale)
+    t = timed("warp", t)
+
+    lut = _contrast_lut(np, thumb)
+    if lut is not None:
+        gray = gray.point(lut)
+        info["contrast"] = True
+    timed("contrast", t)
+
+    info["size_out"] = list(gray.size)
+    return gray, info
+
+
+def preprocess_frames(frames: List[Any], report: Dict[str, Any]) -> List[Any]:
+    """Preprocess every frame (closing the originals); per-frame details and step times go to report."""
+    steps_ms = report.setdefault("steps_ms", {})
+    details = report.setdefault("frames", [])
+    out = []
+    with tracing.span("image.preprocess", frames=len(frames)):
+        for frame in frames:
+            try:
+                new, info = preprocess_frame(frame, steps_ms)
+            except Exception as e:
+                new, info = frame, {"skipped": str(e)}
+            if new is not frame:
+                frame.close()
+            out.append(new)
+            details.append(info)
+    return out
+
+
+def image_pages(pdf_path: str) -> Optional[List[Any]]:
+    """The page images of an image-only PDF (one image and no fonts per page), or None."""
+    try:
+        from pypdf import PdfReader  # type: ignore
+    except Exception:
+        return None
+    frames = []
+    for page in PdfReader(pdf_path).pages:
+        frame = page_image(page)
+        if frame is None:
+            for f in frames:
+                f.close()
+            return None
+        frames.append(frame)
+    return frames or None
+
+
+def page_image(page: Any) -> Optional[Any]:
+    """The single image of a pypdf page without a text layer, or None."""
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources is not None else {}
+    if "/Font" in resources:
+        return None
+    images = list(page.images)
+    if len(images) != 1:
+        return None
+    img = images[0].image
+    if img is None:
+        return None
+    return img if img.mode in ("RGB", "L") else img.convert("RGB")
+
+
+def finish_report(report: Dict[str, Any], bytes_in: int, bytes_out: int) -> Dict[str, Any]:
+    """Round the step times, add the payload sizes and publish the metrics."""
+    steps_ms = report.get("steps_ms") or {}
+    report["steps_ms"] = {step: round(steps_ms[step], 3) for step in STEPS if step in steps_ms}
+    report["total_ms"] = round(sum(report["steps_ms"].values()), 3)
+    report["bytes_in"], report["bytes_out"] = bytes_in, bytes_out
+    for step, ms in report["steps_ms"].items():
+        metrics.observe("image_preprocess_seconds", ms / 1000.0, step=step)
+    metrics.inc("image_preprocess_bytes_total", bytes_in, kind="in")
+    metrics.inc("image_preprocess_bytes_total", bytes_out, kind="out")
+    return report
+
+
+def frames_to_pdf_bytes(frames: List[Any]) -> bytes:
+    buf = io.BytesIO()
+    save_frames(frames, buf)
+    return buf.getvalue()
@@ -1,16 +1,32 @@
+import io
 import os
 import tempfile
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 
-try:
-    from PIL import Image, ImageSequence, ImageOps
-except Exception:
-    Image = None
-    ImageSequence = None
-    ImageOps = None
+# Pillow is imported on first use: only image uploads need it, and it dominates import time
+_pil_modules: Optional[Tuple[Any, ...]] = None
+
+
+def _pil() -> Optional[Tuple[Any, Any, Any]]:
+    """(Image, ImageSequence, ImageOps), or None when Pillow is not installed."""
+    global _pil_modules
+    if _pil_modules is None:
+        try:
+            from PIL import Image, ImageSequence, ImageOps
+            _pil_modules = (Image, ImageSequence, ImageOps)
+        except Exception:
+            _pil_modules = ()
+    return _pil_modules or None  # type: ignore[return-value]
+
+
+def pil_image() -> Any:
+    """The PIL.Image module, or None without Pillow."""
+    pil = _pil()
+    return pil[0] if pil else None
 
 
 def convert_image_to_pdf(image_path: str, output_dir: Optional[str] = None, output_path: Optional[str] = None, overwrite: bool = False) -> str:
+    Image = pil_image()
     if Image is None:
         raise RuntimeError("Pillow is required for image to PDF conversion")
     if not os.path.isfile(image_path):
@@ -39,34 +55,67 @@ def convert_image_to_pdf(image_path: str, output_dir: Optional[str] = None, outp
                         break
                     idx += 1
     with Image.open(image_path) as im:
-        frames = []
-        try:
-            for frame in ImageSequence.Iterator(im):
-                f = frame.copy()
-                try:
-                    f = ImageOps.exif_transpose(f)
-                except Exception:
-                    pass
-                if f.mode not in ("RGB", "L"):
-                    f = f.convert("RGB")
-                frames.append(f)
-        except Exception:
-            f = im.copy()
+        frames = load_frames(im)
+        save_frames(frames, out_pdf)
+    return out_pdf
+
+
+def convert_image_to_pdf_bytes(image_path: str, report: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Same conversion as convert_image_to_pdf, but kept in memory (no _converted.pdf on disk).
+    With a report dict the frames are preprocessed for OCR first (rbidp.processors.image_preprocess).
+    """
+    Image = pil_image()
+    if Image is None:
+        raise RuntimeError("Pillow is required for image to PDF conversion")
+    if not os.path.isfile(image_path):
+        raise FileNotFoundError(image_path)
+    buf = io.BytesIO()
+    with Image.open(image_path) as im:
+        if report is not None:
+            from rbidp.processors.image_preprocess import preprocess_frames
+            # JPEGs are decoded straight to grayscale
+            im.draft("L", im.size)
+            frames = preprocess_frames(load_frames(im), report)
+        else:
+            frames = load_frames(im)
+        save_frames(frames, buf)
+    return buf.getvalue()
+
+
+def load_frames(im) -> list:
+    _, ImageSequence, ImageOps = _pil()  # type: ignore[misc]
+    frames = []
+    try:
+        for frame in ImageSequence.Iterator(im):
+            f = frame.copy()
             try:
                 f = ImageOps.exif_transpose(f)
             except Exception:
                 pass
             if f.mode not in ("RGB", "L"):
                 f = f.convert("RGB")
-            frames = [f]
-        if len(frames) == 1:
-            frames[0].save(out_pdf, format="PDF", resolution=300.0)
-        else:
-            first, rest = frames[0], frames[1:]
-            first.save(out_pdf, format="PDF", resolution=300.0, save_all=True, append_images=rest)
-        for fr in frames:
-            try:
-                fr.close()
-            except Exception:
-                pass
-    return out_pdf
+            frames.append(f)
+    except Exception:
+        f = im.copy()
+        try:
+            f = ImageOps.exif_transpose(f)
+        except Exception:
+            pass
+        if f.mode not in ("RGB", "L"):
+            f = f.convert("RGB")
+        frames = [f]
+    return frames
+
+
+def save_frames(frames: list, target) -> None:
+    if len(frames) == 1:
+        frames[0].save(target, format="PDF", resolution=300.0)
+    else:
+        first, rest = frames[0], frames[1:]
+        first.save(target, format="PDF", resolution=300.0, save_all=True, append_images=rest)
+    for fr in frames:
+        try:
+            fr.close()
+        except Exception:
+            pass
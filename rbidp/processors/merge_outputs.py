@@ -1,7 +1,7 @@
-import json
 import os
 from typing import Dict, Any
 from rbidp.core.config import MERGED_FILENAME
+from rbidp.core.run_store import load_json, write_json
 
 
 def merge_extractor_and_doc_type(
@@ -16,10 +16,8 @@ def merge_extractor_and_doc_type(
     - doc_type_filtered_path: file with doc-type check result (dict)
     Returns full path to merged file.
     """
-    with open(extractor_filtered_path, "r", encoding="utf-8") as ef:
-        extractor_obj: Dict[str, Any] = json.load(ef)
-    with open(doc_type_filtered_path, "r", encoding="utf-8") as df:
-        doc_type_obj: Dict[str, Any] = json.load(df)
+    extractor_obj: Dict[str, Any] = load_json(extractor_filtered_path)
+    doc_type_obj: Dict[str, Any] = load_json(doc_type_filtered_path)
 
     merged: Dict[str, Any] = {}
     if isinstance(extractor_obj, dict):
@@ -27,8 +25,6 @@ def merge_extractor_and_doc_type(
     if isinstance(doc_type_obj, dict):
         merged.update(doc_type_obj)
 
-    os.makedirs(output_dir, exist_ok=True)
     out_path = os.path.join(output_dir, filename)
-    with open(out_path, "w", encoding="utf-8") as mf:
-        json.dump(merged, mf, ensure_ascii=False, indent=2)
+    write_json(out_path, merged)
     return out_path
@@ -0,0 +1,143 @@
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Local multi-document detector in front of the GPT single-doc-type check
+# (rbidp.processors.agent_doc_type_checker). It looks at the title lines in the header of every
+# OCR page and at the person names, and answers only when the pages leave no doubt:
+#   single_doc_type True   one page with at most one title kind, or every titled page carries the
+#                          same title (a Kazakh/Russian mirror of a page counts as the same title)
+#                          about the same person
+#   single_doc_type False  different pages start with titles of different kinds («ПРИКАЗ» on one,
+#                          «СПРАВКА» on another)
+#   single_doc_type None   anything else: the GPT check decides
+
+# Title kinds with their Russian and Kazakh spellings (lower case)
+TITLE_KINDS: Dict[str, Tuple[str, ...]] = {
+    "order": ("приказ", "бұйрық", "буйрык"),
+    "certificate": ("справка", "анықтама", "аныктама"),
+    "sick_leave": ("лист временной нетрудоспособности", "больничный лист", "еңбекке уақытша жарамсыздық парағы"),
+    "discharge": ("выписной эпикриз", "выписка из медицинской карты", "выписка из стационара"),
+    "commission": ("заключение врачебно-консультативной комиссии", "заключение вкк", "дәрігерлік-консультациялық комиссияның қорытындысы"),
+    "notice": ("уведомление", "хабарлама"),
+}
+_KAZAKH_LETTERS = set("әғқңөұүһі")
+
+# Lines from the top of a page searched for a title (bilingual issuer headers come first)
+HEADER_LINES = 12
+# A title line is short, starts with the title as a whole word (OCR noise tolerated) and is set in
+# capitals («ПРИКАЗ ...») or is the bare title («Справка», «Приказ № 12»); body sentences that
+# start with the same word («Приказываю:», «Справка выдана для ...») are not titles
+_MAX_TITLE_WORDS = 12
+_TITLE_SCORE = 85
+_UPPER_SHARE = 0.7
+# Same-kind titles in the same language must read alike, same person when names are alike
+_SAME_TITLE_SCORE = 80
+_SAME_NAME_SCORE = 80
+
+_UP = "А-ЯЁӘҒҚҢӨҰҮҺІ"
+_LO = "а-яёәғқңөұүһі"
+_WORD = f"[{_UP}](?:[{_LO}]+|[{_UP}]+)"
+# Three capitalized words; overlapping, so an issuer line before the name does not hide it
+_NAME_RE = re.compile(rf"(?=\b({_WORD})\s+({_WORD})\s+({_WORD})\b)")
+# Patronymic endings (with oblique cases) that make the third word a patronymic
+_PATRONYMIC_RE = re.compile(r"(?:вич|вича|вичу|вичем|вна|вны|вне|вну|вной|чна|чны|чне|чну|чной|ұлы|улы|қызы|кызы)$")
+
+
+def _title_kind(line: str, fuzz: Any) -> Optional[str]:
+    text = " ".join(line.lower().split())
+    if not text or len(text.split()) > _MAX_TITLE_WORDS:
+        return None
+    letters = [c for c in line if c.isalpha()]
+    upper = sum(1 for c in letters if c.isupper()) >= _UPPER_SHARE * len(letters)
+    for kind, spellings in TITLE_KINDS.items():
+        for s in spellings:
+            head, rest = text[:len(s)], text[len(s):]
+            if rest[:1].isalpha() or fuzz.ratio(head, s) < _TITLE_SCORE:
+                continue
+            if upper or not rest.strip() or rest.lstrip().startswith("№"):
+                return kind
+    return None
+
+
+def _titles(lines: List[str], fuzz: Any) -> List[Tuple[str, str, str]]:
+    """(kind, language, line) of every title line among the header lines."""
+    found = []
+    for line in lines[:HEADER_LINES]:
+        kind = _title_kind(line, fuzz)
+        if kind is not None:
+            text = " ".join(line.lower().split())
+            found.append((kind, "kk" if _KAZAKH_LETTERS & set(text) else "ru", text))
+    return found
+
+
+def _names(text: str) -> Set[str]:
+    """"surname name" (lower case) of every full name (with a patronymic) in the text."""
+    out = set()
+    for surname, name, patronymic in _NAME_RE.findall(text):
+        if _PATRONYMIC_RE.search(patronymic.lower()):
+            out.add(f"{surname.lower()} {name.lower()}")
+    return out
+
+
+def _people(names: List[str], fuzz: Any) -> int:
+    """Distinct persons among the names (oblique/nominative forms of one name are alike)."""
+    people: List[str] = []
+    for n in names:
+        if not any(fuzz.ratio(n, p) >= _SAME_NAME_SCORE for p in people):
+            people.append(n)
+    return len(people)
+
+
+def detect_multiple_documents(pages_obj: dict) -> Dict[str, Any]:
+    """{"single_doc_type": True | False | None, "reason": str, "titles": [[page, kind, lang], ...], "people": int}"""
+    # Imported on first use, not when the orchestrator is imported
+    from rapidfuzz import fuzz
+
+    pages = pages_obj.get("pages", []) if isinstance(pages_obj, dict) else []
+    titled: List[Tuple[int, List[Tuple[str, str, str]]]] = []
+    names: Set[str] = set()
+    for i, p in enumerate(pages):
+        text = (p.get("text") or "") if isinstance(p, dict) else ""
+        lines = [ln for ln in text.splitlines() if ln.strip()]
+        found = _titles(lines, fuzz)
+        if found:
+            titled.append((i, found))
+        names |= _names("\n".join(lines[:HEADER_LINES * 2]))
+    people = _people(sorted(names), fuzz)
+    out: Dict[str, Any] = {
+        "single_doc_type": None,
+        "reason": "",
+        "titles": [[i + 1, kind, lang] for i, found in titled for kind, lang, _ in found],
+        "people": people,
+    }
+
+    kinds_per_page = [{kind for kind, _, _ in found} for _, found in titled]
+    if any(len(k) > 1 for k in kinds_per_page):
+        # Two title kinds on one page: a title and a referenced document, or two documents
+        out["reason"] = "several_titles_on_a_page"
+        return out
+    kinds = set().union(*kinds_per_page) if kinds_per_page else set()
+    if len(kinds) > 1:
+        out["single_doc_type"], out["reason"] = False, "different_titles"
+        return out
+    if len(pages) <= 1:
+        out["single_doc_type"], out["reason"] = True, "single_page"
+        return out
+    if not kinds:
+        out["reason"] = "no_titles"
+        return out
+    if people > 1:
+        out["reason"] = "several_people"
+        return out
+    # One kind on every titled page: same title text per language (mirrors differ by language)
+    by_lang: Dict[str, List[str]] = {}
+    for _, found in titled:
+        for _, lang, text in found:
+            by_lang.setdefault(lang, []).append(text)
+    for texts in by_lang.values():
+        if any(fuzz.token_set_ratio(texts[0], t) < _SAME_TITLE_SCORE for t in texts[1:]):
+            out["reason"] = "different_titles_of_a_kind"
+            return out
+    out["single_doc_type"] = True
+    out["reason"] = "mirror_pages" if len(by_lang) > 1 else "same_title"
+    return out
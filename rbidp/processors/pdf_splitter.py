@@ -0,0 +1,77 @@
+import io
+import os
+import mimetypes
+from typing import Any, Dict, List, Optional
+
+from rbidp.processors.image_to_pdf_converter import load_frames, pil_image, save_frames
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp", ".heic", ".heif"}
+
+
+def is_image_path(path: str) -> bool:
+    mt, _ = mimetypes.guess_type(path)
+    return bool((mt and mt.startswith("image/")) or os.path.splitext(path)[1].lower() in IMAGE_EXTS)
+
+
+def _split_pdf(path: str, report: Optional[Dict[str, Any]] = None) -> Optional[List[bytes]]:
+    try:
+        from pypdf import PdfReader, PdfWriter  # type: ignore
+    except Exception:
+        try:
+            from PyPDF2 import PdfReader, PdfWriter  # type: ignore
+        except Exception:
+            return None
+    reader = PdfReader(path)
+    if report is not None:
+        from rbidp.processors.image_preprocess import frames_to_pdf_bytes, page_image, preprocess_frames
+    out: List[bytes] = []
+    for page in reader.pages:
+        if report is not None:
+            # Image-only pages are re-encoded from their preprocessed image
+            img = page_image(page)
+            if img is not None:
+                out.append(frames_to_pdf_bytes(preprocess_frames([img], report)))
+                continue
+        writer = PdfWriter()
+        writer.add_page(page)
+        buf = io.BytesIO()
+        writer.write(buf)
+        out.append(buf.getvalue())
+    return out
+
+
+def _split_image(path: str, report: Optional[Dict[str, Any]] = None) -> Optional[List[bytes]]:
+    Image = pil_image()
+    if Image is None:
+        return None
+    out: List[bytes] = []
+    with Image.open(path) as im:
+        if report is not None:
+            from rbidp.processors.image_preprocess import preprocess_frames
+            # JPEGs are decoded straight to grayscale
+            im.draft("L", im.size)
+            frames = preprocess_frames(load_frames(im), report)
+        else:
+            frames = load_frames(im)
+        for frame in frames:
+            buf = io.BytesIO()
+            save_frames([frame], buf)
+            out.append(buf.getvalue())
+    return out
+
+
+def split_document(path: str, report: Optional[Dict[str, Any]] = None) -> Optional[List[bytes]]:
+    """
+    Split a PDF (or multi-frame image such as TIFF) into single-page PDF payloads, in page order.
+    Returns None when the document cannot be split here (no pypdf/Pillow, unreadable file);
+    callers then OCR the document as a whole. With a report dict, images and image-only PDF
+    pages are preprocessed for OCR (rbidp.processors.image_preprocess).
+    """
+    try:
+        if path.lower().endswith(".pdf"):
+            return _split_pdf(path, report)
+        if is_image_path(path):
+            return _split_image(path, report)
+    except Exception:
+        return None
+    return None
@@ -0,0 +1,73 @@
+import math
+from typing import Any, Dict, List, Optional
+
+from rbidp.core.config import (
+    GPT_LATENCY_BASE_MS,
+    GPT_LATENCY_BUDGET_MS,
+    GPT_LATENCY_MS_PER_COMPLETION_TOKEN,
+    GPT_LATENCY_MS_PER_PROMPT_TOKEN,
+    GPT_PROMPT_TOKEN_BUDGET,
+    LONG_DOC_CONCURRENCY,
+)
+from rbidp.core.usage import estimate_tokens
+from rbidp.processors import agent_combined, agent_doc_type_checker, agent_extractor
+from rbidp.processors.agent_long_extractor import CHUNK_MAX_TOKENS, chunk_pages, chunk_prompt, header_pages
+from rbidp.processors.prompt_registry import prompt_for
+
+# Preflight estimate of a run's GPT calls: the prompts are rendered exactly as the agents will
+# send them and tokenized locally, before anything is sent. The estimate is checked against the
+# configured budgets (admission control) and kept in manifest "usage" next to the actual counts.
+
+_DTC_MAX_TOKENS = 200
+
+
+def _call(agent: str, prompt: str, max_tokens: int) -> Dict[str, Any]:
+    prompt_tokens = estimate_tokens(prompt)
+    latency = GPT_LATENCY_BASE_MS + prompt_tokens * GPT_LATENCY_MS_PER_PROMPT_TOKEN + max_tokens * GPT_LATENCY_MS_PER_COMPLETION_TOKEN
+    return {"agent": agent, "prompt_tokens": prompt_tokens, "max_tokens": max_tokens, "latency_ms": latency}
+
+
+def plan_calls(pages_obj: dict, doc_type: Optional[str], *, combined: bool, long_doc: bool, specialized: bool) -> List[List[Dict[str, Any]]]:
+    """The GPT calls a run will make, as sequential steps of calls that run concurrently."""
+    if long_doc:
+        chunks = chunk_pages(pages_obj)
+        dtc = [_call("dtc_chunk", agent_doc_type_checker.render_prompt(c), _DTC_MAX_TOKENS) for c in chunks]
+        if len(chunks) > 1:
+            # Cross-chunk check over the page headers
+            dtc.append(_call("dtc_headers", agent_doc_type_checker.render_prompt(header_pages(pages_obj)), _DTC_MAX_TOKENS))
+        extract = [_call("extract_chunk", chunk_prompt(c), CHUNK_MAX_TOKENS) for c in chunks]
+        return [dtc, extract]
+    if combined:
+        return [[_call("dtc_extract", agent_combined.render_prompt(pages_obj), agent_combined.MAX_TOKENS)]]
+    if specialized:
+        entry = prompt_for(doc_type)
+        extract = _call("extract", agent_extractor.render_prompt(pages_obj, entry["prompt"]), entry["max_tokens"])
+    else:
+        extract = _call("extract", agent_extractor.render_prompt(pages_obj), 200)
+    return [[_call("dtc", agent_doc_type_checker.render_prompt(pages_obj), _DTC_MAX_TOKENS)], [extract]]
+
+
+def estimate(steps: List[List[Dict[str, Any]]], concurrency: int = LONG_DOC_CONCURRENCY) -> Dict[str, Any]:
+    calls = [c for step in steps for c in step]
+    latency = 0.0
+    for step in steps:
+        if step:
+            # Concurrent calls of a step go out in waves of `concurrency`
+            waves = math.ceil(len(step) / max(1, concurrency))
+            latency += waves * max(c["latency_ms"] for c in step)
+    return {
+        "calls": len(calls),
+        "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+        "max_prompt_tokens": max((c["prompt_tokens"] for c in calls), default=0),
+        "max_completion_tokens": sum(c["max_tokens"] for c in calls),
+        "latency_ms": round(latency, 1),
+    }
+
+
+def over_budget(est: Dict[str, Any]) -> Optional[str]:
+    """Which budget the estimate exceeds ("tokens" | "latency"), or None."""
+    if GPT_PROMPT_TOKEN_BUDGET and est["max_prompt_tokens"] > GPT_PROMPT_TOKEN_BUDGET:
+        return "tokens"
+    if GPT_LATENCY_BUDGET_MS and est["latency_ms"] > GPT_LATENCY_BUDGET_MS:
+        return "latency"
+    return None
@@ -0,0 +1,136 @@
+import re
+import sys
+import json
+from typing import Any, Dict, List, Optional
+
+from rbidp.core.validity import resolve_policy
+from rbidp.processors.agent_extractor import KNOWN_DOC_TYPES, PROMPT as GENERIC_PROMPT
+
+# Extraction prompts specialized by the doc_type the applicant declared in the form.
+#
+# The generic extractor prompt classifies among all fifteen types and carries the valid_until
+# rules of one of them. When the declared type is known, the model only has to confirm that
+# type and extract the fields its validity policy (rbidp.core.validity) reads:
+#   fixed_days         -> fio, doc_type, doc_date
+#   explicit_end_date  -> fio, doc_type, doc_date, valid_until
+# Unknown declared types fall back to the generic prompt.
+#
+#   python -m rbidp.processors.prompt_registry      # prompt size per doc type vs the generic prompt
+
+GENERIC_MAX_TOKENS = 200
+
+# What the title looks like in the OCR text (Russian / Kazakh), to confirm the declared type
+TITLE_HINTS: Dict[str, str] = {
+    "Лист временной нетрудоспособности (больничный лист)": "«Лист временной нетрудоспособности» / «Еңбекке уақытша жарамсыздық парағы»",
+    "Приказ о выходе в декретный отпуск по уходу за ребенком": "«Приказ» / «Бұйрық» о предоставлении отпуска по беременности и родам или по уходу за ребенком",
+    "Справка о выходе в декретный отпуск по уходу за ребенком": "«Справка» / «Анықтама» об отпуске по беременности и родам или по уходу за ребенком",
+    "Выписка из стационара (выписной эпикриз)": "«Выписной эпикриз» / «Выписка из медицинской карты стационарного больного»",
+    "Больничный лист на сопровождающего (если предусмотрено)": "«Лист временной нетрудоспособности» по уходу за больным (сопровождающий)",
+    "Заключение врачебно-консультативной комиссии (ВКК)": "«Заключение ВКК» / «Заключение врачебно-консультативной комиссии»",
+    "Справка об инвалидности": "«Справка об инвалидности» / «Мүгедектік туралы анықтама», группа инвалидности",
+    "Справка о степени утраты общей трудоспособности": "«Справка о степени утраты общей/профессиональной трудоспособности», процент утраты",
+    "Приказ о расторжении трудового договора": "«Приказ» / «Бұйрық» о расторжении (прекращении) трудового договора",
+    "Справка о расторжении трудового договора": "«Справка» / «Анықтама» о расторжении (прекращении) трудового договора",
+    "Справка о регистрации в качестве безработного": "«Справка» о регистрации в качестве безработного (центр занятости)",
+    "Приказ работодателя о предоставлении отпуска без сохранения заработной платы": "«Приказ» / «Бұйрық» о предоставлении отпуска без сохранения заработной платы",
+    "Справка о неполучении доходов": "«Справка» об отсутствии (неполучении) доходов",
+    "Уведомление о регистрации в качестве лица, ищущего работу": "«Уведомление» о регистрации в качестве лица, ищущего работу",
+    "Лица, зарегистрированные в качестве безработных": "сведения / список лиц, зарегистрированных в качестве безработных",
+}
+
+_HEADER = """
+You extract data from a noisy OCR text (Kazakh and/or Russian) of ONE document.
+The applicant declared it to be: "{doc_type}"
+It is recognizable by its title: {hint}
+
+Keys:
+- doc_type: exactly "{doc_type}" if the document is of this type; otherwise the document's own title as written; null if no title is recognizable.
+- fio: full name of the person the document is about (Фамилия Имя Отчество), nominative case, in Russian; prefer the full form over initials.
+- doc_date: main issuance date (near the header or "№"), DD.MM.YYYY.
+"""
+
+_VALID_UNTIL = """- valid_until: the last date of the period the document states («с DD.MM.YYYY … по DD.MM.YYYY»), DD.MM.YYYY; null if no period is stated.
+"""
+
+_FOOTER = """Missing values are null; never invent data.
+Output only this JSON object (no explanations, no Markdown):
+{schema}
+
+Text for analysis:
+{{}}
+"""
+
+# Answer size: ~25 tokens per key incl. a long doc_type title, plus slack
+_TOKENS_PER_KEY = 30
+_MIN_MAX_TOKENS = 80
+
+
+def _build(doc_type: str) -> Dict[str, Any]:
+    fields = ["fio", "doc_type", "doc_date"]
+    body = _HEADER.format(doc_type=doc_type, hint=TITLE_HINTS.get(doc_type, f"«{doc_type}»"))
+    if resolve_policy(doc_type).get("type") == "explicit_end_date":
+        fields.append("valid_until")
+        body += _VALID_UNTIL
+    schema = "{" + ", ".join(f'"{k}": string | null' for k in fields) + "}"
+    # Literal braces of the schema survive format(); "{}" stays the text placeholder
+    prompt = body + _FOOTER.format(schema=schema)
+    return {
+        "doc_type": doc_type,
+        "fields": fields,
+        "prompt": prompt,
+        "max_tokens": max(_MIN_MAX_TOKENS, _TOKENS_PER_KEY * len(fields)),
+    }
+
+
+REGISTRY: Dict[str, Dict[str, Any]] = {t: _build(t) for t in KNOWN_DOC_TYPES}
+
+
+def canonical_doc_type(doc_type: Any) -> Optional[str]:
+    """The KNOWN_DOC_TYPES entry a declared doc_type refers to (whitespace/case-insensitive), or None."""
+    if not isinstance(doc_type, str):
+        return None
+    key = re.sub(r"\s+", " ", doc_type.strip()).casefold()
+    for t in KNOWN_DOC_TYPES:
+        if t.casefold() == key:
+            return t
+    return None
+
+
+def prompt_for(declared_doc_type: Any) -> Dict[str, Any]:
+    """Registry entry for the declared type, or the generic prompt entry (doc_type None)."""
+    canonical = canonical_doc_type(declared_doc_type)
+    if canonical is not None:
+        return REGISTRY[canonical]
+    return {"doc_type": None, "fields": ["fio", "doc_type", "doc_date", "valid_until"], "prompt": GENERIC_PROMPT, "max_tokens": GENERIC_MAX_TOKENS}
+
+
+def size_report() -> Dict[str, Any]:
+    """Instruction size (without the OCR text) of every specialized prompt against the generic one."""
+    generic = len(GENERIC_PROMPT)
+    rows: List[Dict[str, Any]] = []
+    for t, entry in REGISTRY.items():
+        chars = len(entry["prompt"])
+        rows.append({
+            "doc_type": t,
+            "fields": entry["fields"],
+            "prompt_chars": chars,
+            "reduction_pct": round((1 - chars / generic) * 100, 1),
+            "max_tokens": entry["max_tokens"],
+        })
+    return {"generic_prompt_chars": generic, "generic_max_tokens": GENERIC_MAX_TOKENS, "specialized": rows}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    report = size_report()
+    if argv is None:
+        argv = sys.argv[1:]
+    if "--json" in argv:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"generic: {report['generic_prompt_chars']} chars, max_tokens {report['generic_max_tokens']}")
+    for r in report["specialized"]:
+        print(f"{r['prompt_chars']:>6} chars {r['reduction_pct']:>6}%  max_tokens {r['max_tokens']:>4}  {r['doc_type']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import json
+import codecs
+import math
+from array import array
+from typing import Any, BinaryIO, Dict, List, Optional
+
+# Compact page model of an OCR response, built incrementally from the HTTP body.
+#
+# Textract answers with {"Blocks": [...]} where every PAGE/LINE/WORD block carries geometry,
+# relationships and ids; decoded whole that is by far the largest object of a run. The stream
+# parser below decodes one block at a time and keeps only what the pipeline reads: LINE text,
+# page, confidence and bounding box. The gateway's {"data": {"pages": [...]}} shape is kept as is.
+
+_CHUNK = 64 * 1024
+_WS = " \t\n\r"
+_NAN = math.nan
+_NO_BOX = [_NAN] * 4
+
+
+class OcrPage:
+    __slots__ = ("page_number", "lines", "confidence", "geometry")
+
+    def __init__(self, page_number: Optional[int]):
+        self.page_number = page_number
+        self.lines: List[str] = []
+        # Per line: confidence, and Left/Top/Width/Height of the bounding box (NaN if absent)
+        self.confidence = array("f")
+        self.geometry = array("f")
+
+    def add_line(self, text: str, confidence: Any = None, bbox: Any = None) -> None:
+        self.lines.append(text)
+        self.confidence.append(confidence if isinstance(confidence, (int, float)) else _NAN)
+        try:
+            # fromlist is all-or-nothing, so a bad coordinate cannot shift the rows
+            self.geometry.fromlist([bbox["Left"], bbox["Top"], bbox["Width"], bbox["Height"]])
+        except (KeyError, TypeError):
+            self.geometry.fromlist(_NO_BOX)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+class OcrDocument:
+    """Parsed OCR response: top-level fields (success, message, ...) plus the pages."""
+
+    __slots__ = ("fields", "pages", "source", "raw", "error")
+
+    def __init__(self) -> None:
+        self.fields: Dict[str, Any] = {}
+        self.pages: List[OcrPage] = []
+        self.source = "none"  # "pages" (gateway data.pages) | "blocks" (Textract) | "none"
+        self.raw: Optional[bytes] = None  # the body, only when raw persistence was requested
+        self.error: Optional[str] = None  # the body was not valid JSON
+
+    @property
+    def success(self) -> bool:
+        return self.error is None and bool(self.fields.get("success"))
+
+    @property
+    def message(self) -> Optional[str]:
+        return self.fields.get("message") or self.fields.get("error") or self.error
+
+    def to_pages(self) -> List[Dict[str, Any]]:
+        """[{"page_number", "text"}, ...], exactly as extract_pages() builds it from the raw object."""
+        if self.source == "pages":
+            return [{"page_number": p.page_number, "text": p.text} for p in self.pages]
+        if self.source == "blocks":
+            return [{"page_number": p.page_number, "text": p.text.strip()} for p in self.pages]
+        return [{"page_number": None, "text": ""}]
+
+    @classmethod
+    def from_object(cls, obj: Any) -> "OcrDocument":
+        """From an already decoded response object (single pass over its blocks)."""
+        doc = cls()
+        if not isinstance(obj, dict):
+            return doc
+        doc.fields = {k: v for k, v in obj.items() if k != "Blocks"}
+        pages = _data_pages(obj.get("data"))
+        if pages is not None:
+            doc.source, doc.pages = "pages", pages
+        elif isinstance(obj.get("Blocks"), list):
+            collector = _BlockCollector()
+            collector.extend(obj["Blocks"])
+            doc.source, doc.pages = "blocks", collector.pages()
+        return doc
+
+    @classmethod
+    def from_pages(cls, pages: List[Dict[str, Any]], success: bool, message: Optional[str] = None) -> "OcrDocument":
+        doc = cls()
+        doc.fields = {"success": success}
+        if message:
+            doc.fields["message"] = message
+        doc.source = "pages"
+        for p in pages:
+            page = OcrPage(p.get("page_number"))
+            page.add_line(p.get("text", "") or "")
+            doc.pages.append(page)
+        return doc
+
+
+class _BlockCollector:
+    """Single pass over Textract blocks; same page text as extract_pages()."""
+
+    def __init__(self) -> None:
+        self.lines: Dict[Any, OcrPage] = {}
+        # Only needed when the response has no LINE blocks at all; dropped at the first LINE
+        self.texts: Optional[Dict[Any, OcrPage]] = {}
+
+    @staticmethod
+    def _page(pages: Dict[Any, OcrPage], page_no: Any) -> OcrPage:
+        page = pages.get(page_no)
+        if page is None:
+            page = pages[page_no] = OcrPage(page_no if isinstance(page_no, int) else None)
+        return page
+
+    def add(self, b: Any) -> None:
+        if not isinstance(b, dict):
+            return
+        txt = b.get("Text")
+        if b.get("BlockType") == "LINE":
+            self.texts = None
+            if txt:
+                geometry = b.get("Geometry")
+                bbox = geometry.get("BoundingBox") if isinstance(geometry, dict) else None
+                self._page(self.lines, b.get("Page")).add_line(txt, b.get("Confidence"), bbox)
+        elif self.texts is not None and txt:
+            self._page(self.texts, b.get("Page")).add_line(txt, b.get("Confidence"))
+
+    def extend(self, blocks: List[Any]) -> None:
+        # Bulk form of add() for an already decoded array: once the first LINE is seen, WORD
+        # blocks (the vast majority) are skipped without a method call each
+        it = iter(blocks)
+        for b in it:
+            self.add(b)
+            if self.texts is None:
+                break
+        lines, page = self.lines, self._page
+        for b in it:
+            if isinstance(b, dict) and b.get("BlockType") == "LINE":
+                txt = b.get("Text")
+                if txt:
+                    geometry = b.get("Geometry")
+                    bbox = geometry.get("BoundingBox") if isinstance(geometry, dict) else None
+                    page(lines, b.get("Page")).add_line(txt, b.get("Confidence"), bbox)
+
+    def pages(self) -> List[OcrPage]:
+        pages = self.lines if self.texts is None else self.texts
+        out = [pages[k] for k in sorted(k for k in pages if isinstance(k, int))]
+        if None in pages:
+            out.append(pages[None])
+        return out
+
+
+def _data_pages(data: Any) -> Optional[List[OcrPage]]:
+    if not isinstance(data, dict) or not isinstance(data.get("pages"), list):
+        return None
+    pages: List[OcrPage] = []
+    for p in data["pages"]:
+        if isinstance(p, dict):
+            pn = p.get("page_number")
+            try:
+                pn = int(pn) if pn is not None else None
+            except Exception:
+                pn = None
+            page = OcrPage(pn)
+            page.add_line(p.get("text", "") or "")
+            pages.append(page)
+    if all(isinstance(p.page_number, int) for p in pages):
+        pages.sort(key=lambda p: p.page_number)
+    return pages
+
+
+class _Reader:
+    """Text buffer over a binary stream; decodes JSON values one at a time with raw_decode."""
+
+    def __init__(self, fp: BinaryIO, raw_sink: Optional[List[bytes]]):
+        self.fp = fp
+        self.raw_sink = raw_sink
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+
+    def _fill(self, min_chars: int = 1) -> bool:
+        if self.eof:
+            return False
+        # Drop what has been consumed so the buffer stays around one block in size
+        if self.pos > _CHUNK:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        target = len(self.buf) + min_chars
+        while len(self.buf) < target:
+            chunk = self.fp.read(max(_CHUNK, min_chars))
+            if not chunk:
+                self.buf += self.decoder.decode(b"", final=True)
+                self.eof = True
+                break
+            self.bytes_read += len(chunk)
+            if self.raw_sink is not None:
+                self.raw_sink.append(chunk)
+            self.buf += self.decoder.decode(chunk)
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of OCR response")
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"Expected {ch!r} at offset {self.bytes_read}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self.json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete value: read at least as much again (amortized linear for big values)
+                if not self._fill(min_chars=len(self.buf) - self.pos + 1):
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and isinstance(obj, (int, float)):
+                self._fill()
+                continue
+            self.pos = end
+            return obj
+
+    def finish(self) -> None:
+        # As with json.loads, only whitespace may follow the top-level object
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                raise ValueError(f"Extra data after the object at offset {self.bytes_read}")
+            if not self._fill():
+                return
+
+    def drain(self) -> None:
+        while self._fill():
+            self.buf, self.pos = "", 0
+
+
+def parse_ocr_stream(fp: BinaryIO, keep_raw: bool = False) -> OcrDocument:
+    """
+    Parse an OCR response body from a binary stream (HTTP response, file) without building the
+    full object: top-level fields are decoded normally, the "Blocks" array element by element.
+    keep_raw=True also keeps the body bytes (doc.raw) for persistence.
+    """
+    doc = OcrDocument()
+    sink: Optional[List[bytes]] = [] if keep_raw else None
+    reader = _Reader(fp, sink)
+    collector: Optional[_BlockCollector] = None
+    try:
+        reader.expect("{")
+        if reader.peek() == "}":
+            reader.pos += 1
+        else:
+            while True:
+                key = reader.value()
+                reader.expect(":")
+                if key == "Blocks" and reader.peek() == "[":
+                    reader.pos += 1
+                    collector = _BlockCollector()
+                    if reader.peek() == "]":
+                        reader.pos += 1
+                    else:
+                        while True:
+                            collector.add(reader.value())
+                            sep = reader.peek()
+                            reader.pos += 1
+                            if sep == "]":
+                                break
+                            if sep != ",":
+                                raise ValueError(f"Expected ',' or ']' at offset {reader.bytes_read}")
+                    doc.fields[key] = None
+                else:
+                    doc.fields[key] = reader.value()
+                sep = reader.peek()
+                reader.pos += 1
+                if sep == "}":
+                    break
+                if sep != ",":
+                    raise ValueError(f"Expected ',' or '}}' at offset {reader.bytes_read}")
+        reader.finish()
+    except ValueError as e:
+        doc.error = str(e)
+        reader.drain()
+
+    if sink is not None:
+        doc.raw = b"".join(sink)
+    if doc.error is not None:
+        return doc
+    pages = _data_pages(doc.fields.get("data"))
+    if pages is not None:
+        doc.source, doc.pages = "pages", pages
+    elif collector is not None:
+        doc.source, doc.pages = "blocks", collector.pages()
+    doc.fields.pop("Blocks", None)
+    return doc
@@ -1,10 +1,9 @@
-import json
 import os
 from typing import Dict, Any
 import re
-from rapidfuzz import fuzz  
 from rbidp.core.config import VALIDATION_FILENAME
 from rbidp.core.dates import now_utc_plus
+from rbidp.core.run_store import load_json
 from rbidp.core.validity import compute_valid_until, is_within_validity, format_date
 
 VALIDATION_MESSAGES = {
@@ -94,10 +93,8 @@ def latin_to_cyrillic(s: str) -> str:
 
 def validate_run(meta_path: str, merged_path: str, output_dir: str, filename: str = VALIDATION_FILENAME, write_file: bool = True) -> Dict[str, Any]:
     try:
-        with open(meta_path, "r", encoding="utf-8") as mf:
-            meta = json.load(mf)
-        with open(merged_path, "r", encoding="utf-8") as gf:
-            merged = json.load(gf)
+        meta = load_json(meta_path)
+        merged = load_json(merged_path)
     except Exception as e:
         return {"success": False, "error": f"IO error: {e}", "validation_path": "", "result": None}
 
@@ -121,6 +118,9 @@ def validate_run(meta_path: str, merged_path: str, output_dir: str, filename: st
     valid_until_raw = merged.get("valid_until") if isinstance(merged, dict) else None
     single_doc_type_raw = merged.get("single_doc_type") if isinstance(merged, dict) else None
 
+    # Imported on first validation, not when the orchestrator is imported
+    from rapidfuzz import fuzz
+
     score_before = None
     score_after = None
     try:
@@ -0,0 +1,312 @@
+import os
+import json
+import shutil
+import logging
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from rbidp.orchestrator import run_pipeline, allocate_run, warmup, _safe_filename
+from rbidp.clients.adaptive import upstream_limits
+from rbidp.service.multipart import MultipartError, boundary_from_content_type, parse_multipart
+from rbidp.service.jobs import JobQueue, JobWorkers, QueueFullError, default_queue
+from rbidp.core import metrics, tracing
+from rbidp.core.config import (
+    RUNS_DIR,
+    API_HOST,
+    API_PORT,
+    API_POOL_KIND,
+    API_POOL_WORKERS,
+    API_MAX_IN_FLIGHT,
+    API_MAX_UPLOAD_BYTES,
+    JOBS_WORKERS,
+    WARMUP_ON_START,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Multipart framing (boundaries, part headers, text fields) on top of the file itself
+_MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class WorkerPool:
+    """
+    Runs run_pipeline on a thread or process pool with a hard cap on in-flight requests.
+    try_acquire() never blocks: callers get False (-> HTTP 429) instead of an unbounded queue.
+    """
+
+    def __init__(self, kind: str = API_POOL_KIND, workers: int = API_POOL_WORKERS, max_in_flight: int = API_MAX_IN_FLIGHT):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.kind = kind
+        self.workers = max(1, int(workers))
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._closed = False
+        if kind == "process":
+            # Each worker process warms up once when it starts, not on its first request
+            initializer = warmup if WARMUP_ON_START else None
+            self._executor: Executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initializer)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rbidp-worker")
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        if self._closed or not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self._in_flight += 1
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def run(self, **kwargs: Any) -> Dict[str, Any]:
+        """Execute run_pipeline on the pool and wait for its result (slot must already be held)."""
+        return self._executor.submit(run_pipeline, **kwargs).result()
+
+    def ready(self) -> bool:
+        return not self._closed and self._in_flight < self.max_in_flight
+
+    def shutdown(self) -> None:
+        self._closed = True
+        self._executor.shutdown(wait=True)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "rbidp-api/1.0"
+    protocol_version = "HTTP/1.1"
+
+    # Set by make_server()
+    pool: WorkerPool
+    runs_root: Path
+    jobs: Optional[JobQueue] = None
+    max_upload_bytes: int = API_MAX_UPLOAD_BYTES
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.info("%s %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, obj: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _reject(self, status: int, code: str, headers: Optional[Dict[str, str]] = None) -> None:
+        # The request body was not consumed, so the connection cannot be reused
+        self.close_connection = True
+        self._send_json(status, {"error": code}, headers=headers)
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/readyz":
+            ready = self.pool.ready() and os.access(self.runs_root, os.W_OK)
+            self._send_json(
+                200 if ready else 503,
+                {"ready": ready, "in_flight": self.pool.in_flight, "max_in_flight": self.pool.max_in_flight},
+            )
+        elif path == "/metrics":
+            out = metrics.snapshot()
+            out["upstream_limits"] = upstream_limits()
+            if self.jobs is not None:
+                out["jobs"] = self.jobs.stats()
+            self._send_json(200, out)
+        elif path.startswith("/v1/jobs/") and self.jobs is not None:
+            job = self.jobs.get(path[len("/v1/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "NOT_FOUND"})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": "NOT_FOUND"})
+
+    def do_POST(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path == "/v1/jobs" and self.jobs is not None:
+            self._submit_job()
+            return
+        if path != "/v1/process":
+            self._reject(404, "NOT_FOUND")
+            return
+        if not self.pool.try_acquire():
+            self._reject(429, "TOO_MANY_REQUESTS", headers={"Retry-After": "1"})
+            return
+        try:
+            self._process()
+        finally:
+            self.pool.release()
+
+    def _receive_upload(self, run: Dict[str, Any], length: int) -> Tuple[Dict[str, str], Optional[Dict[str, Any]]]:
+        boundary = boundary_from_content_type(self.headers.get("Content-Type"))
+        if boundary is None:
+            raise MultipartError("Expected multipart/form-data")
+        upload: Dict[str, Any] = {}
+
+        def open_file(name: str, filename: str, content_type: Optional[str]):
+            if name != "file" or upload:
+                return lambda _b: None
+            saved_path = Path(run["input"]) / _safe_filename(filename)
+            fh = open(saved_path, "wb")
+            upload.update({"path": saved_path, "handle": fh, "filename": filename, "content_type": content_type})
+            return fh.write
+
+        try:
+            fields = parse_multipart(self.rfile, boundary, length, open_file, max_file_bytes=self.max_upload_bytes)
+        finally:
+            if "handle" in upload:
+                upload.pop("handle").close()
+        return fields, (upload or None)
+
+    def _accept_upload(self) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Stream the upload into a freshly allocated run and return (run, run_pipeline kwargs).
+        Sends the error response itself and returns None when the request is unusable.
+        """
+        header = self.headers.get("Content-Length")
+        if header is None:
+            self._reject(411, "LENGTH_REQUIRED")
+            return None
+        try:
+            length = int(header)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reject(400, "BAD_CONTENT_LENGTH")
+            return None
+        if length > self.max_upload_bytes + _MULTIPART_OVERHEAD_BYTES:
+            self._reject(413, "PAYLOAD_TOO_LARGE")
+            return None
+
+        run = allocate_run(self.runs_root)
+        try:
+            fields, upload = self._receive_upload(run, length)
+        except (MultipartError, ValueError) as e:
+            shutil.rmtree(run["base"], ignore_errors=True)
+            self._reject(400, "BAD_MULTIPART", headers={"X-Error-Details": str(e)[:200]})
+            return None
+
+        doc_type = (fields.get("doc_type") or "").strip()
+        if upload is None or not doc_type:
+            shutil.rmtree(run["base"], ignore_errors=True)
+            self._send_json(400, {"error": "MISSING_FIELDS", "required": ["file", "doc_type"]})
+            return None
+
+        kwargs = {
+            "fio": (fields.get("fio") or "").strip() or None,
+            "reason": (fields.get("reason") or "").strip() or None,
+            "doc_type": doc_type,
+            "source_file_path": str(upload["path"]),
+            "original_filename": upload["filename"],
+            "content_type": upload["content_type"],
+            "runs_root": self.runs_root,
+            "priority": (fields.get("priority") or "").strip() or None,
+            "profile": True if (fields.get("profile") or "").strip().lower() in ("1", "true") else None,
+        }
+        return run, kwargs
+
+    def _submit_job(self) -> None:
+        assert self.jobs is not None
+        # Cheap early rejection before the body is read; submit() re-checks atomically
+        if self.jobs.stats()["depth"] >= self.jobs.max_depth:
+            metrics.inc("jobs_rejected_total")
+            self._reject(429, "QUEUE_FULL", headers={"Retry-After": "5"})
+            return
+        accepted = self._accept_upload()
+        if accepted is None:
+            return
+        run, kwargs = accepted
+        kwargs["runs_root"] = str(kwargs["runs_root"])
+        try:
+            self.jobs.submit(run["run_id"], kwargs)
+        except QueueFullError:
+            shutil.rmtree(run["base"], ignore_errors=True)
+            self._send_json(429, {"error": "QUEUE_FULL"}, headers={"Retry-After": "5"})
+            return
+        self._send_json(202, {"run_id": run["run_id"], "status": "queued", "status_url": f"/v1/jobs/{run['run_id']}"})
+
+    def _process(self) -> None:
+        accepted = self._accept_upload()
+        if accepted is None:
+            return
+        run, kwargs = accepted
+        try:
+            result = self.pool.run(run_id=run["run_id"], **kwargs)
+        except Exception as e:
+            logger.exception("run_pipeline crashed for run %s", run["run_id"])
+            self._send_json(500, {"error": "INTERNAL_ERROR", "run_id": run["run_id"], "details": str(e)})
+            return
+        self._send_json(200, result)
+
+
+def make_server(
+    host: str = API_HOST,
+    port: int = API_PORT,
+    runs_root: Optional[Path] = None,
+    pool: Optional[WorkerPool] = None,
+    jobs: Optional[JobQueue] = None,
+) -> ThreadingHTTPServer:
+    root = Path(runs_root or RUNS_DIR).resolve()
+    root.mkdir(parents=True, exist_ok=True)
+    handler = type(
+        "BoundApiHandler",
+        (ApiHandler,),
+        {"pool": pool or WorkerPool(), "runs_root": root, "jobs": jobs},
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RB IDP headless HTTP API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--runs-root", default=RUNS_DIR)
+    parser.add_argument("--pool", choices=("thread", "process"), default=API_POOL_KIND)
+    parser.add_argument("--workers", type=int, default=API_POOL_WORKERS)
+    parser.add_argument("--max-in-flight", type=int, default=API_MAX_IN_FLIGHT)
+    parser.add_argument("--job-workers", type=int, default=JOBS_WORKERS, help="0 = accept jobs only (separate worker processes)")
+    args = parser.parse_args()
+
+    tracing.setup_logging(logging.INFO)
+    if WARMUP_ON_START:
+        logger.info("Warm-up: %s", warmup())
+    pool = WorkerPool(kind=args.pool, workers=args.workers, max_in_flight=args.max_in_flight)
+    jobs = default_queue(Path(args.runs_root).resolve())
+    job_workers = JobWorkers(jobs, workers=args.job_workers) if args.job_workers > 0 else None
+    if job_workers is not None:
+        job_workers.start()
+    server = make_server(args.host, args.port, runs_root=Path(args.runs_root), pool=pool, jobs=jobs)
+    logger.info("Serving on %s:%s (pool=%s workers=%s max_in_flight=%s)", args.host, args.port, args.pool, args.workers, args.max_in_flight)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if job_workers is not None:
+            job_workers.stop()
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from rbidp.core import metrics, tracing
+from rbidp.core.run_store import artifact_exists, load_json
+from rbidp.orchestrator import run_pipeline, warmup
+from rbidp.core.config import (
+    RUNS_DIR,
+    JOBS_DB_FILENAME,
+    JOBS_MAX_DEPTH,
+    JOBS_LEASE_SECONDS,
+    JOBS_MAX_ATTEMPTS,
+    JOBS_POLL_INTERVAL_SECONDS,
+    JOBS_WORKERS,
+    WARMUP_ON_START,
+)
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    run_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    final_result_path TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_enqueued ON jobs(status, enqueued_at);
+"""
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class JobQueue:
+    """
+    Durable job queue for run_pipeline backed by SQLite in WAL mode (survives restarts).
+    Workers claim jobs with a lease; a job whose lease expires (worker crashed or hung)
+    becomes visible again and is re-claimed until max_attempts is reached.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_depth: int = JOBS_MAX_DEPTH,
+        lease_seconds: float = JOBS_LEASE_SECONDS,
+        max_attempts: int = JOBS_MAX_ATTEMPTS,
+    ):
+        self.db_path = str(db_path)
+        self.max_depth = max_depth
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _refresh_depth(self, conn: sqlite3.Connection) -> int:
+        depth = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (STATUS_QUEUED, STATUS_RUNNING)
+        ).fetchone()[0]
+        metrics.set_gauge("jobs_queue_depth", depth)
+        return depth
+
+    def submit(self, run_id: str, payload: Dict[str, Any]) -> None:
+        """Persist a job; raises QueueFullError when queued+running jobs reach max_depth."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._refresh_depth(conn) >= self.max_depth:
+                metrics.inc("jobs_rejected_total")
+                raise QueueFullError(f"Job queue is full ({self.max_depth})")
+            conn.execute(
+                "INSERT INTO jobs (run_id, status, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+                (run_id, STATUS_QUEUED, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        metrics.inc("jobs_submitted_total")
+
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        """Claim the oldest visible job (queued, or running with an expired lease)."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Expired leases that used up their attempts are failed rather than re-run forever
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = 'LEASE_EXPIRED' "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (STATUS_FAILED, now, STATUS_RUNNING, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_expires_at < ?) "
+                "ORDER BY enqueued_at LIMIT 1",
+                (STATUS_QUEUED, STATUS_RUNNING, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, "
+                "lease_owner = ?, lease_expires_at = ? WHERE run_id = ?",
+                (STATUS_RUNNING, now, owner, now + self.lease_seconds, row["run_id"]),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row["status"] == STATUS_QUEUED:
+            metrics.observe("jobs_wait_seconds", now - row["enqueued_at"])
+        else:
+            metrics.inc("jobs_lease_expired_total")
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["attempts"] += 1
+        return job
+
+    def renew(self, run_id: str, owner: str) -> bool:
+        cur = self._conn().execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE run_id = ? AND lease_owner = ? AND status = ?",
+            (time.time() + self.lease_seconds, run_id, owner, STATUS_RUNNING),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, run_id: str, owner: str, final_result_path: Optional[str]) -> None:
+        self._finish(run_id, owner, STATUS_DONE, final_result_path=final_result_path)
+
+    def fail(self, run_id: str, owner: str, error: str) -> None:
+        conn = self._conn()
+        row = conn.execute("SELECT attempts FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is not None and row["attempts"] < self.max_attempts:
+            # Hand it back to the queue for another attempt
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, error = ? "
+                "WHERE run_id = ? AND lease_owner = ?",
+                (STATUS_QUEUED, error, run_id, owner),
+            )
+            return
+        self._finish(run_id, owner, STATUS_FAILED, error=error)
+
+    def _finish(self, run_id: str, owner: str, status: str, final_result_path: Optional[str] = None, error: Optional[str] = None) -> None:
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, final_result_path = ?, error = ?, lease_expires_at = NULL "
+            "WHERE run_id = ? AND lease_owner = ?",
+            (status, now, final_result_path, error, run_id, owner),
+        )
+        row = conn.execute("SELECT started_at FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is not None and row["started_at"]:
+            metrics.observe("jobs_run_seconds", now - row["started_at"])
+        metrics.inc("jobs_finished_total", status=status)
+        self._refresh_depth(conn)
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Job status plus final_result.json contents once the run is done."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        out: Dict[str, Any] = {
+            "run_id": row["run_id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "enqueued_at": row["enqueued_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "error": row["error"],
+            "result": None,
+        }
+        path = row["final_result_path"]
+        if row["status"] == STATUS_DONE and path and artifact_exists(path):
+            out["result"] = load_json(path)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        counts = {r["status"]: r["n"] for r in conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+        oldest = conn.execute("SELECT MIN(enqueued_at) FROM jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+        return {
+            "depth": counts.get(STATUS_QUEUED, 0) + counts.get(STATUS_RUNNING, 0),
+            "max_depth": self.max_depth,
+            "by_status": counts,
+            "oldest_queued_age_seconds": (time.time() - oldest) if oldest else None,
+        }
+
+
+class JobWorkers:
+    """Background threads that claim jobs from a JobQueue and run run_pipeline for them."""
+
+    def __init__(self, queue: JobQueue, workers: int = JOBS_WORKERS, poll_interval: float = JOBS_POLL_INTERVAL_SECONDS):
+        self.queue = queue
+        self.workers = max(1, int(workers))
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"rbidp-job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _loop(self) -> None:
+        owner = f"{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex[:6]}"
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(owner)
+            except sqlite3.Error as e:
+                logger.warning("Job claim failed: %s", e)
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self._run(job, owner)
+
+    def _run(self, job: Dict[str, Any], owner: str) -> None:
+        run_id = job["run_id"]
+        done = threading.Event()
+
+        def heartbeat() -> None:
+            while not done.wait(self.queue.lease_seconds / 3.0):
+                if not self.queue.renew(run_id, owner):
+                    logger.warning("Lost lease on job %s", run_id)
+                    return
+
+        hb = threading.Thread(target=heartbeat, name=f"rbidp-lease-{run_id}", daemon=True)
+        hb.start()
+        try:
+            with tracing.span("job.run", run_id=run_id, attempt=job["attempts"]):
+                payload = dict(job["payload"])
+                payload["runs_root"] = Path(payload["runs_root"])
+                result = run_pipeline(run_id=run_id, **payload)
+                self.queue.complete(run_id, owner, result.get("final_result_path"))
+        except Exception as e:
+            logger.exception("Job %s crashed (attempt %s)", run_id, job["attempts"])
+            self.queue.fail(run_id, owner, str(e))
+        finally:
+            done.set()
+            hb.join()
+
+
+def default_queue(runs_root: Optional[Path] = None) -> JobQueue:
+    return JobQueue(str(Path(runs_root or RUNS_DIR) / JOBS_DB_FILENAME))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RB IDP job queue worker")
+    parser.add_argument("--runs-root", default=RUNS_DIR)
+    parser.add_argument("--workers", type=int, default=JOBS_WORKERS)
+    args = parser.parse_args()
+
+    tracing.setup_logging(logging.INFO)
+    if WARMUP_ON_START:
+        logger.info("Warm-up: %s", warmup())
+    workers = JobWorkers(default_queue(Path(args.runs_root)), workers=args.workers)
+    workers.start()
+    logger.info("Job workers started: %s", args.workers)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        workers.stop()
+
+
+if __name__ == "__main__":
+    main()
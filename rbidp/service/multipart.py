@@ -0,0 +1,124 @@
+import re
+from typing import BinaryIO, Callable, Dict, Optional
+
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class MultipartError(ValueError):
+    pass
+
+
+def boundary_from_content_type(content_type: Optional[str]) -> Optional[bytes]:
+    if not content_type or not content_type.lower().startswith("multipart/form-data"):
+        return None
+    m = re.search(r'boundary="?([^";]+)"?', content_type, flags=re.IGNORECASE)
+    return m.group(1).encode("latin-1") if m else None
+
+
+class _Reader:
+    """Bounded buffered reader over a socket stream (never reads past Content-Length)."""
+
+    def __init__(self, stream: BinaryIO, length: int):
+        self.stream = stream
+        self.remaining = length
+        self.buf = b""
+
+    def _fill(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        chunk = self.stream.read(min(CHUNK_SIZE, self.remaining))
+        if not chunk:
+            self.remaining = 0
+            return False
+        self.remaining -= len(chunk)
+        self.buf += chunk
+        return True
+
+    def read_exact(self, n: int) -> bytes:
+        while len(self.buf) < n:
+            if not self._fill():
+                raise MultipartError("Unexpected end of multipart body")
+        out, self.buf = self.buf[:n], self.buf[n:]
+        return out
+
+    def read_until(self, sep: bytes, sink: Callable[[bytes], None], limit: Optional[int] = None) -> None:
+        """Stream bytes to sink until sep (consumed, not emitted). Keeps only len(sep) bytes of lookbehind."""
+        total = 0
+        while True:
+            idx = self.buf.find(sep)
+            if idx >= 0:
+                data, self.buf = self.buf[:idx], self.buf[idx + len(sep):]
+                total += len(data)
+                if limit is not None and total > limit:
+                    raise MultipartError("Multipart part too large")
+                if data:
+                    sink(data)
+                return
+            keep = len(sep) - 1
+            if len(self.buf) > keep:
+                cut = len(self.buf) - keep
+                data, self.buf = self.buf[:cut], self.buf[cut:]
+                total += len(data)
+                if limit is not None and total > limit:
+                    raise MultipartError("Multipart part too large")
+                sink(data)
+            if not self._fill():
+                raise MultipartError("Unexpected end of multipart body")
+
+
+def _parse_part_headers(raw: bytes) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    for line in raw.decode("utf-8", errors="replace").split("\r\n"):
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    return headers
+
+
+def _disposition_param(disposition: str, key: str) -> Optional[str]:
+    # Anchored at a parameter start: "name" must not match inside "filename="
+    key = re.escape(key)
+    m = re.search(r'(?:^|;)\s*%s\*?="([^"]*)"' % key, disposition) or re.search(r"(?:^|;)\s*%s=([^;]+)" % key, disposition)
+    return m.group(1).strip() if m else None
+
+
+def parse_multipart(
+    stream: BinaryIO,
+    boundary: bytes,
+    content_length: int,
+    open_file: Callable[[str, str, Optional[str]], Callable[[bytes], None]],
+    max_file_bytes: Optional[int] = None,
+) -> Dict[str, str]:
+    """
+    Stream-parse a multipart/form-data body.
+    - Text fields are collected (utf-8) and returned as {name: value}.
+    - File parts are not buffered: open_file(field_name, filename, content_type) must return a
+      write callable that receives the part bytes chunk by chunk.
+    """
+    reader = _Reader(stream, content_length)
+    delim = b"--" + boundary
+    fields: Dict[str, str] = {}
+
+    reader.read_until(delim, lambda _b: None, limit=MAX_HEADER_BYTES)
+    while True:
+        tail = reader.read_exact(2)
+        if tail == b"--":
+            break
+        if tail != b"\r\n":
+            raise MultipartError("Malformed multipart delimiter")
+        header_chunks = []
+        reader.read_until(b"\r\n\r\n", header_chunks.append, limit=MAX_HEADER_BYTES)
+        headers = _parse_part_headers(b"".join(header_chunks))
+        disposition = headers.get("content-disposition", "")
+        name = _disposition_param(disposition, "name") or ""
+        filename = _disposition_param(disposition, "filename")
+        if filename is not None:
+            sink = open_file(name, filename, headers.get("content-type"))
+            reader.read_until(b"\r\n" + delim, sink, limit=max_file_bytes)
+        else:
+            value_chunks = []
+            reader.read_until(b"\r\n" + delim, value_chunks.append, limit=MAX_FIELD_BYTES)
+            fields[name] = b"".join(value_chunks).decode("utf-8", errors="replace")
+    return fields
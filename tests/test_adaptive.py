@@ -0,0 +1,47 @@
+import time
+
+from rbidp.clients import adaptive
+from rbidp.clients.adaptive import AimdLimit, size_class
+from rbidp.clients.scheduler import get_scheduler
+
+
+def _feed(limit: AimdLimit, latencies, classes) -> int:
+    for i, seconds in enumerate(latencies):
+        limit.on_sample(time.monotonic(), seconds, in_flight=int(limit.limit), call_class=classes[i % len(classes)])
+    return int(limit.limit)
+
+
+def test_size_class_buckets():
+    assert size_class("pages", 1) == "pages<=1"
+    assert size_class("pages", 3) == "pages<=4"
+    assert size_class("max_tokens", 200) == "max_tokens<=256"
+
+
+def test_mixed_call_classes_without_load_do_not_cut_the_limit():
+    # Short DTC answers and long extractions alternating at full use, no upstream load
+    limit = AimdLimit("gpt", 8, max_limit=64, tolerance=2.0)
+    assert _feed(limit, [0.2, 0.8] * 200, ["max_tokens<=256", "max_tokens<=1024"]) >= 8
+
+
+def test_latency_growth_within_a_class_cuts_the_limit():
+    limit = AimdLimit("gpt", 8, max_limit=64, tolerance=2.0)
+    _feed(limit, [0.2, 0.8] * 20, ["max_tokens<=256", "max_tokens<=1024"])
+    before = int(limit.limit)
+    # The short calls slow down fourfold: upstream is loaded
+    assert _feed(limit, [0.8, 0.8] * 20, ["max_tokens<=256", "max_tokens<=1024"]) < before
+
+
+def test_slow_upstream_keeps_the_interactive_reservation(monkeypatch):
+    monkeypatch.setattr(adaptive, "ADAPTIVE_CONCURRENCY", True)
+    monkeypatch.setattr(adaptive, "_limits", {})
+    scheduler = get_scheduler("test-reserved")
+    assert scheduler.reserved == 1
+    limit = adaptive.get_limit("test-reserved")
+    now = time.monotonic()
+    adaptive._update(limit, scheduler, now - 0.1, None, "")
+    # Upstream slows down tenfold and then starts throttling: the limit backs off to its floor
+    for _ in range(50):
+        adaptive._update(limit, scheduler, time.monotonic() - 1.0, None, "")
+        adaptive._update(limit, scheduler, time.monotonic(), "throttled", "")
+    assert scheduler.slots == 2
+    assert scheduler.reserved == 1
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from rbidp.core import metrics
+from rbidp.processors import agent_json_repair
+from rbidp.processors.filter_gpt_generic_response import filter_gpt_generic_response, parse_gpt_generic_response
+
+EXPECTED = {"fio": "Иванов Иван", "doc_date": "12.03.2024", "valid": True}
+
+
+def _delta(before, after, name, **labels) -> float:
+    key = metrics._key(name, labels)
+    return after["counters"].get(key, 0) - before["counters"].get(key, 0)
+
+
+def _envelope(content: str) -> str:
+    """A gateway response: the prompt echo line, then the answer inside choices."""
+    echo = json.dumps({"Model": "gpt-4o-mini", "Content": "prompt {with braces}"})
+    return echo + "\n" + json.dumps({"choices": [{"message": {"content": content}}]}, ensure_ascii=False)
+
+
+@pytest.mark.parametrize("answer", [
+    '```json\n{"fio": "Иванов Иван", "doc_date": "12.03.2024", "valid": true}\n```',
+    '```\n{"fio": "Иванов Иван", "doc_date": "12.03.2024", "valid": true,}\n```\nГотово.',
+    # The schema example's trailing comma, echoed
+    '{"fio": "Иванов Иван", "doc_date": "12.03.2024", "valid": true,\n}',
+    "{'fio': 'Иванов Иван', 'doc_date': '12.03.2024', 'valid': True}",
+    '{\n  "fio": "Иванов Иван", // as in the header\n  "doc_date": "12.03.2024", /* dd.mm.yyyy */\n  "valid": true, // checked\n}',
+    'Вот ответ: {"fio": "Иванов Иван", "doc_date": "12.03.2024", "valid": true} — проверьте.',
+])
+def test_malformed_answers_are_repaired(answer):
+    assert parse_gpt_generic_response(_envelope(answer)) == EXPECTED
+    assert parse_gpt_generic_response(answer) == EXPECTED
+
+
+def test_comment_markers_inside_strings_are_text():
+    answer = '{"url": "http://x/*y*/", "note": "a // b", "n": 1, // drop\n}'
+    assert parse_gpt_generic_response(answer) == {"url": "http://x/*y*/", "note": "a // b", "n": 1}
+
+
+def test_strict_answer_is_counted_clean():
+    before = metrics.snapshot()
+    assert parse_gpt_generic_response(_envelope(json.dumps(EXPECTED))) == EXPECTED
+    assert parse_gpt_generic_response("") == {}
+    after = metrics.snapshot()
+    assert _delta(before, after, "gpt_json_parse_total", outcome="clean") == 1
+    assert _delta(before, after, "gpt_json_parse_total", outcome="failed") == 1
+
+
+def test_truncated_answer_is_beyond_local_repair():
+    assert parse_gpt_generic_response(_envelope('{"fio": "Иванов Иван", "doc_date": "12.03')) == {}
+
+
+@pytest.fixture
+def reask(monkeypatch):
+    """Re-asks sent to the model: (prompt, max_tokens); answers with the fixed object."""
+    sent = []
+
+    def ask_gpt(prompt, max_tokens=200, **kwargs):
+        sent.append((prompt, max_tokens))
+        return _envelope('{"fio": "Иванов Иван", "doc_date": null}')
+
+    monkeypatch.setattr(agent_json_repair, "ask_gpt", ask_gpt)
+    return sent
+
+
+def _filter(tmp_path, raw, **kwargs):
+    (tmp_path / "raw.txt").write_text(raw, encoding="utf-8")
+    out = filter_gpt_generic_response(str(tmp_path / "raw.txt"), str(tmp_path), "filtered.json", **kwargs)
+    return json.loads(open(out, encoding="utf-8").read())
+
+
+def test_truncated_answer_is_reasked_alone(tmp_path, reask):
+    broken = '{"fio": "Иванов Иван", "doc_date": "12.03'
+    assert _filter(tmp_path, _envelope(broken), reask=True, keys=["fio", "doc_date"]) == {"fio": "Иванов Иван", "doc_date": None}
+    (prompt, max_tokens), = reask
+    # Only the broken answer goes back, never the prompt echo with the OCR text
+    assert prompt.rstrip().endswith(broken)
+    assert "prompt {with braces}" not in prompt
+    assert "Keys of the object: fio, doc_date" in prompt
+    assert max_tokens <= agent_json_repair._MAX_MAX_TOKENS
+
+
+def test_repairable_answer_is_not_reasked(tmp_path, reask):
+    assert _filter(tmp_path, _envelope('```json\n{"fio": "Иванов Иван",}\n```'), reask=True) == {"fio": "Иванов Иван"}
+    assert reask == []
+
+
+def test_reask_is_opt_in(tmp_path, reask):
+    assert _filter(tmp_path, _envelope('{"fio": "Ива'), reask=False) == {}
+    assert reask == []
+
+
+def test_failed_reask_leaves_an_empty_object(tmp_path, monkeypatch):
+    def ask_gpt(prompt, max_tokens=200, **kwargs):
+        raise TimeoutError("gateway")
+
+    monkeypatch.setattr(agent_json_repair, "ask_gpt", ask_gpt)
+    before = metrics.snapshot()
+    assert _filter(tmp_path, _envelope('{"fio": "Ива'), reask=True) == {}
+    assert _delta(before, metrics.snapshot(), "gpt_json_reask_total", outcome="failed") == 1
@@ -0,0 +1,86 @@
+import io
+import json
+
+import pytest
+
+from rbidp.clients import gpt_client
+from rbidp.clients.gpt_client import JsonObjectScanner
+from rbidp.processors.filter_gpt_generic_response import parse_gpt_generic_response
+
+ANSWERS = [
+    '{"fio": "Иванов Иван", "doc_date": "12.03.2024"}',
+    '```json\n{"fio": "Иванов", "nested": {"a": [1, {"b": 2}]}}\n```',
+    # Braces and quotes inside strings
+    'Ответ: {"text": "скобки { и } внутри", "q": "кавычки \\" и {\\"x\\": 1}"} и ещё {"ignored": 1}',
+    # Escapes: backslash before the closing quote, unicode escapes, a lone "\\\\"
+    '{"path": "C:\\\\docs\\\\", "u": "\\u041f\\u0440\\u0438\\u043a\\u0430\\u0437 }", "end": "\\\\"}',
+    '{"empty": {}, "list": [], "s": ""}',
+]
+
+
+def _baseline(completion: str):
+    """What the non-streamed path yields: the first object decoded from the whole completion."""
+    obj, _ = json.JSONDecoder().raw_decode(completion, completion.index("{"))
+    return obj
+
+
+def _scan(pieces):
+    scanner = JsonObjectScanner()
+    for piece in pieces:
+        if scanner.feed(piece) is not None:
+            break
+    return scanner.result
+
+
+@pytest.mark.parametrize("completion", ANSWERS)
+def test_every_split_point_gives_the_baseline_object(completion):
+    expected = _baseline(completion)
+    for i in range(len(completion) + 1):
+        assert json.loads(_scan([completion[:i], completion[i:]])) == expected, i
+
+
+@pytest.mark.parametrize("completion", ANSWERS)
+def test_character_deltas_give_the_baseline_object(completion):
+    assert json.loads(_scan(list(completion))) == _baseline(completion)
+
+
+def test_open_object_is_not_a_result():
+    scanner = JsonObjectScanner()
+    for piece in ['{"a": "}', '", "b": {', '"c": 1}']:
+        assert scanner.feed(piece) is None
+    assert scanner.feed("}") == '{"a": "}", "b": {"c": 1}}'
+    # Later deltas do not change a closed result
+    assert scanner.feed('{"x": 2}') == '{"a": "}", "b": {"c": 1}}'
+
+
+class _Response(io.BytesIO):
+    def __init__(self, body: bytes, content_type: str):
+        super().__init__(body)
+        self.status = 200
+        self.headers = {"Content-Type": content_type}
+
+
+def _sse(deltas):
+    events = [b": keep-alive\n"]
+    for delta in deltas:
+        event = {"choices": [{"delta": {"content": delta}}]}
+        events.append(b"data: " + json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n\n")
+    events.append(b"data: [DONE]\n\n")
+    return b"".join(events)
+
+
+@pytest.mark.parametrize("completion", ANSWERS)
+def test_streamed_answer_parses_like_the_plain_answer(completion, monkeypatch):
+    plain = json.dumps({"choices": [{"message": {"content": completion}}]}, ensure_ascii=False).encode("utf-8")
+    deltas = [completion[i:i + 3] for i in range(0, len(completion), 3)]
+    monkeypatch.setattr(gpt_client.urllib.request, "urlopen", lambda req, context=None: _Response(plain, "application/json"))
+    expected = parse_gpt_generic_response(gpt_client.call_fortebank_gpt("p"))
+    monkeypatch.setattr(gpt_client.urllib.request, "urlopen", lambda req, context=None: _Response(_sse(deltas), "text/event-stream"))
+    streamed = gpt_client.call_fortebank_gpt_stream("p")
+    assert expected and parse_gpt_generic_response(streamed) == expected
+
+
+def test_stream_without_an_object_returns_the_whole_text(monkeypatch):
+    body = _sse(["не могу ", "ответить {"])
+    monkeypatch.setattr(gpt_client.urllib.request, "urlopen", lambda req, context=None: _Response(body, "text/event-stream"))
+    assert gpt_client.call_fortebank_gpt_stream("p") == "не могу ответить {"
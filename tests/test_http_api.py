@@ -0,0 +1,51 @@
+import http.client
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from rbidp import orchestrator
+from rbidp.core.run_store import load_json
+from rbidp.service.http_api import make_server
+
+
+@pytest.fixture
+def server(tmp_path):
+    srv = make_server("127.0.0.1", 0, runs_root=tmp_path)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.mark.parametrize("length", ["abc", "-5", "1e3"])
+def test_bad_content_length_is_rejected(server, length):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    conn.putrequest("POST", "/v1/process")
+    conn.putheader("Content-Type", "multipart/form-data; boundary=x")
+    conn.putheader("Content-Length", length)
+    conn.endheaders()
+    resp = conn.getresponse()
+    assert resp.status == 400
+    assert json.loads(resp.read()) == {"error": "BAD_CONTENT_LENGTH"}
+    conn.close()
+
+
+def test_upload_is_used_in_place(server, monkeypatch):
+    monkeypatch.setattr(orchestrator, "ask_textract", lambda *a, **k: {"success": False, "error": "stub"})
+    monkeypatch.setattr(orchestrator, "ask_textract_per_page", lambda *a, **k: {"success": False, "error": "stub"})
+    body = (
+        b'--xyz\r\nContent-Disposition: form-data; name="file"; filename="scans/a b.pdf"\r\n\r\n%PDF-1.4\r\n'
+        b'--xyz\r\nContent-Disposition: form-data; name="doc_type"\r\n\r\nx\r\n--xyz--\r\n'
+    )
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+    conn.request("POST", "/v1/process", body=body, headers={"Content-Type": "multipart/form-data; boundary=xyz"})
+    result = json.loads(conn.getresponse().read())
+    conn.close()
+    manifest = load_json(Path(result["final_result_path"]).parent / "manifest.json")
+    saved = Path(manifest["file"]["saved_path"])
+    assert saved.name == "a_b.pdf"
+    assert [p.name for p in saved.parent.iterdir()] == ["a_b.pdf"]
+    assert manifest["file"]["original_filename"] == "scans/a b.pdf"
@@ -0,0 +1,36 @@
+import pytest
+
+from rbidp import orchestrator
+from rbidp.core.idempotency import is_cacheable
+from rbidp.processors import preflight
+
+
+def _ocr(pdf_path, output_dir, save_json):
+    text = "ПРИКАЗ № 15\n" + "Предоставить отпуск работнику Иванову Ивану Ивановичу. " * 200
+    return {"success": True, "raw_obj": {"data": {"pages": [{"page_number": 1, "text": text}]}}}
+
+
+@pytest.mark.parametrize("code", ["GPT_BUDGET_EXCEEDED", "PDF_TOO_MANY_PAGES"])
+def test_config_rejections_are_not_cacheable(code):
+    assert not is_cacheable(code)
+
+
+def test_budget_rejection_is_not_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(orchestrator, "IDEMPOTENCY_ENABLED", True)
+    monkeypatch.setattr(orchestrator, "ask_textract", _ocr)
+    monkeypatch.setattr(orchestrator, "ask_textract_per_page", _ocr)
+    monkeypatch.setattr(orchestrator, "GPT_PROMPT_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(preflight, "GPT_PROMPT_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(orchestrator, "GPT_BUDGET_ACTION", "reject")
+
+    def submit():
+        return orchestrator.run_pipeline(
+            fio="Иванов Иван Иванович", reason="r", doc_type="Приказ", source_file_path=b"%PDF-1.4 same bytes",
+            original_filename="doc.pdf", content_type="application/pdf", runs_root=tmp_path,
+        )
+
+    first = submit()
+    assert [e["code"] for e in first["errors"]] == ["GPT_BUDGET_EXCEEDED"]
+    second = submit()
+    assert "duplicate_of" not in second
+    assert [e["code"] for e in second["errors"]] == ["GPT_BUDGET_EXCEEDED"]
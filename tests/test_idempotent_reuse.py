@@ -0,0 +1,44 @@
+import pytest
+
+from rbidp.core.run_store import load_json, write_json
+from rbidp.orchestrator import _reuse_prior_result
+
+
+def _prior(tmp_path, file_info):
+    meta = tmp_path / "prior" / "meta"
+    write_json(meta / "final_result.json", {"run_id": "prior", "verdict": True, "errors": []})
+    write_json(meta / "manifest.json", {"run_id": "prior", "file": file_info})
+    return {"run_id": "prior", "final_result_path": str(meta / "final_result.json")}
+
+
+def _reuse(tmp_path, prior):
+    saved = tmp_path / "dup" / "input" / "original" / "doc.pdf"
+    saved.parent.mkdir(parents=True)
+    saved.write_bytes(b"%PDF-1.4")
+    result = _reuse_prior_result(
+        prior,
+        run_id="dup",
+        meta_dir=tmp_path / "dup" / "meta",
+        saved_path=saved,
+        user_input={},
+        file_info={"saved_path": str(saved)},
+        created_at="01.01.2026",
+    )
+    assert result["duplicate_of"] == "prior"
+    return saved, load_json(tmp_path / "dup" / "meta" / "manifest.json")["file"]["saved_path"]
+
+
+@pytest.mark.parametrize("file_info", [{}, {"saved_path": None}, {"saved_path": "/nonexistent/doc.pdf"}])
+def test_input_is_kept_without_a_prior_copy(tmp_path, file_info):
+    saved, manifest_path = _reuse(tmp_path, _prior(tmp_path, file_info))
+    assert saved.exists()
+    assert manifest_path == str(saved)
+
+
+def test_input_is_dropped_for_the_prior_copy(tmp_path):
+    original = tmp_path / "prior" / "input" / "original" / "doc.pdf"
+    original.parent.mkdir(parents=True)
+    original.write_bytes(b"%PDF-1.4")
+    saved, manifest_path = _reuse(tmp_path, _prior(tmp_path, {"saved_path": str(original)}))
+    assert not saved.exists()
+    assert manifest_path == str(original)
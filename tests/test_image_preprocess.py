@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+ImageFont = pytest.importorskip("PIL.ImageFont")
+
+from rbidp.processors.image_preprocess import preprocess_frame
+
+_WORDS = (
+    "приказ работодателя о предоставлении отпуска без сохранения заработной платы работнику "
+    "согласно трудовому договору на основании заявления период года номер дата выдачи"
+).split()
+
+
+def _text_page(angle: float) -> "Image.Image":
+    """An upright A4 scan (300 dpi) of Cyrillic text lines, rotated counterclockwise by `angle`."""
+    rng = random.Random(0)
+    font = ImageFont.load_default(size=34)
+    page = Image.new("L", (2480, 3508), 250)
+    draw = ImageDraw.Draw(page)
+    draw.text((900, 250), "ПРИКАЗ № 15", fill=20, font=font)
+    for y in range(400, 3200, 56):
+        words = []
+        while len(" ".join(words)) < 90:
+            words.append(rng.choice(_WORDS))
+        draw.text((250, y), " ".join(words), fill=20, font=font)
+    return page.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=250)
+
+
+@pytest.mark.parametrize("angle", [0, 1, 2, 3, 4, 6, -3, -6])
+def test_skewed_upright_page_is_not_turned(angle):
+    out, info = preprocess_frame(_text_page(angle), {})
+    assert "rotated" not in info
+    assert out.height > out.width
+    if abs(angle) >= 1:
+        assert info["skew_deg"] == pytest.approx(angle, abs=0.3)
+
+
+@pytest.mark.parametrize("angle", [0, 3, -5])
+def test_sideways_page_is_turned(angle):
+    out, info = preprocess_frame(_text_page(angle).transpose(Image.Transpose.ROTATE_270), {})
+    assert info["rotated"] == 90
+    assert out.height > out.width
@@ -0,0 +1,172 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from rbidp.core.run_store import write_json
+from rbidp.service.http_api import make_server
+from rbidp.service.jobs import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    JobQueue,
+    JobWorkers,
+    QueueFullError,
+)
+
+
+def _queue(tmp_path, **kwargs) -> JobQueue:
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), **kwargs)
+
+
+def test_status_polling_returns_the_result(tmp_path):
+    queue = _queue(tmp_path)
+    queue.submit("r1", {"doc_type": "x"})
+    assert queue.get("r1")["status"] == STATUS_QUEUED
+    job = queue.claim("w1")
+    assert job["run_id"] == "r1" and job["payload"] == {"doc_type": "x"} and job["attempts"] == 1
+    assert queue.get("r1")["status"] == STATUS_RUNNING
+    final = tmp_path / "r1" / "meta" / "final_result.json"
+    write_json(final, {"run_id": "r1", "verdict": True, "errors": []})
+    queue.complete("r1", "w1", str(final))
+    status = queue.get("r1")
+    assert status["status"] == STATUS_DONE
+    assert status["result"] == {"run_id": "r1", "verdict": True, "errors": []}
+    assert queue.get("missing") is None
+
+
+def test_backpressure_rejects_beyond_max_depth(tmp_path):
+    queue = _queue(tmp_path, max_depth=2)
+    queue.submit("r1", {})
+    queue.submit("r2", {})
+    with pytest.raises(QueueFullError):
+        queue.submit("r3", {})
+    assert queue.get("r3") is None
+    # Running jobs still count; finished ones free their place
+    queue.claim("w1")
+    with pytest.raises(QueueFullError):
+        queue.submit("r3", {})
+    queue.complete("r1", "w1", None)
+    queue.submit("r3", {})
+    assert queue.stats()["depth"] == 2
+
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_is_fenced(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=0.05, max_attempts=3)
+    queue.submit("r1", {})
+    assert queue.claim("w1")["attempts"] == 1
+    assert queue.claim("w2") is None  # lease still held
+    time.sleep(0.1)
+    job = queue.claim("w2")
+    assert job["run_id"] == "r1" and job["attempts"] == 2
+    # The crashed/hung first owner can no longer renew or finish the job
+    assert not queue.renew("r1", "w1")
+    queue.complete("r1", "w1", None)
+    assert queue.get("r1")["status"] == STATUS_RUNNING
+    assert queue.renew("r1", "w2")
+    queue.complete("r1", "w2", None)
+    assert queue.get("r1")["status"] == STATUS_DONE
+
+
+def test_expired_lease_out_of_attempts_fails(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=0.05, max_attempts=1)
+    queue.submit("r1", {})
+    queue.claim("w1")
+    time.sleep(0.1)
+    assert queue.claim("w2") is None
+    status = queue.get("r1")
+    assert status["status"] == STATUS_FAILED and status["error"] == "LEASE_EXPIRED"
+
+
+def test_failed_attempt_is_requeued_until_max_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    queue.submit("r1", {})
+    queue.claim("w1")
+    queue.fail("r1", "w1", "boom")
+    assert queue.get("r1")["status"] == STATUS_QUEUED
+    assert queue.claim("w2")["attempts"] == 2
+    queue.fail("r1", "w2", "boom again")
+    status = queue.get("r1")
+    assert status["status"] == STATUS_FAILED and status["error"] == "boom again"
+
+
+def test_concurrent_claims_take_each_job_once(tmp_path):
+    queue = _queue(tmp_path, max_depth=100)
+    for i in range(40):
+        queue.submit(f"r{i:02d}", {})
+    claimed = []
+    lock = threading.Lock()
+
+    def worker(owner):
+        # Each thread gets its own SQLite connection (thread-local)
+        while True:
+            job = queue.claim(owner)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["run_id"])
+
+    threads = [threading.Thread(target=worker, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == [f"r{i:02d}" for i in range(40)]
+
+
+def test_workers_run_the_pipeline(tmp_path, monkeypatch):
+    seen = []
+
+    def pipeline(run_id, **payload):
+        seen.append((run_id, payload["runs_root"]))
+        final = tmp_path / run_id / "meta" / "final_result.json"
+        write_json(final, {"run_id": run_id, "verdict": True, "errors": []})
+        return {"final_result_path": str(final)}
+
+    monkeypatch.setattr("rbidp.service.jobs.run_pipeline", pipeline)
+    queue = _queue(tmp_path)
+    queue.submit("r1", {"runs_root": str(tmp_path)})
+    workers = JobWorkers(queue, workers=1, poll_interval=0.01)
+    workers.start()
+    try:
+        deadline = time.time() + 5
+        while queue.get("r1")["status"] != STATUS_DONE and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        workers.stop(timeout=5)
+    assert queue.get("r1")["result"]["verdict"] is True
+    assert seen == [("r1", tmp_path)]
+
+
+def test_http_submit_and_poll(tmp_path):
+    queue = _queue(tmp_path, max_depth=1)
+    srv = make_server("127.0.0.1", 0, runs_root=tmp_path, jobs=queue)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    body = (
+        b'--xyz\r\nContent-Disposition: form-data; name="file"; filename="a.pdf"\r\n\r\n%PDF-1.4\r\n'
+        b'--xyz\r\nContent-Disposition: form-data; name="doc_type"\r\n\r\nx\r\n--xyz--\r\n'
+    )
+
+    def request(method, path, data=None):
+        conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=5)
+        headers = {"Content-Type": "multipart/form-data; boundary=xyz"} if data else {}
+        conn.request(method, path, body=data, headers=headers)
+        resp = conn.getresponse()
+        out = resp.status, json.loads(resp.read())
+        conn.close()
+        return out
+
+    try:
+        status, accepted = request("POST", "/v1/jobs", body)
+        assert status == 202 and accepted["status"] == "queued"
+        status, job = request("GET", accepted["status_url"])
+        assert status == 200 and job["status"] == STATUS_QUEUED
+        # Queue depth 1 is reached: the next submission is turned away
+        status, rejected = request("POST", "/v1/jobs", body)
+        assert status == 429 and rejected == {"error": "QUEUE_FULL"}
+    finally:
+        srv.shutdown()
+        srv.server_close()
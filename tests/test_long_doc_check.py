@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from rbidp.processors import agent_doc_type_checker, agent_long_extractor
+from rbidp.processors.agent_long_extractor import check_single_doc_type_long
+
+
+def _pages(titles):
+    return {"pages": [
+        {"page_number": i + 1, "text": f"{title}\nот 12.03.2024\nПредоставить отпуск работнику с 01.04.2024"}
+        for i, title in enumerate(titles)
+    ]}
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Chunk prompts sent to the DTC stub; every chunk on its own looks like one document."""
+    sent = []
+
+    def stub(pages_obj):
+        sent.append([p["page_number"] for p in pages_obj["pages"]])
+        # The cross-chunk headers prompt sees both documents
+        return json.dumps({"single_doc_type": len(pages_obj["pages"]) <= 3})
+
+    monkeypatch.setattr(agent_doc_type_checker, "check_single_doc_type", stub)
+    monkeypatch.setattr(agent_long_extractor, "LONG_DOC_CONCURRENCY", 1)
+    return sent
+
+
+def test_boundary_between_chunks_goes_to_a_headers_check(prompts):
+    out = check_single_doc_type_long(_pages(["ПРИКАЗ № 15"] * 3 + ["СПРАВКА"] * 3))
+    assert json.loads(out) == {"single_doc_type": False}
+    assert prompts == [[1, 2, 3], [4, 5, 6], [1, 2, 3, 4, 5, 6]]
+
+
+def test_titles_alone_never_reject(prompts, monkeypatch):
+    # A discharge summary with a «СПРАВКА» page inside: GPT says single, and that stands
+    monkeypatch.setattr(agent_doc_type_checker, "check_single_doc_type", lambda p: prompts.append(p) or '{"single_doc_type": true}')
+    out = check_single_doc_type_long(_pages(["ВЫПИСНОЙ ЭПИКРИЗ"] * 4 + ["СПРАВКА"] * 2))
+    assert json.loads(out) == {"single_doc_type": True}
+    assert len(prompts) == 3
+
+
+def test_single_chunk_needs_no_headers_check(prompts):
+    out = check_single_doc_type_long(_pages(["ПРИКАЗ № 15"] * 3))
+    assert json.loads(out) == {"single_doc_type": True}
+    assert prompts == [[1, 2, 3]]
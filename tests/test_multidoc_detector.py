@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip("rapidfuzz")
+
+from rbidp.processors.multidoc_detector import detect_multiple_documents  # noqa: E402
+
+ISSUER_RU = "ТОО «Ромашка»\nг. Алматы"
+ISSUER_KK = "«Ромашка» ЖШС\nАлматы қ."
+
+
+def _pages(*texts):
+    return {"pages": [{"page_number": i + 1, "text": t} for i, t in enumerate(texts)]}
+
+
+def test_kazakh_russian_mirror_pages_are_one_document():
+    kk = f"{ISSUER_KK}\nБҰЙРЫҚ № 15\n12.03.2024\nИванов Иван Иванович еңбек демалысы берілсін"
+    ru = f"{ISSUER_RU}\nПРИКАЗ № 15\nот 12.03.2024\nПредоставить Иванову Ивану Ивановичу отпуск"
+    out = detect_multiple_documents(_pages(kk, ru))
+    assert out["single_doc_type"] is True and out["reason"] == "mirror_pages"
+    assert out["titles"] == [[1, "order", "kk"], [2, "order", "ru"]]
+    assert out["people"] == 1
+
+
+def test_order_next_to_a_certificate_is_two_documents():
+    order = f"{ISSUER_RU}\nПРИКАЗ № 15\nот 12.03.2024\nПредоставить Иванову Ивану Ивановичу отпуск"
+    certificate = "ГКП «Городская поликлиника № 1»\nСПРАВКА\nВыдана Иванову Ивану Ивановичу"
+    out = detect_multiple_documents(_pages(order, certificate))
+    assert out["single_doc_type"] is False and out["reason"] == "different_titles"
+    assert out["titles"] == [[1, "order", "ru"], [2, "certificate", "ru"]]
+
+
+def test_body_lines_starting_with_a_title_word_are_not_titles():
+    body = "Приказываю:\n1. Предоставить отпуск Иванову Ивану Ивановичу\nСправка выдана для предъявления по месту требования"
+    out = detect_multiple_documents(_pages(body))
+    assert out["titles"] == []
+    # On a page after a real title they do not make it a second document
+    out = detect_multiple_documents(_pages(f"{ISSUER_RU}\nПРИКАЗ № 15\nот 12.03.2024", body))
+    assert out["titles"] == [[1, "order", "ru"]]
+    assert out["single_doc_type"] is True and out["reason"] == "same_title"
+
+
+def test_bare_and_numbered_titles_count():
+    out = detect_multiple_documents(_pages("Справка\nдана Иванову Ивану Ивановичу", "Приказ № 12\nот 01.02.2024"))
+    assert out["single_doc_type"] is False
+
+
+def test_ocr_noise_in_a_title_is_tolerated():
+    # A Latin «C» read into «СПРАВКА»
+    out = detect_multiple_documents(_pages("ПРИКАЗ № 15\nот 12.03.2024", "CПРАВКА\nвыдана"))
+    assert out["titles"] == [[1, "order", "ru"], [2, "certificate", "ru"]]
+    assert out["single_doc_type"] is False
+
+
+@pytest.mark.parametrize("texts,reason", [
+    # Continuation pages without any title
+    (("Предоставить отпуск", "Основание: заявление"), "no_titles"),
+    # The same title about two different people
+    (("ПРИКАЗ № 15\nИванову Ивану Ивановичу", "ПРИКАЗ № 16\nПетрову Петру Петровичу"), "several_people"),
+    # A title and a referenced document on one page
+    (("ПРИКАЗ № 15\nСПРАВКА", "Основание"), "several_titles_on_a_page"),
+])
+def test_doubtful_pages_are_left_to_gpt(texts, reason):
+    out = detect_multiple_documents(_pages(*texts))
+    assert out["single_doc_type"] is None and out["reason"] == reason
+
+
+def test_single_page_is_one_document():
+    out = detect_multiple_documents(_pages("СПРАВКА\nвыдана Иванову Ивану Ивановичу"))
+    assert out["single_doc_type"] is True and out["reason"] == "single_page"
+    assert detect_multiple_documents({})["single_doc_type"] is True
@@ -0,0 +1,37 @@
+import io
+
+from rbidp.service.multipart import parse_multipart
+
+
+def _body(parts, boundary=b"xyz"):
+    out = b""
+    for disposition, content in parts:
+        out += b"--" + boundary + b"\r\nContent-Disposition: " + disposition + b"\r\n\r\n" + content + b"\r\n"
+    return out + b"--" + boundary + b"--\r\n"
+
+
+def _parse(body):
+    files = {}
+
+    def open_file(name, filename, content_type):
+        files[name] = {"filename": filename, "data": b""}
+        return lambda chunk: files[name].update(data=files[name]["data"] + chunk)
+
+    fields = parse_multipart(io.BytesIO(body), b"xyz", len(body), open_file)
+    return fields, files
+
+
+def test_filename_before_name():
+    body = _body([
+        (b'form-data; filename="a.pdf"; name="file"', b"%PDF-1.4"),
+        (b'form-data; name="doc_type"', "Приказ".encode("utf-8")),
+    ])
+    fields, files = _parse(body)
+    assert files == {"file": {"filename": "a.pdf", "data": b"%PDF-1.4"}}
+    assert fields == {"doc_type": "Приказ"}
+
+
+def test_unquoted_parameters():
+    fields, files = _parse(_body([(b"form-data; name=file; filename=b.pdf", b"x"), (b"form-data; name=fio", b"A")]))
+    assert files["file"]["filename"] == "b.pdf"
+    assert fields == {"fio": "A"}
@@ -0,0 +1,46 @@
+import contextvars
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rbidp.core.profiling import RunProfiler, profiled_task
+
+
+def _pool_work() -> None:
+    end = time.perf_counter() + 0.2
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def _run_in_pool() -> None:
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="rbidp-test") as pool:
+        futures = [pool.submit(contextvars.copy_context().run, profiled_task, _pool_work) for _ in range(2)]
+        for f in futures:
+            f.result()
+
+
+@pytest.mark.parametrize("engine", ["sample", "cprofile"])
+def test_pool_threads_are_profiled(engine):
+    profiler = RunProfiler("requested", engine=engine, memory=False, interval_ms=5).start()
+    _run_in_pool()
+    profiler.stop()
+    functions, _ = profiler._cpu()
+    assert any(key.endswith("(_pool_work)") for key in functions)
+
+
+def test_tracemalloc_started_elsewhere_keeps_running():
+    tracemalloc.start()
+    try:
+        profiler = RunProfiler("requested", engine="sample").start()
+        assert profiler.stop() is not None
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_tracemalloc_started_by_the_profiler_is_stopped():
+    assert not tracemalloc.is_tracing()
+    RunProfiler("requested", engine="sample").start().stop()
+    assert not tracemalloc.is_tracing()
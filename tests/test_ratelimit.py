@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+import time
+
+from rbidp.clients.ratelimit import NodeRateLimiter
+
+
+def _grants(db_path, n, out):
+    """Child process: take n tickets of the shared 10 rps bucket; report the grant times."""
+    limiter = NodeRateLimiter("ocr", db_path, rps=10, burst=1, poll_seconds=0.005)
+    times = []
+    for _ in range(n):
+        ticket, _ = limiter.acquire()
+        times.append(time.time())
+        limiter.release(ticket)
+    out.put(times)
+
+
+def _hold_and_die(db_path, held):
+    limiter = NodeRateLimiter("ocr", db_path, max_concurrent=1, poll_seconds=0.005)
+    limiter.acquire()
+    held.set()
+    os._exit(0)  # crash without releasing the ticket
+
+
+def test_bucket_refills_at_rps(tmp_path):
+    limiter = NodeRateLimiter("gpt", str(tmp_path / "rl.sqlite3"), rps=20, burst=2, poll_seconds=0.005)
+    waits = []
+    for _ in range(4):
+        ticket, waited = limiter.acquire()
+        waits.append(waited)
+        limiter.release(ticket)
+    # The burst goes through at once, then one token every 50 ms
+    assert waits[0] < 0.03 and waits[1] < 0.03
+    assert 0.03 < waits[2] < 0.2 and 0.03 < waits[3] < 0.2
+
+
+def test_processes_share_one_bucket(tmp_path):
+    db_path = str(tmp_path / "rl.sqlite3")
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    children = [ctx.Process(target=_grants, args=(db_path, 4, out)) for _ in range(2)]
+    for c in children:
+        c.start()
+    times = sorted(out.get(timeout=30) + out.get(timeout=30))
+    for c in children:
+        c.join(10)
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    # 8 grants from two processes at 10 rps: never two within one refill interval
+    assert len(times) == 8
+    assert min(gaps) > 0.07
+
+
+def test_ticket_of_a_dead_process_is_reclaimed(tmp_path):
+    db_path = str(tmp_path / "rl.sqlite3")
+    ctx = multiprocessing.get_context("spawn")
+    held = ctx.Event()
+    child = ctx.Process(target=_hold_and_die, args=(db_path, held))
+    child.start()
+    assert held.wait(30)
+    child.join(10)
+    limiter = NodeRateLimiter("ocr", db_path, max_concurrent=1, lease_seconds=60, poll_seconds=0.005)
+    assert limiter.status() == {"active": 1, "waiting": 0}
+    ticket, waited = limiter.acquire()
+    assert waited < 1.0
+    assert limiter.status() == {"active": 1, "waiting": 0}
+    limiter.release(ticket)
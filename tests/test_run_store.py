@@ -0,0 +1,60 @@
+from rbidp.core.run_store import (
+    BUNDLE_FILENAME,
+    artifact_exists,
+    close_run_bundle,
+    load_json,
+    open_run_bundle,
+    pack_run,
+    read_index,
+    remove_artifact,
+    write_artifact,
+    write_json,
+)
+
+
+def test_bundle_mode_writes_no_small_files(tmp_path):
+    run_dir = tmp_path / "2026-01-01" / "run1"
+    (run_dir / "input" / "original").mkdir(parents=True)
+    open_run_bundle(run_dir)
+    write_json(run_dir / "meta" / "manifest.json", {"status": "ok"})
+    write_artifact(run_dir / "gpt" / "raw.json", b"not json")
+    write_artifact(run_dir / "gpt" / "dropped.json", b"{}")
+    remove_artifact(run_dir / "gpt" / "dropped.json")
+    # Readable while the run is open, without touching the disk
+    assert load_json(run_dir / "meta" / "manifest.json") == {"status": "ok"}
+    assert not (run_dir / "meta").exists() and not (run_dir / "gpt").exists()
+
+    close_run_bundle(run_dir)
+    assert sorted(p.name for p in run_dir.iterdir()) == ["input", BUNDLE_FILENAME]
+    assert sorted(read_index(run_dir / BUNDLE_FILENAME)) == ["gpt/raw.json", "meta/manifest.json"]
+    assert load_json(run_dir / "meta" / "manifest.json") == {"status": "ok"}
+    assert not artifact_exists(run_dir / "gpt" / "dropped.json")
+
+
+def test_plain_files_without_an_open_bundle(tmp_path):
+    run_dir = tmp_path / "2026-01-01" / "run2"
+    write_json(run_dir / "meta" / "final_result.json", {"verdict": True})
+    assert (run_dir / "meta" / "final_result.json").read_text(encoding="utf-8").startswith("{\n")
+    # Existing plain-file runs still convert
+    pack_run(run_dir)
+    assert not (run_dir / "meta").exists()
+    assert load_json(run_dir / "meta" / "final_result.json") == {"verdict": True}
+
+
+def test_only_run_level_dirs_are_bundled(tmp_path):
+    # The runs root itself sits under a directory named "meta"
+    run_dir = tmp_path / "meta" / "runs" / "2026-01-01" / "run3"
+    open_run_bundle(run_dir)
+    write_json(run_dir / "meta" / "manifest.json", {"status": "ok"})
+    write_artifact(run_dir / "input" / "original" / "a.pdf", b"%PDF")
+    # Deeper than run_dir/<meta|ocr|gpt>/name: a plain file, not "meta/.../name" in the bundle
+    write_artifact(run_dir / "input" / "original" / "gpt" / "b.pdf", b"%PDF")
+    write_artifact(run_dir / "ocr" / "pages" / "p1.json", b"{}")
+    assert (run_dir / "input" / "original" / "gpt" / "b.pdf").exists()
+    assert (run_dir / "ocr" / "pages" / "p1.json").exists()
+    assert not artifact_exists(tmp_path / "meta" / "runs" / "jobs.json")
+
+    close_run_bundle(run_dir)
+    assert sorted(read_index(run_dir / BUNDLE_FILENAME)) == ["meta/manifest.json"]
+    assert load_json(run_dir / "meta" / "manifest.json") == {"status": "ok"}
+    assert load_json(run_dir / "ocr" / "pages" / "p1.json") == {}
@@ -0,0 +1,72 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rbidp.clients.scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    SlotScheduler,
+    current_priority,
+    priority_scope,
+)
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_backlog_is_served_by_weight():
+    sched = SlotScheduler("test", slots=1, reserved=0, weights={PRIORITY_INTERACTIVE: 3, PRIORITY_BATCH: 1})
+    sched.acquire(PRIORITY_BATCH)
+    order = []
+
+    def call(priority):
+        sched.acquire(priority)
+        order.append(priority)
+        sched.release(priority)
+
+    threads = [threading.Thread(target=call, args=(p,)) for p in [PRIORITY_BATCH] * 12 + [PRIORITY_INTERACTIVE] * 12]
+    for t in threads:
+        t.start()
+    _wait_for(lambda: sum(len(q) for q in sched._queues.values()) == 24)
+    sched.release(PRIORITY_BATCH)
+    for t in threads:
+        t.join()
+    # Both classes backlogged: 3 interactive grants per batch grant
+    assert order[:16].count(PRIORITY_INTERACTIVE) == 12
+    assert order[16:] == [PRIORITY_BATCH] * 8
+
+
+def test_reserved_slot_is_interactive_only():
+    sched = SlotScheduler("test", slots=2, reserved=1, weights={})
+    sched.acquire(PRIORITY_BATCH)
+    blocked = threading.Thread(target=sched.acquire, args=(PRIORITY_BATCH,), daemon=True)
+    blocked.start()
+    _wait_for(lambda: len(sched._queues[PRIORITY_BATCH]) == 1)
+    # The free slot is the reserved one: a second batch call waits, an interactive one does not
+    assert sched.acquire(PRIORITY_INTERACTIVE) < 0.5
+    assert sched.in_use() == 2
+    sched.release(PRIORITY_BATCH)
+    blocked.join(5)
+    assert sched._in_use == {PRIORITY_INTERACTIVE: 1, PRIORITY_BATCH: 1}
+
+
+def test_priority_follows_the_context_into_pool_tasks():
+    sched = SlotScheduler("test", slots=4, reserved=1, weights={})
+    seen = []
+
+    def task():
+        with sched.slot():
+            seen.append((current_priority(), dict(sched._in_use)))
+
+    with priority_scope("batch"):
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(contextvars.copy_context().run, task).result()
+    assert seen == [(PRIORITY_BATCH, {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 1})]
+    assert current_priority() == PRIORITY_INTERACTIVE
+    with priority_scope("bogus") as p:
+        assert p == current_priority() == PRIORITY_INTERACTIVE
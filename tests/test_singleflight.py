@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from rbidp.clients.singleflight import SingleFlight
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _followers(flight, key):
+    with flight._lock:
+        call = flight._calls.get(key)
+        return call.followers if call is not None else -1
+
+
+def _run_group(flight, fn, followers):
+    """Leader runs fn in a thread; `followers` threads join while it blocks. Returns (leader, followers) outcomes."""
+    release = threading.Event()
+    outcomes = {}
+
+    def call(name, block):
+        def body():
+            if block:
+                release.wait(5)
+            return fn()
+        try:
+            outcomes[name] = ("ok", flight.do("k", body))
+        except Exception as e:
+            outcomes[name] = ("error", e)
+
+    leader = threading.Thread(target=call, args=("leader", True))
+    leader.start()
+    _wait_for(lambda: _followers(flight, "k") == 0)
+    threads = [threading.Thread(target=call, args=(f"f{i}", False)) for i in range(followers)]
+    for t in threads:
+        t.start()
+    _wait_for(lambda: _followers(flight, "k") == followers)
+    release.set()
+    for t in [leader, *threads]:
+        t.join(5)
+    return outcomes
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight("test")
+    calls = []
+    outcomes = _run_group(flight, lambda: calls.append(1) or "answer", followers=3)
+    assert calls == [1]
+    assert set(outcomes.values()) == {("ok", "answer")}
+    assert flight.stats() == {"leaders": 1, "coalesced": 3, "in_flight": 0}
+    # Nothing is cached once the call is over
+    assert flight.do("k", lambda: "again") == "again"
+
+
+def test_leader_failure_reaches_every_follower():
+    flight = SingleFlight("test")
+    error = ValueError("upstream 503")
+
+    def fail():
+        raise error
+
+    outcomes = _run_group(flight, fail, followers=3)
+    assert len(outcomes) == 4
+    assert all(kind == "error" and e is error for kind, e in outcomes.values())
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_follower_gets_a_threaded_leaders_error():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise TimeoutError("slow upstream")
+
+    leader = threading.Thread(target=lambda: pytest.raises(TimeoutError, flight.do, "k", fail))
+    leader.start()
+    _wait_for(lambda: _followers(flight, "k") == 0)
+
+    async def follower():
+        task = asyncio.ensure_future(flight.do_async("k", lambda: "never called"))
+        while _followers(flight, "k") != 1:
+            await asyncio.sleep(0.001)
+        release.set()
+        return await task
+
+    with pytest.raises(TimeoutError, match="slow upstream"):
+        asyncio.run(follower())
+    leader.join(5)
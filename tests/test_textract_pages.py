@@ -0,0 +1,122 @@
+import io
+import json
+from collections import defaultdict
+
+import pytest
+
+from rbidp.processors.filter_textract_response import extract_pages
+from rbidp.processors.textract_pages import parse_ocr_stream
+
+
+def _baseline_pages(obj):
+    """extract_pages() as it was before the streaming parser: json.loads, then a filter pass."""
+    pages = []
+    data = obj.get("data", {})
+    if isinstance(data, dict) and isinstance(data.get("pages"), list):
+        for p in data["pages"]:
+            if isinstance(p, dict):
+                pn = p.get("page_number")
+                try:
+                    pn = int(pn) if pn is not None else None
+                except Exception:
+                    pn = None
+                pages.append({"page_number": pn, "text": p.get("text", "") or ""})
+        if all(isinstance(x.get("page_number"), int) for x in pages):
+            pages.sort(key=lambda x: x["page_number"])
+    elif isinstance(obj.get("Blocks"), list):
+        blocks = obj["Blocks"]
+        pages_map = defaultdict(list)
+        has_line = any(isinstance(b, dict) and b.get("BlockType") == "LINE" for b in blocks)
+        for b in blocks:
+            if isinstance(b, dict) and (b.get("BlockType") == "LINE" or not has_line) and b.get("Text"):
+                pages_map[b.get("Page")].append(b["Text"])
+        for pn in sorted(k for k in pages_map if isinstance(k, int)):
+            pages.append({"page_number": pn, "text": "\n".join(pages_map[pn]).strip()})
+        if None in pages_map:
+            pages.append({"page_number": None, "text": "\n".join(pages_map[None]).strip()})
+    else:
+        pages = [{"page_number": None, "text": ""}]
+    return pages
+
+
+class _Trickle(io.BytesIO):
+    """A body that arrives a few bytes per read, splitting tokens and UTF-8 sequences."""
+
+    def __init__(self, body: bytes, size: int):
+        super().__init__(body)
+        self.size = size
+
+    def read(self, n=-1):
+        return super().read(self.size)
+
+
+def _line(text, page, confidence=99.5, **extra):
+    box = {"Left": 0.1, "Top": 0.25, "Width": 0.5, "Height": 0.0123456789}
+    return {"BlockType": "LINE", "Page": page, "Text": text, "Confidence": confidence, "Geometry": {"BoundingBox": box}, **extra}
+
+
+RESPONSES = {
+    "blocks": {
+        "success": True,
+        "DocumentMetadata": {"Pages": 2},
+        "Blocks": [
+            {"BlockType": "PAGE", "Page": 1, "Id": "p1", "Relationships": [{"Type": "CHILD", "Ids": ["l1", "l2"]}]},
+            _line("ПРИКАЗ № 15", 2),
+            {"BlockType": "WORD", "Page": 2, "Text": "ПРИКАЗ", "Confidence": 99.1},
+            _line('Строка с { скобками } и "кавычками"', 1),
+            _line("Escapes: \\ \t /   \U0001f600 Ж", 1, confidence=12345678901234567890),
+            _line("", 1),
+            _line("  отступ  ", 2),
+            _line("без страницы", None),
+        ],
+    },
+    "words_only": {
+        "Blocks": [
+            {"BlockType": "WORD", "Page": 1, "Text": "только"},
+            {"BlockType": "WORD", "Page": 1, "Text": "слова"},
+            {"BlockType": "PAGE", "Page": 1},
+            {"BlockType": "WORD", "Page": "2", "Text": "строковая страница"},
+        ],
+    },
+    "gateway_pages": {
+        "success": True,
+        "message": "ok",
+        "data": {"pages": [{"page_number": "2", "text": "вторая {"}, {"page_number": 1, "text": None}, "мусор"]},
+    },
+    "gateway_unnumbered": {"data": {"pages": [{"page_number": "x", "text": "b"}, {"text": "a"}]}},
+    "empty_blocks": {"success": False, "Blocks": []},
+    "nothing": {"success": False, "message": "unsupported file"},
+}
+
+
+@pytest.mark.parametrize("name", sorted(RESPONSES))
+@pytest.mark.parametrize("size", [1, 3, 7, 64 * 1024])
+def test_stream_matches_the_baseline(name, size):
+    obj = RESPONSES[name]
+    body = json.dumps(obj, ensure_ascii=False, indent=1).encode("utf-8")
+    expected = _baseline_pages(json.loads(body))
+    doc = parse_ocr_stream(_Trickle(body, size), keep_raw=True)
+    assert doc.error is None
+    assert doc.to_pages() == expected
+    assert doc.raw == body
+    assert doc.success == bool(obj.get("success"))
+    assert doc.message == obj.get("message")
+    # The decoded-dict path gives the same pages
+    assert extract_pages(json.loads(body)) == expected
+
+
+def test_line_geometry_and_confidence_are_kept():
+    body = json.dumps(RESPONSES["blocks"]).encode("utf-8")
+    page1 = parse_ocr_stream(_Trickle(body, 5)).pages[0]
+    assert page1.lines[0] == 'Строка с { скобками } и "кавычками"'
+    assert page1.confidence[0] == pytest.approx(99.5)
+    assert list(page1.geometry[:4]) == pytest.approx([0.1, 0.25, 0.5, 0.0123456789])
+
+
+@pytest.mark.parametrize("body", [b"", b"not json", b'{"Blocks": [{"BlockType": "LINE"', b'{"a": 1} trailing', b'{"a": 1 "b": 2}'])
+def test_invalid_body_is_an_error_not_an_exception(body):
+    with pytest.raises(ValueError):
+        json.loads(body)
+    doc = parse_ocr_stream(_Trickle(body, 4), keep_raw=True)
+    assert doc.error and not doc.success and doc.message == doc.error
+    assert doc.raw == body